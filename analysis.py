@@ -0,0 +1,601 @@
+"""
+Backends de análise de áudio (BPM e tonalidade).
+
+Define uma interface comum para os motores de análise e cinco implementações:
+
+- "musicai": envia o arquivo para o Music.ai (via MusicAiOrchestrator), que também gera o stem
+- "local": calcula BPM e tonalidade localmente com librosa, sem chamadas remotas
+- "hybrid": BPM e tonalidade locais; o Music.ai é usado apenas para obter o stem
+- "stream": como "local", mas lendo o arquivo em blocos (librosa.stream), com memória
+  constante por worker independentemente da duração da gravação
+- "stream-windows": como "stream", analisando apenas trechos representativos da faixa
+"""
+
+import os
+import threading
+import functools
+import concurrent.futures
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from track_manifest import audio_name
+
+# Nomes das notas no mesmo formato usado pelo Music.ai ("Bb major", "G# minor")
+PITCH_CLASSES = ['C', 'C#', 'D', 'Eb', 'E', 'F', 'F#', 'G', 'G#', 'A', 'Bb', 'B']
+
+# Perfis de tonalidade de Krumhansl-Kessler (tônica em C)
+KRUMHANSL_MAJOR = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+KRUMHANSL_MINOR = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+ANALYSIS_SAMPLE_RATE = 22050
+
+# Parâmetros da análise em blocos (taxa de amostragem nativa do arquivo)
+STREAM_FRAME_LENGTH = 2048
+STREAM_HOP_LENGTH = 512
+STREAM_BLOCK_LENGTH = 256  # frames por bloco (~3 s a 44,1 kHz)
+STREAM_N_MELS = 128
+# Faixa de andamentos considerada no acumulador de autocorrelação
+STREAM_MIN_BPM = 40.0
+STREAM_MAX_BPM = 240.0
+# Janelas representativas: (posição relativa do início, duração em segundos)
+REPRESENTATIVE_WINDOWS = ((0.2, 30.0), (0.45, 30.0), (0.7, 30.0))
+
+BACKENDS = ('musicai', 'local', 'hybrid', 'stream', 'stream-windows')
+
+
+def _original_name(file_path: str) -> str:
+    """
+    Obtém o nome original do arquivo, como em stems.separate_guitar.
+    """
+    return audio_name(file_path)
+
+
+def _build_key_templates() -> np.ndarray:
+    """
+    Monta a matriz (24, 12) com os perfis de todas as tonalidades maiores e menores,
+    já centralizados e normalizados para que a correlação vire um produto escalar.
+    """
+    rolls = np.arange(12)[:, None]
+    cols = (np.arange(12)[None, :] - rolls) % 12
+    templates = np.vstack([KRUMHANSL_MAJOR[cols], KRUMHANSL_MINOR[cols]])
+    templates = templates - templates.mean(axis=1, keepdims=True)
+    return templates / np.linalg.norm(templates, axis=1, keepdims=True)
+
+
+KEY_TEMPLATES = _build_key_templates()
+KEY_NAMES = [f"{p} major" for p in PITCH_CLASSES] + [f"{p} minor" for p in PITCH_CLASSES]
+
+
+def estimate_key(chroma: np.ndarray) -> str:
+    """
+    Estima a tonalidade comparando o perfil de croma com os perfis de Krumhansl.
+
+    Args:
+        chroma: Matriz de croma (12, n_frames) ou vetor médio (12,)
+
+    Returns:
+        Tonalidade no formato "D major" / "E minor"
+    """
+    profile = chroma.mean(axis=1) if chroma.ndim == 2 else chroma
+    profile = profile - profile.mean()
+    norm = np.linalg.norm(profile)
+    if norm == 0:
+        return ''
+    # Correlação de Pearson com as 24 tonalidades em um único produto matricial
+    scores = KEY_TEMPLATES @ (profile / norm)
+    return KEY_NAMES[int(np.argmax(scores))]
+
+
+def estimate_tempo(onset_env: np.ndarray, sr: int, hop_length: int = 512) -> float:
+    """
+    Estima o BPM a partir do envelope de onsets usando beat tracking.
+
+    Args:
+        onset_env: Envelope de força de onsets
+        sr: Taxa de amostragem
+        hop_length: Hop usado para calcular o envelope
+
+    Returns:
+        BPM arredondado (mesma resolução do Music.ai)
+    """
+    import librosa
+
+    tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=hop_length)
+    return float(round(float(np.atleast_1d(tempo)[0])))
+
+
+def analyze_local(file_path: str) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+    """
+    Calcula BPM e tonalidade de um arquivo localmente com librosa.
+
+    Função de nível de módulo para poder ser enviada a um ProcessPoolExecutor.
+
+    Args:
+        file_path: Caminho para o arquivo de áudio
+
+    Returns:
+        Tuple com (None, BPM, tonalidade, nome do arquivo). Em caso de erro, BPM e
+        tonalidade são None em vez de valores simulados.
+    """
+    import librosa
+
+    original_name = _original_name(file_path)
+    try:
+        y, sr = librosa.load(file_path, sr=ANALYSIS_SAMPLE_RATE, mono=True)
+        y_harmonic, y_percussive = librosa.effects.hpss(y)
+
+        onset_env = librosa.onset.onset_strength(y=y_percussive, sr=sr)
+        bpm = estimate_tempo(onset_env, sr)
+
+        chroma = librosa.feature.chroma_cqt(y=y_harmonic, sr=sr)
+        root_key = estimate_key(chroma)
+
+        print(f'Análise local concluída para "{original_name}": BPM={bpm}, Tonalidade={root_key}')
+        return None, bpm, root_key, original_name
+    except Exception as e:
+        print(f"Erro na análise local de {file_path}: {e}")
+        return None, None, None, original_name
+
+
+class StreamingFeatures:
+    """
+    Estatísticas acumuladas bloco a bloco para BPM e tonalidade.
+
+    Guarda apenas vetores de tamanho fixo (perfil de croma de 12 posições e a soma das
+    autocorrelações do envelope de onsets por lag), então a memória não cresce com a
+    duração do áudio. O envelope de onsets de cada bloco é autocorrelacionado junto com
+    o final do bloco anterior, para não perder periodicidades que cruzam a fronteira.
+    """
+
+    def __init__(self, sr: int, hop_length: int = STREAM_HOP_LENGTH, n_fft: int = STREAM_FRAME_LENGTH,
+                 n_mels: int = STREAM_N_MELS):
+        """
+        Args:
+            sr: Taxa de amostragem dos blocos
+            hop_length: Hop entre frames, em amostras
+            n_fft: Tamanho da FFT (igual ao frame_length de librosa.stream)
+            n_mels: Número de bandas mel do envelope de onsets
+        """
+        import librosa
+
+        self.sr = sr
+        self.hop_length = hop_length
+        self.n_fft = n_fft
+        frame_rate = sr / hop_length
+        self.min_lag = max(1, int(np.floor(60.0 * frame_rate / STREAM_MAX_BPM)))
+        self.max_lag = int(np.ceil(60.0 * frame_rate / STREAM_MIN_BPM))
+
+        self.chroma_profile = np.zeros(12)
+        self.autocorrelation = np.zeros(self.max_lag + 1)
+        self.frames = 0
+        self._mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+        self._chroma_basis = librosa.filters.chroma(sr=sr, n_fft=n_fft)
+        self._last_mel: Optional[np.ndarray] = None
+        self._onset_tail = np.zeros(0)
+        self._onset_sum = 0.0
+        self._onset_count = 0
+
+    def reset_context(self) -> None:
+        """
+        Descarta o contexto entre blocos (ao pular para outra janela da faixa).
+        """
+        self._last_mel = None
+        self._onset_tail = np.zeros(0)
+
+    def update(self, block: np.ndarray) -> None:
+        """
+        Incorpora um bloco de amostras mono.
+
+        Args:
+            block: Amostras do bloco (os frames de librosa.stream se sobrepõem entre blocos)
+        """
+        import librosa
+
+        if len(block) < self.n_fft:
+            return
+        spectrum = np.abs(librosa.stft(block, n_fft=self.n_fft, hop_length=self.hop_length, center=False))
+        harmonic, percussive = librosa.decompose.hpss(spectrum)
+
+        # Tonalidade: energia de croma da parte harmônica, somada ao perfil
+        chroma = self._chroma_basis @ (harmonic ** 2)
+        self.chroma_profile += chroma.sum(axis=1)
+        self.frames += spectrum.shape[1]
+
+        # BPM: fluxo espectral em escala mel da parte percussiva (como librosa.onset.onset_strength)
+        mel = librosa.power_to_db(self._mel_basis @ (percussive ** 2), ref=1.0)
+        if self._last_mel is not None:
+            mel = np.hstack([self._last_mel, mel])
+        self._last_mel = mel[:, -1:]
+        onset = np.maximum(0.0, np.diff(mel, axis=1)).mean(axis=0)
+        if len(onset) == 0:
+            return
+
+        # Centraliza pela média corrente (cada valor uma única vez, ao chegar)
+        self._onset_sum += onset.sum()
+        self._onset_count += len(onset)
+        onset = onset - self._onset_sum / self._onset_count
+
+        segment = np.concatenate([self._onset_tail, onset])
+        ac = librosa.autocorrelate(segment, max_size=self.max_lag + 1)
+        # Desconta os pares já contados no bloco anterior (a cauda autocorrelacionada consigo mesma)
+        if len(self._onset_tail):
+            tail_ac = librosa.autocorrelate(self._onset_tail, max_size=self.max_lag + 1)
+            ac[:len(tail_ac)] -= tail_ac
+        self.autocorrelation[:len(ac)] += ac
+        self._onset_tail = segment[-self.max_lag:]
+
+    def tempo(self) -> Optional[float]:
+        """
+        BPM com o mesmo prior log-normal (centro em 120 BPM) usado por librosa.beat.
+        """
+        lags = np.arange(self.min_lag, self.max_lag + 1)
+        strength = self.autocorrelation[lags]
+        if not np.any(strength > 0):
+            return None
+        bpms = 60.0 * self.sr / (self.hop_length * lags)
+        prior = np.exp(-0.5 * ((np.log2(bpms) - np.log2(120.0)) / 1.0) ** 2)
+        return float(round(bpms[int(np.argmax(strength * prior))]))
+
+    def key(self) -> str:
+        if self.frames == 0:
+            return ''
+        return estimate_key(self.chroma_profile / self.frames)
+
+
+def _representative_windows(duration: float,
+                            windows: Sequence[Tuple[float, float]]) -> List[Tuple[float, Optional[float]]]:
+    """
+    Converte janelas relativas (início em fração da duração, duração em segundos) em
+    trechos absolutos; faixas curtas são analisadas inteiras.
+    """
+    total = sum(length for _, length in windows)
+    if duration <= total:
+        return [(0.0, None)]
+    return [(max(0.0, min(start * duration, duration - length)), length) for start, length in windows]
+
+
+def _stream_blocks(file_path: str, offset: float, duration: Optional[float],
+                   block_length: int) -> Iterator[np.ndarray]:
+    """
+    Blocos de amostras mono de um trecho do arquivo.
+
+    Usa librosa.stream (soundfile: MP3, WAV, FLAC, OGG/Opus). Contêineres que o
+    soundfile não lê (ex.: .m4a/.webm do modo "native") caem para librosa.load do
+    trecho, fatiado nos mesmos blocos; aí a memória é limitada pela duração do trecho.
+    """
+    import librosa
+
+    try:
+        stream = librosa.stream(file_path, block_length=block_length,
+                                frame_length=STREAM_FRAME_LENGTH, hop_length=STREAM_HOP_LENGTH,
+                                mono=True, offset=offset, duration=duration, fill_value=0)
+    except Exception as e:
+        print(f"Leitura em blocos indisponível para {file_path} ({e}); decodificando o trecho inteiro")
+        y, _ = librosa.load(file_path, sr=None, mono=True, offset=offset, duration=duration)
+        step = block_length * STREAM_HOP_LENGTH
+        # Blocos com a mesma sobreposição de frames que librosa.stream produz
+        for start in range(0, max(1, len(y)), step):
+            yield y[start:start + step + STREAM_FRAME_LENGTH - STREAM_HOP_LENGTH]
+        return
+    yield from stream
+
+
+def analyze_streaming(file_path: str,
+                      windows: Optional[Union[str, Sequence[Tuple[float, float]]]] = None,
+                      block_length: int = STREAM_BLOCK_LENGTH
+                      ) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+    """
+    Calcula BPM e tonalidade lendo o áudio em blocos com librosa.stream.
+
+    Ao contrário de `analyze_local`, o arquivo nunca é decodificado inteiro: cada
+    bloco atualiza as estatísticas de StreamingFeatures e é descartado, então o pico
+    de memória por worker é constante (um set ao vivo de uma hora custa o mesmo que
+    uma faixa de 3 minutos). Função de nível de módulo para o ProcessPoolExecutor.
+
+    Args:
+        file_path: Caminho para o arquivo de áudio
+        windows: None para analisar a faixa inteira; "auto" para as janelas de
+            REPRESENTATIVE_WINDOWS; ou uma lista de (início relativo 0–1, duração em segundos)
+        block_length: Número de frames por bloco
+
+    Returns:
+        Tuple com (None, BPM, tonalidade, nome do arquivo), como `analyze_local`
+    """
+    import librosa
+
+    original_name = _original_name(file_path)
+    try:
+        sr = librosa.get_samplerate(file_path)
+        features = StreamingFeatures(sr)
+
+        segments: List[Tuple[float, Optional[float]]] = [(0.0, None)]
+        if windows is not None:
+            duration = librosa.get_duration(path=file_path)
+            segments = _representative_windows(
+                duration, REPRESENTATIVE_WINDOWS if windows == 'auto' else windows)
+
+        for offset, duration in segments:
+            features.reset_context()
+            for block in _stream_blocks(file_path, offset, duration, block_length):
+                features.update(block)
+
+        bpm = features.tempo()
+        root_key = features.key()
+        print(f'Análise em blocos concluída para "{original_name}": BPM={bpm}, Tonalidade={root_key}')
+        return None, bpm, root_key, original_name
+    except Exception as e:
+        print(f"Erro na análise em blocos de {file_path}: {e}")
+        return None, None, None, original_name
+
+
+class AnalysisBackend:
+    """
+    Interface dos motores de análise.
+
+    Cada backend devolve tuplas no mesmo formato de stems.separate_guitar:
+    (URL do stem, BPM, tonalidade, nome do arquivo).
+    """
+
+    name = 'base'
+    # Versão do workflow/motor; faz parte da chave do cache de resultados
+    version = '0'
+
+    def analyze(self, file_path: str) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+        """
+        Analisa um único arquivo.
+        """
+        raise NotImplementedError
+
+    def analyze_many(self, file_paths: List[str], max_workers: Optional[int] = None) -> List[Tuple]:
+        """
+        Analisa vários arquivos, retornando os resultados na ordem de entrada.
+        """
+        return [self.analyze(file_path) for file_path in file_paths]
+
+    def report(self) -> None:
+        """
+        Imprime estatísticas do backend ao fim da execução (se houver).
+        """
+
+    def close(self) -> None:
+        """
+        Libera recursos do backend (clientes, threads).
+        """
+
+
+class MusicAiBackend(AnalysisBackend):
+    """
+    Backend remoto: upload e job no Music.ai (gera BPM, tonalidade e stem).
+
+    Todas as chamadas compartilham um MusicAiOrchestrator (um único cliente,
+    uploads paralelos e polling em lote). Falhas retornam BPM/tonalidade None
+    e ficam registradas no relatório, em vez de virarem valores simulados.
+    """
+
+    name = 'musicai'
+    version = 'icd-project'
+
+    def __init__(self, max_in_flight: int = 4, limiter=None):
+        """
+        Args:
+            max_in_flight: Número máximo de jobs simultâneos no Music.ai
+            limiter: AdaptiveLimiter dos jobs (se omitido, o limite é fixo em max_in_flight)
+        """
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter
+        self._orchestrator = None
+        self._lock = threading.Lock()
+
+    @property
+    def orchestrator(self):
+        """Orquestrador compartilhado, criado na primeira chamada."""
+        with self._lock:
+            if self._orchestrator is None:
+                from musicai_orchestrator import MusicAiOrchestrator
+                self._orchestrator = MusicAiOrchestrator(max_in_flight=self.max_in_flight,
+                                                         limiter=self.limiter)
+            return self._orchestrator
+
+    def submit(self, file_path: str) -> Optional[concurrent.futures.Future]:
+        """
+        Inicia o job de um arquivo sem esperar o resultado.
+
+        Args:
+            file_path: Caminho do arquivo de áudio
+
+        Returns:
+            Future do JobRecord, ou None se o Music.ai não puder ser iniciado
+        """
+        try:
+            return self.orchestrator.submit(file_path)
+        except Exception as e:
+            print(f"Erro ao iniciar o Music.ai: {e}")
+            return None
+
+    @staticmethod
+    def collect(future: Optional[concurrent.futures.Future],
+                file_path: str) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+        """
+        Espera o job iniciado por submit; falhas viram BPM/tonalidade None.
+        """
+        if future is not None:
+            try:
+                return future.result().as_tuple()
+            except Exception as e:
+                print(f"Erro ao processar {file_path} no Music.ai: {e}")
+        return None, None, None, _original_name(file_path)
+
+    def analyze(self, file_path: str) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+        return self.collect(self.submit(file_path), file_path)
+
+    def analyze_many(self, file_paths: List[str], max_workers: Optional[int] = None) -> List[Tuple]:
+        try:
+            futures = [self.orchestrator.submit(file_path) for file_path in file_paths]
+        except Exception as e:
+            print(f"Erro ao iniciar o Music.ai: {e}")
+            return [(None, None, None, _original_name(file_path)) for file_path in file_paths]
+        return [self.collect(future, file_path) for future, file_path in zip(futures, file_paths)]
+
+    def report(self) -> None:
+        if self._orchestrator is not None:
+            self._orchestrator.report()
+
+    def close(self) -> None:
+        if self._orchestrator is not None:
+            self._orchestrator.close()
+
+
+class LocalBackend(AnalysisBackend):
+    """
+    Backend local com librosa: BPM por beat tracking e tonalidade por croma + Krumhansl.
+
+    Não gera stems (a URL retornada é sempre None).
+    """
+
+    name = 'local'
+    version = f'librosa-krumhansl-{ANALYSIS_SAMPLE_RATE}-1'
+
+    def __init__(self, executor: Optional[concurrent.futures.Executor] = None):
+        """
+        Args:
+            executor: ProcessPoolExecutor compartilhado; se informado, `analyze` executa
+                a análise nele (útil quando chamado de várias threads)
+        """
+        self.executor = executor
+
+    def analyze(self, file_path: str) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+        if self.executor is not None:
+            return self.executor.submit(analyze_local, file_path).result()
+        return analyze_local(file_path)
+
+    def analyze_many(self, file_paths: List[str], max_workers: Optional[int] = None) -> List[Tuple]:
+        # Análise é CPU-bound: um processo por núcleo
+        max_workers = max_workers or os.cpu_count() or 1
+        if len(file_paths) <= 1 or max_workers == 1:
+            return [analyze_local(file_path) for file_path in file_paths]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(analyze_local, file_paths))
+
+
+class StreamingBackend(LocalBackend):
+    """
+    Backend local com leitura em blocos (librosa.stream) e memória constante por worker.
+
+    Com windows="auto" analisa apenas trechos representativos da faixa.
+    """
+
+    name = 'stream'
+    version = f'librosa-stream-{STREAM_HOP_LENGTH}-{STREAM_BLOCK_LENGTH}-1'
+
+    def __init__(self, executor: Optional[concurrent.futures.Executor] = None,
+                 windows: Optional[Union[str, Sequence[Tuple[float, float]]]] = None):
+        """
+        Args:
+            executor: ProcessPoolExecutor compartilhado (como em LocalBackend)
+            windows: None (faixa inteira), "auto" ou lista de (início relativo, duração em segundos)
+        """
+        super().__init__(executor)
+        self.windows = windows
+        if windows is not None:
+            self.name = 'stream-windows'
+            self.version = f'{self.version}-windows-{windows if isinstance(windows, str) else len(windows)}'
+        self._analyze = functools.partial(analyze_streaming, windows=windows)
+
+    def analyze(self, file_path: str) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+        if self.executor is not None:
+            return self.executor.submit(self._analyze, file_path).result()
+        return self._analyze(file_path)
+
+    def analyze_many(self, file_paths: List[str], max_workers: Optional[int] = None) -> List[Tuple]:
+        max_workers = max_workers or os.cpu_count() or 1
+        if len(file_paths) <= 1 or max_workers == 1:
+            return [self._analyze(file_path) for file_path in file_paths]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self._analyze, file_paths))
+
+
+class HybridBackend(AnalysisBackend):
+    """
+    BPM e tonalidade locais; o Music.ai é chamado apenas para obter o stem.
+
+    Os valores escalares do Music.ai só são usados se a análise local falhar.
+    """
+
+    name = 'hybrid'
+    version = f'{LocalBackend.version}+{MusicAiBackend.version}'
+
+    def __init__(self, executor: Optional[concurrent.futures.Executor] = None, max_in_flight: int = 4,
+                 limiter=None):
+        self.local = LocalBackend(executor)
+        self.remote = MusicAiBackend(max_in_flight, limiter)
+
+    def report(self) -> None:
+        self.remote.report()
+
+    def close(self) -> None:
+        self.remote.close()
+
+    @staticmethod
+    def _merge(local_result: Tuple, remote_result: Tuple) -> Tuple:
+        _, bpm, root_key, original_name = local_result
+        audio_url, remote_bpm, remote_key, _ = remote_result
+        if bpm is None:
+            bpm = remote_bpm
+        if not root_key:
+            root_key = remote_key
+        return audio_url, bpm, root_key, original_name
+
+    def analyze(self, file_path: str) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+        # Upload e job remotos em andamento enquanto a análise local ocupa a CPU
+        remote_future = self.remote.submit(file_path)
+        local_result = self.local.analyze(file_path)
+        return self._merge(local_result, self.remote.collect(remote_future, file_path))
+
+    def analyze_many(self, file_paths: List[str], max_workers: Optional[int] = None) -> List[Tuple]:
+        # Jobs remotos acompanhados pelo orquestrador enquanto a análise local ocupa todos os núcleos
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            remote_future = executor.submit(self.remote.analyze_many, file_paths)
+            local_results = self.local.analyze_many(file_paths)
+            remote_results = remote_future.result()
+        return [self._merge(local, remote) for local, remote in zip(local_results, remote_results)]
+
+
+_BACKEND_CLASSES: Dict[str, type] = {
+    'musicai': MusicAiBackend,
+    'local': LocalBackend,
+    'hybrid': HybridBackend,
+    'stream': StreamingBackend,
+    'stream-windows': StreamingBackend,
+}
+
+
+def get_backend(backend: str = 'musicai',
+                executor: Optional[concurrent.futures.Executor] = None,
+                max_in_flight: int = 4, limiter=None) -> AnalysisBackend:
+    """
+    Obtém uma instância do backend de análise pelo nome.
+
+    Args:
+        backend: "musicai", "local", "hybrid" (local primeiro, Music.ai só para stems),
+            "stream" (local em blocos, memória constante) ou "stream-windows" (só trechos representativos)
+        executor: ProcessPoolExecutor para a análise local (ignorado pelo backend "musicai")
+        max_in_flight: Número máximo de jobs simultâneos no Music.ai (ignorado pelo backend "local")
+        limiter: AdaptiveLimiter dos jobs no Music.ai (ignorado pelo backend "local")
+
+    Returns:
+        Instância do backend
+    """
+    if isinstance(backend, AnalysisBackend):
+        return backend
+    if backend not in _BACKEND_CLASSES:
+        raise ValueError(f"Backend de análise desconhecido: {backend!r}. Use um de {BACKENDS}")
+    if backend == 'musicai':
+        return MusicAiBackend(max_in_flight, limiter)
+    if backend == 'hybrid':
+        return HybridBackend(executor, max_in_flight, limiter)
+    if backend == 'stream':
+        return StreamingBackend(executor)
+    if backend == 'stream-windows':
+        return StreamingBackend(executor, windows='auto')
+    return LocalBackend(executor)
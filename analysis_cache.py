@@ -0,0 +1,242 @@
+"""
+Cache persistente de resultados de análise, endereçado pelo conteúdo do áudio.
+
+A chave de cada entrada é o hash SHA-256 dos bytes do arquivo (calculado em
+blocos, sem carregar o arquivo inteiro) combinado com o backend e a versão do
+workflow. Assim, renomear um arquivo não invalida o cache, mas trocar o
+workflow do Music.ai ou o motor local sim.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+from analysis import get_backend
+
+DEFAULT_CACHE_PATH = os.path.join('cache', 'analysis_cache.json')
+
+
+def hash_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Calcula o SHA-256 de um arquivo lendo-o em blocos.
+
+    Args:
+        file_path: Caminho do arquivo
+        chunk_size: Tamanho de cada bloco lido
+
+    Returns:
+        Hash hexadecimal do conteúdo
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Cache de resultados (URL, BPM, tonalidade, stem) por hash de áudio.
+
+    As entradas são despejadas por idade (max_age_days) e, quando o cache passa
+    de max_entries, as menos recentemente usadas são removidas primeiro.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 50000,
+                 max_age_days: Optional[float] = 90, autosave_every: Optional[int] = 25):
+        """
+        Args:
+            path: Arquivo JSON onde o cache é persistido
+            max_entries: Número máximo de entradas mantidas
+            max_age_days: Idade máxima de uma entrada em dias (None para não expirar)
+            autosave_every: Gravar o cache no disco a cada N resultados novos, para que uma
+                queda não perca as análises já pagas (None grava só em save())
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.autosave_every = autosave_every
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: Dict[str, Dict] = {}
+        self._hashes: Dict[Tuple[str, int, float], str] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Carrega o cache do disco, ignorando arquivos corrompidos.
+        """
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get('entries', {})
+        except Exception as e:
+            print(f"Erro ao carregar cache de análise {self.path}: {e}")
+            self._entries = {}
+
+    def _file_hash(self, file_path: str) -> str:
+        """
+        Retorna o hash do arquivo, reaproveitando-o enquanto tamanho e mtime não mudarem.
+        """
+        stat = os.stat(file_path)
+        stat_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+        if stat_key not in self._hashes:
+            self._hashes[stat_key] = hash_file(file_path)
+        return self._hashes[stat_key]
+
+    def key_for(self, file_path: str, backend: str = 'musicai') -> str:
+        """
+        Monta a chave do cache: hash do áudio + backend + versão do workflow.
+
+        Args:
+            file_path: Caminho do arquivo de áudio
+            backend: Nome do backend de análise
+
+        Returns:
+            Chave do cache
+        """
+        engine = get_backend(backend)
+        return f"{self._file_hash(file_path)}:{engine.name}:{engine.version}"
+
+    def get(self, file_path: str, backend: str = 'musicai') -> Optional[Tuple]:
+        """
+        Busca o resultado de um arquivo no cache.
+
+        Args:
+            file_path: Caminho do arquivo de áudio
+            backend: Nome do backend de análise
+
+        Returns:
+            Tupla (URL, BPM, tonalidade, nome, stem_path) ou None se não houver entrada válida
+        """
+        key = self.key_for(file_path, backend)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, time.time()):
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry['last_access'] = time.time()
+            return entry['url'], entry['bpm'], entry['root_key'], entry['name'], entry['stem_path']
+
+    def put(self, file_path: str, result: Tuple, backend: str = 'musicai') -> bool:
+        """
+        Armazena o resultado da análise de um arquivo.
+
+        Resultados simulados (URLs de example.com), incompletos ou com stem não baixado
+        (URL sem stem_path) não são armazenados, para que sejam reprocessados na próxima execução.
+
+        Args:
+            file_path: Caminho do arquivo de áudio
+            result: Tupla (URL, BPM, tonalidade, nome, stem_path)
+            backend: Nome do backend de análise
+
+        Returns:
+            True se o resultado foi armazenado
+        """
+        audio_url, bpm, root_key, original_name, stem_path = result
+        if bpm is None or not root_key:
+            return False
+        if audio_url and audio_url.startswith('https://example.com'):
+            return False
+        if audio_url and not stem_path:
+            return False
+
+        key = self.key_for(file_path, backend)
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {
+                'url': audio_url,
+                'bpm': bpm,
+                'root_key': root_key,
+                'name': original_name,
+                'stem_path': stem_path,
+                'created_at': now,
+                'last_access': now,
+            }
+            self._unsaved += 1
+            autosave = self.autosave_every is not None and self._unsaved >= self.autosave_every
+        if autosave:
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Erro ao gravar o cache de análise {self.path}: {e}")
+        return True
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        if self.max_age_days is None:
+            return False
+        return now - entry.get('created_at', 0) > self.max_age_days * 86400
+
+    def evict(self) -> int:
+        """
+        Remove entradas expiradas e, se necessário, as menos usadas além de max_entries.
+
+        Returns:
+            Número de entradas removidas
+        """
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if self._expired(entry, now)]
+            for key in expired:
+                del self._entries[key]
+
+            overflow = len(self._entries) - self.max_entries
+            lru = []
+            if overflow > 0:
+                lru = sorted(self._entries, key=lambda k: self._entries[k].get('last_access', 0))[:overflow]
+                for key in lru:
+                    del self._entries[key]
+
+            removed = len(expired) + len(lru)
+            self.evictions += removed
+        return removed
+
+    def save(self) -> None:
+        """
+        Aplica o despejo e grava o cache no disco de forma atômica.
+        """
+        self.evict()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'entries': self._entries}, f)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def report(self) -> Dict[str, float]:
+        """
+        Imprime e retorna as estatísticas de acerto do cache nesta execução.
+
+        Returns:
+            Dicionário com hits, misses, taxa de acerto, despejos e entradas
+        """
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': hit_rate,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+        }
+        print(f"Cache de análise: {self.hits} hits, {self.misses} misses "
+              f"({hit_rate:.0%} de acerto), {self.evictions} despejos, {len(self._entries)} entradas")
+        return stats
@@ -0,0 +1,284 @@
+"""
+Servidores locais que imitam Spotify, YouTube e Music.ai para os benchmarks.
+
+Um único ThreadingHTTPServer atende todas as rotas:
+
+- GET  /v1/playlists/<id>/tracks    páginas de uma playlist sintética (Spotify Web API)
+- GET  /results?search_query=...     página estática de resultados do YouTube
+- GET  /media/<id>.wav               fonte de mídia para o yt-dlp (extrator genérico)
+- GET  /api/application              informações da aplicação (Music.ai)
+- GET  /api/upload                   URLs assinadas de upload/download (Music.ai)
+- PUT  /upload/<token>               upload do arquivo
+- POST /api/job                      criação de job, com latência e taxa de falha configuráveis
+- GET  /api/job/<id>                 estado do job
+- GET  /stems/<id>.wav               stem gerado pelo job (aceita Range)
+"""
+
+import json
+import math
+import random
+import struct
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import requests
+
+
+def make_wav(seconds: float = 1.0, sample_rate: int = 8000, frequency: float = 440.0) -> bytes:
+    """
+    Gera um WAV PCM 16 bits mono com uma senoide.
+    """
+    n_samples = int(seconds * sample_rate)
+    frames = b''.join(
+        struct.pack('<h', int(12000 * math.sin(2 * math.pi * frequency * i / sample_rate)))
+        for i in range(n_samples)
+    )
+    header = struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + len(frames), b'WAVE', b'fmt ', 16, 1, 1,
+        sample_rate, sample_rate * 2, 2, 16, b'data', len(frames)
+    )
+    return header + frames
+
+
+class FakeServices:
+    """
+    Sobe os serviços falsos em uma porta local livre, em uma thread de fundo.
+    """
+
+    def __init__(self, spotify_latency: float = 0.0, musicai_latency: float = 0.2,
+                 musicai_failure_rate: float = 0.0, media_seconds: float = 1.0, seed: int = 0):
+        """
+        Args:
+            spotify_latency: Atraso de cada página da playlist (segundos)
+            musicai_latency: Tempo até um job do Music.ai terminar (segundos)
+            musicai_failure_rate: Fração dos jobs que terminam com FAILED
+            media_seconds: Duração dos áudios e stems servidos
+            seed: Semente do gerador de falhas
+        """
+        self.spotify_latency = spotify_latency
+        self.musicai_latency = musicai_latency
+        self.musicai_failure_rate = musicai_failure_rate
+        self.media = make_wav(media_seconds)
+        self.playlists: Dict[str, int] = {}
+        self.jobs: Dict[str, Dict] = {}
+        self.uploads: Dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_playlist(self, playlist_id: str, n_tracks: int) -> None:
+        """
+        Registra uma playlist sintética com n_tracks faixas.
+        """
+        self.playlists[playlist_id] = n_tracks
+
+    @staticmethod
+    def track(playlist_id: str, i: int) -> Dict:
+        """
+        Faixa sintética determinística na posição i da playlist.
+        """
+        return {
+            'id': f"{playlist_id}{i:07d}",
+            'name': f"Song {playlist_id} {i}",
+            'duration_ms': 180000 + i,
+            'popularity': i % 100,
+            'explicit': i % 7 == 0,
+            'artists': [{'name': f"Artist {i % 97}"}],
+            'album': {'name': f"Album {i % 211}", 'release_date': '2020-01-01'},
+            'external_urls': {'spotify': f"https://open.spotify.com/track/{playlist_id}{i:07d}"},
+        }
+
+    def start(self) -> 'FakeServices':
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = 'application/json',
+                      headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def _json(self, data, status: int = 200):
+                self._send(status, json.dumps(data).encode())
+
+            def _media(self):
+                body = services.media
+                range_header = self.headers.get('Range')
+                if range_header and range_header.startswith('bytes='):
+                    start = int(range_header[6:].split('-')[0] or 0)
+                    if start >= len(body):
+                        self._send(416, b'', headers={'Content-Range': f'bytes */{len(body)}'})
+                        return
+                    self._send(206, body[start:], 'audio/wav', {
+                        'Content-Range': f'bytes {start}-{len(body) - 1}/{len(body)}',
+                        'Accept-Ranges': 'bytes',
+                    })
+                    return
+                self._send(200, body, 'audio/wav', {'Accept-Ranges': 'bytes'})
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                parts = [p for p in url.path.split('/') if p]
+                query = urllib.parse.parse_qs(url.query)
+
+                if len(parts) == 4 and parts[:2] == ['v1', 'playlists'] and parts[3] in ('tracks', 'items'):
+                    self._playlist_page(parts[2], query)
+                elif parts == ['results']:
+                    self._results(query.get('search_query', [''])[0])
+                elif len(parts) == 2 and parts[0] in ('media', 'stems', 'files'):
+                    self._media()
+                elif parts == ['api', 'application']:
+                    self._json({'name': 'benchmark', 'id': 'bench'})
+                elif parts == ['api', 'upload']:
+                    token = uuid.uuid4().hex
+                    self._json({
+                        'uploadUrl': f"{services.base_url}/upload/{token}",
+                        'downloadUrl': f"{services.base_url}/files/{token}.wav",
+                    })
+                elif len(parts) == 3 and parts[:2] == ['api', 'job']:
+                    self._job(parts[2])
+                else:
+                    self._json({'error': 'not found'}, 404)
+
+            def do_PUT(self):
+                length = int(self.headers.get('Content-Length', 0))
+                self.rfile.read(length)
+                token = self.path.rsplit('/', 1)[-1]
+                with services._lock:
+                    services.uploads[token] = length
+                self._send(200, b'')
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                if self.path.rstrip('/') != '/api/job':
+                    self._json({'error': 'not found'}, 404)
+                    return
+                job_id = uuid.uuid4().hex
+                with services._lock:
+                    failed = services._random.random() < services.musicai_failure_rate
+                    services.jobs[job_id] = {
+                        'created': time.time(),
+                        'failed': failed,
+                        'params': payload.get('params', {}),
+                    }
+                self._json({'id': job_id})
+
+            def _playlist_page(self, playlist_id, query):
+                total = services.playlists.get(playlist_id, 0)
+                offset = int(query.get('offset', [0])[0])
+                limit = int(query.get('limit', [100])[0])
+                if services.spotify_latency:
+                    time.sleep(services.spotify_latency)
+                items = [{'track': services.track(playlist_id, i)}
+                         for i in range(offset, min(offset + limit, total))]
+                next_url = None
+                if offset + limit < total:
+                    next_url = (f"{services.base_url}/v1/playlists/{playlist_id}/tracks"
+                                f"?offset={offset + limit}&limit={limit}")
+                self._json({'items': items, 'total': total, 'limit': limit,
+                            'offset': offset, 'next': next_url})
+
+            def _results(self, term):
+                video_id = uuid.uuid5(uuid.NAMESPACE_URL, term).hex[:11]
+                html = (
+                    "<html><body><div id='contents'>"
+                    f"<a id='video-title' href='{services.base_url}/media/{video_id}.wav'>{term}</a>"
+                    "</div></body></html>"
+                )
+                self._send(200, html.encode(), 'text/html; charset=utf-8')
+
+            def _job(self, job_id):
+                with services._lock:
+                    job = services.jobs.get(job_id)
+                if job is None:
+                    self._json({'error': 'not found'}, 404)
+                    return
+                elapsed = time.time() - job['created']
+                if elapsed < services.musicai_latency / 2:
+                    status = 'QUEUED'
+                elif elapsed < services.musicai_latency:
+                    status = 'STARTED'
+                else:
+                    status = 'FAILED' if job['failed'] else 'SUCCEEDED'
+                data = {'id': job_id, 'status': status}
+                if status == 'SUCCEEDED':
+                    data['result'] = {
+                        'Audio': f"{services.base_url}/stems/{job_id}.wav",
+                        'BPM': '120',
+                        'Root key': 'C major',
+                    }
+                elif status == 'FAILED':
+                    data['error'] = 'simulated failure'
+                self._json(data)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> 'FakeServices':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class FakeMusicAiClient:
+    """
+    Cliente com a mesma interface usada do MusicAiClient, apontando para o servidor falso.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def get_application_info(self) -> Dict:
+        return self.session.get(f"{self.base_url}/api/application", timeout=10).json()
+
+    def upload_file(self, file_path: str) -> str:
+        urls = self.session.get(f"{self.base_url}/api/upload", timeout=10).json()
+        with open(file_path, 'rb') as f:
+            self.session.put(urls['uploadUrl'], data=f, timeout=30).raise_for_status()
+        return urls['downloadUrl']
+
+    def create_job(self, job_name: str, workflow_id: str, params: Dict) -> Dict:
+        response = self.session.post(f"{self.base_url}/api/job", timeout=10,
+                                     json={'name': job_name, 'workflow': workflow_id, 'params': params})
+        response.raise_for_status()
+        return response.json()
+
+    def get_job(self, job_id: str) -> Dict:
+        response = self.session.get(f"{self.base_url}/api/job/{job_id}", timeout=10)
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pipeline contra serviços locais (Spotify, YouTube e Music.ai falsos).
+
+Mede, para cada tamanho de carga e cada estágio, a vazão (itens/s), as
+latências p50/p99 por item e o pico de memória (RSS) do processo, e grava o
+resultado em JSON para comparar execuções.
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmarks.run_benchmarks --sizes 10 1000 10000 --output bench.json
+
+Os estágios com navegador e yt-dlp (search, download) exigem Chrome e ffmpeg;
+por serem caros, processam no máximo --heavy-limit itens por carga.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_services import FakeMusicAiClient, FakeServices, make_wav
+
+STAGES = ('spotify', 'search', 'download', 'musicai', 'stems', 'dataset')
+# Taxa usada para os serviços locais: os baldes de rate_limit.py não devem ser o gargalo medido
+BENCH_RATE = 1e9
+BENCH_BURST = 10 ** 6
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """
+    Percentil por interpolação linear (None para lista vazia).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Pico de memória residente do processo em MB (None onde o módulo resource não existe, ex.: Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def timed(func: Callable, latencies: List[float]) -> Callable:
+    """
+    Envolve uma função registrando a duração de cada chamada.
+    """
+    def wrapper(*args, **kwargs):
+        began = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - began)
+    return wrapper
+
+
+@contextmanager
+def patched(obj, attr: str, value):
+    """
+    Substitui temporariamente um atributo de módulo/objeto.
+    """
+    original = getattr(obj, attr)
+    setattr(obj, attr, value)
+    try:
+        yield
+    finally:
+        setattr(obj, attr, original)
+
+
+def summarize(items: int, elapsed: float, latencies: List[float], errors: int = 0, **extra) -> Dict:
+    rss = peak_rss_mb()
+    result = {
+        'items': items,
+        'seconds': round(elapsed, 4),
+        'throughput_per_s': round(items / elapsed, 2) if elapsed > 0 else None,
+        'latency_p50_ms': None if not latencies else round(percentile(latencies, 50) * 1000, 3),
+        'latency_p99_ms': None if not latencies else round(percentile(latencies, 99) * 1000, 3),
+        'errors': errors,
+        'peak_rss_mb': None if rss is None else round(rss, 1),
+    }
+    result.update(extra)
+    return result
+
+
+def unthrottle() -> None:
+    """
+    Troca os baldes de limitação de taxa por baldes praticamente ilimitados.
+
+    Os limites padrão protegem as APIs reais; contra os serviços locais eles
+    mediriam o token bucket, e não o código.
+    """
+    from rate_limit import DEFAULT_RATES, set_rate_limit
+
+    for service in DEFAULT_RATES:
+        set_rate_limit(service, BENCH_RATE, BENCH_BURST)
+
+
+def bench_spotify(services: FakeServices, size: int, context: Dict) -> Dict:
+    import spotipy
+    import tracks
+
+    playlist_id = f"bench{size}"
+    services.add_playlist(playlist_id, size)
+
+    client = spotipy.Spotify(auth='benchmark')
+    client.prefix = f"{services.base_url}/v1/"
+    latencies: List[float] = []
+    client.playlist_items = timed(client.playlist_items, latencies)
+
+    with patched(tracks, '_client', client):
+        began = time.perf_counter()
+        tracks_info, tracks_list = tracks.take_tracks([playlist_id])
+        elapsed = time.perf_counter() - began
+
+    context['tracks_info'] = tracks_info
+    context['tracks_list'] = tracks_list
+    return summarize(len(tracks_list), elapsed, latencies, pages=len(latencies))
+
+
+def _track_names(size: int, context: Dict):
+    names = context.get('tracks_list')
+    if not names:
+        names = [(f"Song bench{size} {i}", f"Artist {i % 97}") for i in range(size)]
+    return names
+
+
+def bench_search(services: FakeServices, size: int, context: Dict, limit: int) -> Dict:
+    import youtuber_catcher
+
+    names = _track_names(size, context)[:limit]
+    latencies: List[float] = []
+    results_url = f"{services.base_url}/results?search_query={{}}"
+    with patched(youtuber_catcher, 'YOUTUBE_RESULTS_URL', results_url), \
+            patched(youtuber_catcher, 'buscar_unico_video', timed(youtuber_catcher.buscar_unico_video, latencies)):
+        began = time.perf_counter()
+        urls = youtuber_catcher.youtube_catcher(names, max_workers=4, use_cache=False)
+        elapsed = time.perf_counter() - began
+
+    context['video_urls'] = [url for _, url in urls if url]
+    return summarize(len(names), elapsed, latencies, errors=sum(1 for _, url in urls if not url))
+
+
+def bench_download(services: FakeServices, size: int, context: Dict, limit: int, workdir: str) -> Dict:
+    import downloader
+
+    urls = context.get('video_urls') or [f"{services.base_url}/media/{i:011d}.wav" for i in range(size)]
+    urls = urls[:limit]
+    latencies: List[float] = []
+    output_dir = os.path.join(workdir, 'audios')
+    with patched(downloader, 'download_single', timed(downloader.download_single, latencies)):
+        began = time.perf_counter()
+        results = downloader.download(urls, output_dir=output_dir, max_workers=4)
+        elapsed = time.perf_counter() - began
+    return summarize(len(urls), elapsed, latencies, errors=sum(1 for ok in results if not ok))
+
+
+def bench_musicai(services: FakeServices, size: int, context: Dict, workdir: str, max_in_flight: int) -> Dict:
+    from musicai_orchestrator import MusicAiOrchestrator
+
+    audio_dir = os.path.join(workdir, 'musicai_inputs')
+    os.makedirs(audio_dir, exist_ok=True)
+    sample = make_wav(0.25)
+    files = []
+    for i in range(size):
+        path = os.path.join(audio_dir, f"track_{i}.mp3")
+        with open(path, 'wb') as f:
+            f.write(sample)
+        files.append(path)
+
+    client = FakeMusicAiClient(services.base_url)
+    began = time.perf_counter()
+    with MusicAiOrchestrator(client=client, max_in_flight=max_in_flight, upload_workers=max_in_flight,
+                             poll_interval=0.05, max_poll_interval=0.5, save_debug=False) as orchestrator:
+        records = list(orchestrator.run(files))
+    elapsed = time.perf_counter() - began
+
+    context['stem_urls'] = [(r.audio_url, r.name) for r in records if r.audio_url]
+    context['analysis'] = [(r.name, r.bpm, r.root_key) for r in records if r.bpm is not None]
+    latencies = [r.latency for r in records if r.latency is not None]
+    queue_times = [r.queue_time for r in records if r.queue_time is not None]
+    failed = sum(1 for r in records if r.status == 'FAILED')
+    return summarize(len(records), elapsed, latencies, errors=failed,
+                     queue_time_p50_ms=None if not queue_times else round(percentile(queue_times, 50) * 1000, 3))
+
+
+def bench_stems(services: FakeServices, size: int, context: Dict, workdir: str) -> Dict:
+    import stem_downloader
+    import stems
+
+    pairs = context.get('stem_urls') or [(f"{services.base_url}/stems/{i}.wav", f"track_{i}") for i in range(size)]
+    retry_queue = stem_downloader.RetryQueue(os.path.join(workdir, 'stem_retry_queue.json'))
+    downloader_instance = stem_downloader.StemDownloader(retry_queue=retry_queue)
+    latencies: List[float] = []
+    output_dir = os.path.join(workdir, 'guitar_stems')
+
+    with patched(stem_downloader, '_downloader', downloader_instance), \
+            patched(stems, 'download_stem', timed(stems.download_stem, latencies)):
+        began = time.perf_counter()
+        results = stems.download_stems_parallel(pairs, output_dir=output_dir, max_workers=16)
+        elapsed = time.perf_counter() - began
+    downloader_instance.close()
+    return summarize(len(pairs), elapsed, latencies, errors=sum(1 for path in results if not path))
+
+
+def bench_dataset(size: int, context: Dict, workdir: str) -> Dict:
+    from matcher import TrackMatcher, top_indices
+    from track_store import TrackStore
+
+    tracks_info = context.get('tracks_info')
+    if not tracks_info:
+        tracks_info = {
+            'id': [f"bench{size}{i:07d}" for i in range(size)],
+            'nome': [f"Song bench{size} {i}" for i in range(size)],
+            'artistas': [f"Artist {i % 97}" for i in range(size)],
+        }
+
+    store = TrackStore(os.path.join(workdir, f"bench_{size}.db"))
+    latencies: List[float] = []
+    began = time.perf_counter()
+    store.upsert_tracks(tracks_info)
+    df = store.load_dataframe()
+    matcher = TrackMatcher.from_dataframe(df)
+
+    # Nomes no formato "Artista - Título (Official Video)", como os arquivos baixados
+    names = [f"{artist} - {name} (Official Video)"
+             for name, artist in zip(tracks_info['nome'], tracks_info['artistas'])]
+    updated = 0
+    unmatched = 0
+    for name in names:
+        item_began = time.perf_counter()
+        idx = top_indices(matcher.match(name))
+        for i in idx:
+            store.stage_analysis(df.at[i, 'id'], 120.0, 'C major', None)
+        updated += len(idx)
+        unmatched += not idx
+        latencies.append(time.perf_counter() - item_began)
+    store.flush()
+    elapsed = time.perf_counter() - began
+    store.close()
+    return summarize(len(names), elapsed, latencies, errors=unmatched, rows_updated=updated)
+
+
+def run(sizes: List[int], stages: List[str], heavy_limit: int, musicai_latency: float,
+        musicai_failure_rate: float, max_in_flight: int, rate_limits: bool = False) -> Dict:
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'heavy_limit': heavy_limit,
+            'musicai_latency': musicai_latency,
+            'musicai_failure_rate': musicai_failure_rate,
+            'max_in_flight': max_in_flight,
+            'rate_limits': rate_limits,
+        },
+        'workloads': {},
+    }
+
+    with FakeServices(musicai_latency=musicai_latency, musicai_failure_rate=musicai_failure_rate) as services:
+        for size in sizes:
+            print(f"Carga de {size} faixas...")
+            context: Dict = {}
+            workload = {}
+            with tempfile.TemporaryDirectory(prefix=f"bench_{size}_") as workdir:
+                for stage in stages:
+                    if not rate_limits:
+                        # Antes de cada estágio: um estágio anterior pode ter penalizado um balde
+                        unthrottle()
+                    try:
+                        if stage == 'spotify':
+                            workload[stage] = bench_spotify(services, size, context)
+                        elif stage == 'search':
+                            workload[stage] = bench_search(services, size, context, heavy_limit)
+                        elif stage == 'download':
+                            workload[stage] = bench_download(services, size, context, heavy_limit, workdir)
+                        elif stage == 'musicai':
+                            workload[stage] = bench_musicai(services, size, context, workdir, max_in_flight)
+                        elif stage == 'stems':
+                            workload[stage] = bench_stems(services, size, context, workdir)
+                        elif stage == 'dataset':
+                            workload[stage] = bench_dataset(size, context, workdir)
+                    except Exception as e:
+                        # Ex.: Chrome ou ffmpeg ausentes na máquina
+                        workload[stage] = {'skipped': f"{type(e).__name__}: {e}"}
+                    print(f"  {stage}: {workload[stage]}")
+            report['workloads'][str(size)] = workload
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline contra serviços locais")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--heavy-limit', type=int, default=50,
+                        help="Máximo de itens nos estágios com navegador/yt-dlp")
+    parser.add_argument('--musicai-latency', type=float, default=0.2)
+    parser.add_argument('--musicai-failure-rate', type=float, default=0.02)
+    parser.add_argument('--max-in-flight', type=int, default=32)
+    parser.add_argument('--rate-limits', action='store_true',
+                        help="Manter os limites de taxa padrão de rate_limit.py (desativados por padrão)")
+    parser.add_argument('--output', help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.stages, args.heavy_limit, args.musicai_latency,
+                 args.musicai_failure_rate, args.max_in_flight, args.rate_limits)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"Relatório salvo em {args.output}")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
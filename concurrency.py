@@ -0,0 +1,297 @@
+"""
+Controle adaptativo de concorrência (AIMD) para downloads e chamadas de API.
+
+Cada subsistema (busca, download, Music.ai, stems) tem o seu AdaptiveLimiter,
+obtido por `get_limiter(nome)`. O limite de operações simultâneas cresce de
+forma aditiva enquanto as operações terminam bem e a latência se mantém, e cai
+de forma multiplicativa com erros, HTTP 429 ou aumento da latência:
+
+    limiter = get_limiter('download', initial=4, max_limit=32)
+    with limiter.slot() as permit:
+        ...
+        if resposta_429:
+            permit.throttled()
+
+O código chamado dentro de um slot pode sinalizar falhas sem receber o permit,
+com `note_error(exc)` (o permit ativo da thread é marcado).
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+_THROTTLE_MARKERS = ('429', 'too many requests', 'rate limit', 'ratelimit', 'quota')
+
+_active = threading.local()
+
+
+def is_throttle_error(error) -> bool:
+    """
+    Indica se uma exceção ou mensagem de erro corresponde a limitação de taxa (ex.: HTTP 429).
+    """
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _THROTTLE_MARKERS)
+
+
+class Permit:
+    """
+    Vaga obtida de um AdaptiveLimiter; registra o desfecho da operação.
+    """
+
+    def __init__(self, limiter: 'AdaptiveLimiter'):
+        self.limiter = limiter
+        self.error = False
+        self.throttle = False
+        self._began = time.perf_counter()
+
+    def fail(self) -> None:
+        """Marca a operação como falha (reduz o limite de forma moderada)."""
+        self.error = True
+
+    def throttled(self) -> None:
+        """Marca a operação como limitada pelo servidor (reduz o limite pela metade)."""
+        self.throttle = True
+
+    def release(self) -> None:
+        self.limiter.release(time.perf_counter() - self._began, error=self.error, throttled=self.throttle)
+
+
+def note_error(error) -> None:
+    """
+    Marca o permit ativo nesta thread (se houver) como falha ou como limitação de taxa.
+
+    Args:
+        error: Exceção ou mensagem de erro da operação
+    """
+    permit = getattr(_active, 'permit', None)
+    if permit is None:
+        return
+    if is_throttle_error(error):
+        permit.throttled()
+    else:
+        permit.fail()
+
+
+class AdaptiveLimiter:
+    """
+    Limite de concorrência ajustado por AIMD (aumento aditivo, redução multiplicativa).
+
+    - Sucesso: o limite cresce 1/limite (cerca de +1 a cada "janela" de operações).
+    - Latência recente acima de latency_tolerance × latência de referência: limite × latency_backoff.
+    - Erro: limite × error_backoff.
+    - HTTP 429/limitação de taxa: limite × throttle_backoff.
+
+    Reduções seguidas dentro de um intervalo de latência contam uma única vez, para que uma
+    rajada de falhas simultâneas não derrube o limite até o mínimo.
+    """
+
+    def __init__(self, name: str, initial: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 latency_tolerance: float = 2.0, latency_backoff: float = 0.9,
+                 error_backoff: float = 0.9, throttle_backoff: float = 0.5):
+        """
+        Args:
+            name: Nome do subsistema (aparece no relatório)
+            initial: Limite inicial de operações simultâneas
+            min_limit: Limite mínimo
+            max_limit: Limite máximo (também é o tamanho do pool de threads que o usa)
+            latency_tolerance: Razão entre a latência recente e a de referência que indica sobrecarga
+            latency_backoff: Fator aplicado ao limite quando a latência sobe
+            error_backoff: Fator aplicado ao limite em um erro
+            throttle_backoff: Fator aplicado ao limite em uma limitação de taxa (HTTP 429)
+        """
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.latency_tolerance = latency_tolerance
+        self.latency_backoff = latency_backoff
+        self.error_backoff = error_backoff
+        self.throttle_backoff = throttle_backoff
+
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.lowest_limit = self.limit
+        self.successes = 0
+        self.errors = 0
+        self.throttled = 0
+        self.decreases = 0
+        self._short_latency: Optional[float] = None
+        self._long_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera uma vaga dentro do limite atual.
+
+        Returns:
+            True se a vaga foi obtida (False se o timeout expirar)
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: Optional[float] = None, error: bool = False, throttled: bool = False) -> None:
+        """
+        Devolve uma vaga e ajusta o limite de acordo com o desfecho da operação.
+
+        Args:
+            latency: Duração da operação em segundos
+            error: A operação falhou
+            throttled: O servidor limitou a taxa (ex.: HTTP 429)
+        """
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                self._decrease(self.throttle_backoff, now)
+            elif error:
+                self.errors += 1
+                self._decrease(self.error_backoff, now)
+            else:
+                self.successes += 1
+                if latency is not None:
+                    self._short_latency = latency if self._short_latency is None else \
+                        0.7 * self._short_latency + 0.3 * latency
+                    self._long_latency = latency if self._long_latency is None else \
+                        0.98 * self._long_latency + 0.02 * latency
+                if self._overloaded():
+                    self._decrease(self.latency_backoff, now)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+            self._cond.notify_all()
+
+    def _overloaded(self) -> bool:
+        if self._short_latency is None or self._long_latency is None or self.successes < 10:
+            return False
+        return self._short_latency > self.latency_tolerance * self._long_latency
+
+    def _decrease(self, factor: float, now: float) -> None:
+        cooldown = max(0.5, self._short_latency or 0.0)
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        self.limit = max(self.min_limit, self.limit * factor)
+        self.lowest_limit = min(self.lowest_limit, self.limit)
+
+    @contextmanager
+    def slot(self) -> Iterator[Permit]:
+        """
+        Executa um trecho dentro de uma vaga do limitador.
+
+        Exceções contam como falha (ou como limitação de taxa, se indicarem HTTP 429) e são relançadas.
+        """
+        self.acquire()
+        permit = Permit(self)
+        previous = getattr(_active, 'permit', None)
+        _active.permit = permit
+        try:
+            yield permit
+        except Exception as e:
+            if is_throttle_error(e):
+                permit.throttled()
+            else:
+                permit.fail()
+            raise
+        finally:
+            _active.permit = previous
+            permit.release()
+
+    def wrap(self, func, falsy_is_error: bool = True):
+        """
+        Envolve uma função para que cada chamada ocupe uma vaga do limitador.
+
+        Args:
+            func: Função a envolver
+            falsy_is_error: Contar um retorno falso (None/False) como falha; use False quando
+                None é um resultado legítimo (ex.: busca sem resultado) e as falhas chegam como
+                exceção, que o limitador conta (ou trata como 429) e relança
+        """
+        def wrapper(*args, **kwargs):
+            with self.slot() as permit:
+                result = func(*args, **kwargs)
+                if falsy_is_error and not result:
+                    permit.fail()
+                return result
+        return wrapper
+
+    def set_max_limit(self, max_limit: int) -> None:
+        """
+        Altera o limite máximo, trazendo o limite atual para dentro dele.
+
+        O limite aprendido é mantido quando cabe no novo teto; um teto maior só
+        libera espaço para o aumento aditivo.
+        """
+        with self._cond:
+            self.max_limit = max(self.min_limit, max_limit)
+            self.limit = min(self.limit, self.max_limit)
+            self.lowest_limit = min(self.lowest_limit, self.limit)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Estado atual do limitador.
+        """
+        with self._cond:
+            return {
+                'limit': int(self.limit),
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'peak_limit': int(self.peak_limit),
+                'lowest_limit': int(self.lowest_limit),
+                'in_flight': self.in_flight,
+                'successes': self.successes,
+                'errors': self.errors,
+                'throttled': self.throttled,
+                'decreases': self.decreases,
+            }
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str, **kwargs) -> AdaptiveLimiter:
+    """
+    Retorna o limitador do subsistema, criando-o na primeira chamada.
+
+    Args:
+        name: Nome do subsistema (ex.: 'download', 'search', 'musicai', 'stems')
+        **kwargs: Parâmetros de AdaptiveLimiter, usados na criação; depois dela só
+            max_limit é aplicado ao limitador existente (ver set_max_limit)
+
+    Returns:
+        Limitador compartilhado pelo processo
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(name, **kwargs)
+        elif 'max_limit' in kwargs and kwargs['max_limit'] != _limiters[name].max_limit:
+            # O teto pedido pela chamada (ex.: pool_size da busca) vale também para um limitador já criado
+            _limiters[name].set_max_limit(kwargs['max_limit'])
+        return _limiters[name]
+
+
+def limiter_report() -> Dict[str, Dict[str, float]]:
+    """
+    Imprime e retorna o limite escolhido por cada subsistema.
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    report = {}
+    for limiter in limiters:
+        stats = limiter.stats()
+        report[limiter.name] = stats
+        print(f"Concorrência {limiter.name}: limite {stats['limit']} (pico {stats['peak_limit']}, "
+              f"mínimo {stats['lowest_limit']}), {stats['successes']} ok, {stats['errors']} erros, "
+              f"{stats['throttled']} limitações de taxa")
+    return report
@@ -1,63 +1,182 @@
 import yt_dlp
 import os
 import concurrent.futures
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple, Union
+from concurrency import AdaptiveLimiter, get_limiter, note_error
+from metrics import METRICS
+from rate_limit import get_rate_limiter, note_throttle
+from track_manifest import AUDIO_EXTENSIONS, write_manifest
 
-def download_single(url: str, ydl_opts: dict) -> bool:
+# Modos de aquisição do áudio (ver build_ydl_opts)
+AUDIO_MODES = ('mp3', 'native', 'analysis')
+
+def download_single(url: str, ydl_opts: dict, track_id: Optional[str] = None) -> bool:
     """
     Baixa um único vídeo do YouTube.
     
     Args:
         url: URL do vídeo
         ydl_opts: Opções para o yt-dlp
+        track_id: id do Spotify; se informado, o arquivo é salvo como <id>.<ext> com manifesto
         
     Returns:
         True se o download foi bem-sucedido, False caso contrário
     """
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        return True
-    except Exception as e:
-        print(f"Erro ao baixar {url}: {e}")
-        return False
+    if track_id:
+        output_dir = os.path.dirname(ydl_opts['outtmpl'])
+        return download_track(url, output_dir, ydl_opts, track_id=track_id) is not None
+    with METRICS.span('download', track=url) as span:
+        get_rate_limiter('youtube_download').acquire()
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                ydl.download([url])
+            return True
+        except Exception as e:
+            span.fail(f"{type(e).__name__}: {e}")
+            note_error(e)
+            note_throttle('youtube_download', e)
+            print(f"Erro ao baixar {url}: {e}")
+            return False
 
-def download(urls: List[str], output_dir: str = "audios", max_workers: int = 2) -> List[bool]:
+def build_ydl_opts(output_dir: str = "audios", mode: str = "mp3") -> dict:
     """
-    Baixa múltiplos vídeos do YouTube em paralelo.
+    Monta as opções do yt-dlp para baixar o áudio.
+    
+    Modos:
+        - "mp3": recodifica o melhor áudio para MP3 192 kbps (comportamento original)
+        - "native": mantém o codec do YouTube (opus ou AAC), só trocando o contêiner
+          (.opus/.m4a) por cópia do stream, sem recodificar
+        - "analysis": como "native", mas escolhe o menor formato adequado para
+          análise de BPM/tonalidade (até ~96 kbps)
     
     Args:
-        urls: Lista de URLs dos vídeos
         output_dir: Diretório para salvar os arquivos baixados
-        max_workers: Número máximo de downloads simultâneos
+        mode: "mp3", "native" ou "analysis"
         
     Returns:
-        Lista de resultados (True para sucesso, False para falha)
+        Dicionário de opções do yt-dlp
     """
-    # Cria o diretório se não existir
-    os.makedirs(output_dir, exist_ok=True)
+    if mode not in AUDIO_MODES:
+        raise ValueError(f"Modo de áudio desconhecido: {mode!r}. Use um de {AUDIO_MODES}")
     
     # Define o caminho completo para o arquivo de saída
     output_path = os.path.join(output_dir, '%(title)s.%(ext)s')
     
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'postprocessors': [{
+    if mode == 'mp3':
+        audio_format = 'bestaudio/best'
+        postprocessor = {
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
             'preferredquality': '192',
-        }],
+        }
+    else:
+        if mode == 'native':
+            audio_format = 'bestaudio/best'
+        else:
+            # Menor stream de áudio com qualidade suficiente para a análise
+            audio_format = 'bestaudio[abr<=96]/worstaudio[abr>=48]/bestaudio/best'
+        # "best" extrai o stream original (ffmpeg -acodec copy), sem recodificar
+        postprocessor = {
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'best',
+        }
+    
+    return {
+        'format': audio_format,
+        'postprocessors': [postprocessor],
         'outtmpl': output_path,  # Caminho completo incluindo a pasta
         'quiet': True,  # Reduzir saída no console
         'no_warnings': True,  # Não mostrar avisos
     }
+
+def _final_path(ydl: yt_dlp.YoutubeDL, info: dict) -> str:
+    """
+    Caminho final do áudio, já considerando os pós-processadores (ex.: conversão para MP3).
+    """
+    downloads = info.get('requested_downloads') or []
+    if downloads and downloads[0].get('filepath'):
+        return downloads[0]['filepath']
+    base, original_ext = os.path.splitext(ydl.prepare_filename(info))
+    for ext in AUDIO_EXTENSIONS:
+        if os.path.exists(f"{base}{ext}"):
+            return f"{base}{ext}"
+    return f"{base}{original_ext}"
+
+def download_track(url: str, output_dir: str = "audios", ydl_opts: Optional[dict] = None,
+                   track_id: Optional[str] = None, mode: str = "mp3", **manifest_fields) -> Optional[str]:
+    """
+    Baixa um único vídeo do YouTube e retorna o caminho do arquivo de áudio gerado.
+    
+    Args:
+        url: URL do vídeo
+        output_dir: Diretório para salvar o arquivo
+        ydl_opts: Opções para o yt-dlp (padrão: build_ydl_opts(output_dir, mode))
+        track_id: id do Spotify; o arquivo é salvo como <id>.<ext>, com o manifesto <id>.json ao lado
+        mode: Modo de aquisição quando ydl_opts é omitido: "mp3", "native" ou "analysis"
+        **manifest_fields: Campos extras gravados no manifesto (ex.: nome, artista)
+        
+    Returns:
+        Caminho do arquivo baixado ou None em caso de erro
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    ydl_opts = ydl_opts or build_ydl_opts(output_dir, mode)
+    if track_id:
+        # Nome pelo id do Spotify, em vez do título do vídeo
+        ydl_opts = dict(ydl_opts, outtmpl=os.path.join(output_dir, f'{track_id}.%(ext)s'))
+    with METRICS.span('download', track=track_id or url) as span:
+        get_rate_limiter('youtube_download').acquire()
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=True)
+                path = _final_path(ydl, info)
+            if os.path.exists(path):
+                span.add_bytes(os.path.getsize(path))
+            if track_id:
+                write_manifest(path, track_id, youtube_url=url, title=info.get('title'), **manifest_fields)
+            return path
+        except Exception as e:
+            span.fail(f"{type(e).__name__}: {e}")
+            note_error(e)
+            note_throttle('youtube_download', e)
+            print(f"Erro ao baixar {url}: {e}")
+            return None
+
+def download(urls: Sequence[Union[str, Tuple[Optional[str], Optional[str]]]], output_dir: str = "audios",
+             max_workers: int = 2, max_limit: int = 16,
+             limiter: Optional[AdaptiveLimiter] = None, mode: str = "mp3") -> List[bool]:
+    """
+    Baixa múltiplos vídeos do YouTube em paralelo.
+    
+    Args:
+        urls: Lista de URLs dos vídeos, ou de pares (id do Spotify, URL) como os retornados
+            por youtube_catcher; com o id, o arquivo é nomeado por ele
+        output_dir: Diretório para salvar os arquivos baixados
+        max_workers: Número inicial de downloads simultâneos; o limite cresce enquanto a
+            latência se mantém e cai com erros ou HTTP 429
+        max_limit: Máximo de downloads simultâneos
+        limiter: Limitador a usar (padrão: o limitador compartilhado 'download')
+        mode: "mp3" (recodifica), "native" (codec original, sem recodificar) ou
+            "analysis" (menor formato adequado para análise, sem recodificar)
+        
+    Returns:
+        Lista de resultados (True para sucesso, False para falha)
+    """
+    # Cria o diretório se não existir
+    os.makedirs(output_dir, exist_ok=True)
+    
+    ydl_opts = build_ydl_opts(output_dir, mode)
     
     resultados = []
     
-    # Limitamos o número de workers para não sobrecarregar a conexão
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+    # O limitador adaptativo decide quantos downloads rodam ao mesmo tempo
+    limiter = limiter or get_limiter('download', initial=max_workers, max_limit=max(max_workers, max_limit))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=limiter.max_limit) as executor:
         # Submeter todos os downloads
-        futures = [executor.submit(download_single, url, ydl_opts) for url in urls]
+        futures = []
+        for entry in urls:
+            track_id, url = entry if isinstance(entry, tuple) else (None, entry)
+            if url:
+                futures.append(executor.submit(limiter.wrap(download_single), url, ydl_opts, track_id))
         
         # Coletar os resultados e mostrar progresso
         total = len(futures)
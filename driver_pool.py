@@ -0,0 +1,188 @@
+"""
+Pool de drivers do Chrome (headless) reutilizáveis.
+
+Abrir um navegador custa segundos; o pool mantém um número limitado de drivers
+vivos que as threads de busca pegam emprestado e devolvem. Um driver é
+reciclado após um número máximo de consultas ou quando falha na verificação
+de saúde.
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+
+
+def build_chrome_options() -> Options:
+    """
+    Cria as opções padrão do Chrome headless usadas nas buscas.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--headless")  # Executar em modo headless para maior eficiência
+    # Não esperar imagens e outros recursos além do DOM
+    chrome_options.page_load_strategy = 'eager'
+    chrome_options.add_experimental_option(
+        "prefs", {"profile.managed_default_content_settings.images": 2}
+    )
+    return chrome_options
+
+
+class PooledDriver:
+    """
+    Driver do Chrome com contador de uso.
+    """
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.uses = 0
+        # Indica se o banner de cookies já foi tratado nesta sessão
+        self.consent_handled = False
+
+
+class DriverPool:
+    """
+    Pool limitado de drivers do Chrome de longa duração.
+
+    Os drivers são criados sob demanda, até `size`. Quem pega um driver deve
+    devolvê-lo com `release` (ou usar o gerenciador de contexto `driver()`).
+    """
+
+    def __init__(self, size: int = 2, max_uses: int = 50,
+                 options_factory: Callable[[], Options] = build_chrome_options):
+        """
+        Args:
+            size: Número máximo de navegadores abertos ao mesmo tempo
+            max_uses: Número de consultas após o qual um driver é reciclado
+            options_factory: Função que cria as opções do Chrome
+        """
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.options_factory = options_factory
+        self._idle: "queue.LifoQueue[PooledDriver]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._all = set()
+        self._closed = False
+        self.created = 0
+        self.recycled = 0
+
+    def _create(self) -> PooledDriver:
+        pooled = PooledDriver(webdriver.Chrome(options=self.options_factory()))
+        with self._lock:
+            self._all.add(pooled)
+            self.created += 1
+        return pooled
+
+    def _destroy(self, pooled: PooledDriver) -> None:
+        with self._lock:
+            self._all.discard(pooled)
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def is_healthy(pooled: PooledDriver) -> bool:
+        """
+        Verifica se a sessão do navegador ainda responde.
+        """
+        try:
+            pooled.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+        except Exception:
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledDriver:
+        """
+        Pega um driver do pool, criando um novo se houver vaga.
+
+        Args:
+            timeout: Tempo máximo de espera por um driver livre (None espera indefinidamente)
+
+        Returns:
+            Driver emprestado
+        """
+        if self._closed:
+            raise RuntimeError("DriverPool já foi fechado")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Nenhum driver disponível no pool")
+        try:
+            while True:
+                try:
+                    pooled = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._create()
+                if self.is_healthy(pooled):
+                    return pooled
+                # Driver morto: descartar e tentar o próximo
+                self._destroy(pooled)
+                self.recycled += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, pooled: PooledDriver, failed: bool = False) -> None:
+        """
+        Devolve um driver ao pool.
+
+        Args:
+            pooled: Driver emprestado
+            failed: Se a sessão falhou (o driver é descartado se não estiver saudável)
+        """
+        try:
+            pooled.uses += 1
+            recycle = (
+                self._closed
+                or pooled.uses >= self.max_uses
+                or (failed and not self.is_healthy(pooled))
+            )
+            if recycle:
+                self._destroy(pooled)
+                if not self._closed:
+                    self.recycled += 1
+            else:
+                self._idle.put(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None) -> Iterator[PooledDriver]:
+        """
+        Gerenciador de contexto que pega e devolve um driver.
+        """
+        pooled = self.acquire(timeout)
+        failed = False
+        try:
+            yield pooled
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(pooled, failed=failed)
+
+    def close(self) -> None:
+        """
+        Fecha todos os navegadores abertos.
+        """
+        self._closed = True
+        with self._lock:
+            drivers = list(self._all)
+        for pooled in drivers:
+            self._destroy(pooled)
+
+    def __enter__(self) -> 'DriverPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Índice de similaridade entre faixas por características de áudio.
+
+Cada faixa ganha um vetor de tamanho fixo (estatísticas de MFCC e croma do áudio
+baixado), e os vetores ficam em uma única matriz float32 contígua
+(`index/features.npy`), aberta por memory-map: consultar o índice não carrega a
+matriz inteira na memória de cada processo. Os ids do Spotify de cada linha
+ficam em `index/ids.json`.
+
+Os vetores têm norma 1, então a similaridade é o produto interno e uma consulta
+em lote é um único produto de matrizes (BLAS) seguido de `argpartition` para os
+k melhores. A matriz é criada com folga e dobra de tamanho quando enche, de modo
+que acrescentar faixas não reescreve o arquivo a cada inclusão.
+
+    python feature_index.py build [audios]
+    python feature_index.py similar <id do Spotify> [k]
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import threading
+import concurrent.futures
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from track_manifest import is_audio_file, is_spotify_id, track_id_for
+from track_store import DEFAULT_DB_PATH
+
+DEFAULT_INDEX_DIR = 'index'
+
+EMBEDDING_SR = 22050
+# Trecho usado para as estatísticas (a partir de EMBEDDING_OFFSET segundos, quando a faixa permite)
+EMBEDDING_OFFSET = 30.0
+EMBEDDING_DURATION = 90.0
+N_MFCC = 20
+# Médias e desvios de MFCC (sem o coeficiente 0, que só mede o volume) e de croma
+EMBEDDING_DIM = 2 * (N_MFCC - 1) + 2 * 12
+# Linhas reservadas ao criar o arquivo da matriz
+INITIAL_CAPACITY = 1024
+
+
+def _unit(block: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(block)
+    return block / norm if norm > 1e-9 else block
+
+
+def embedding_from_signal(y: np.ndarray, sr: int) -> np.ndarray:
+    """
+    Vetor de características de um sinal mono.
+
+    Cada bloco (média de MFCC, desvio de MFCC, média de croma, desvio de croma) é
+    normalizado separadamente, para que nenhum domine pela escala, e o vetor
+    final tem norma 1.
+
+    Args:
+        y: Sinal mono
+        sr: Taxa de amostragem
+
+    Returns:
+        Vetor float32 com EMBEDDING_DIM posições
+    """
+    import librosa
+
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=N_MFCC)[1:]
+    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+    blocks = [mfcc.mean(axis=1), mfcc.std(axis=1), chroma.mean(axis=1), chroma.std(axis=1)]
+    embedding = np.concatenate([_unit(block) for block in blocks]) / np.sqrt(len(blocks))
+    return embedding.astype(np.float32)
+
+
+def extract_embedding(file_path: str) -> Optional[np.ndarray]:
+    """
+    Calcula o vetor de características de um arquivo de áudio (ou stem).
+
+    Função de nível de módulo para poder ser enviada a um ProcessPoolExecutor.
+
+    Args:
+        file_path: Caminho do arquivo de áudio
+
+    Returns:
+        Vetor float32 com EMBEDDING_DIM posições, ou None se o áudio não puder ser lido
+    """
+    import librosa
+
+    try:
+        duration = librosa.get_duration(path=file_path)
+        offset = EMBEDDING_OFFSET if duration > EMBEDDING_OFFSET + EMBEDDING_DURATION / 2 else 0.0
+        y, sr = librosa.load(file_path, sr=EMBEDDING_SR, mono=True, offset=offset, duration=EMBEDDING_DURATION)
+        if y.size == 0:
+            return None
+        return embedding_from_signal(y, sr)
+    except Exception as e:
+        print(f"Erro ao extrair características de {file_path}: {e}")
+        return None
+
+
+class FeatureIndex:
+    """
+    Matriz de vetores por faixa, em memory-map, com consultas top-k em lote.
+
+    Seguro para uso entre threads; apenas um processo deve acrescentar faixas por vez.
+    """
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR):
+        """
+        Args:
+            directory: Diretório com features.npy e ids.json
+        """
+        self.directory = directory
+        self.matrix_path = os.path.join(directory, 'features.npy')
+        self.ids_path = os.path.join(directory, 'ids.json')
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Abre a matriz em memory-map (somente leitura) e carrega os ids das linhas.
+
+        Raises:
+            ValueError: Se o índice foi gravado com vetores de outro tamanho (versão
+                anterior das características)
+        """
+        if not os.path.exists(self.ids_path) or not os.path.exists(self.matrix_path):
+            return
+        with open(self.ids_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        matrix = np.load(self.matrix_path, mmap_mode='r')
+        dim = data.get('dim', matrix.shape[1] if matrix.ndim == 2 else None)
+        if dim != EMBEDDING_DIM or matrix.ndim != 2 or matrix.shape[1] != EMBEDDING_DIM:
+            del matrix
+            raise ValueError(f"Índice {self.directory} tem vetores de {dim} posições, mas a versão atual "
+                             f"usa {EMBEDDING_DIM}. Apague o diretório e rode 'python feature_index.py build'.")
+        self.ids = data['ids']
+        self._rows = {track_id: row for row, track_id in enumerate(self.ids)}
+        self._matrix = matrix
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self._rows
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Vetores das faixas indexadas (linhas na ordem de `ids`)."""
+        if self._matrix is None:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        return self._matrix[:len(self.ids)]
+
+    def _writable(self, needed: int) -> np.ndarray:
+        """
+        Abre a matriz para escrita, dobrando a capacidade do arquivo se necessário.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if self._matrix is not None and needed <= self._matrix.shape[0]:
+            return np.load(self.matrix_path, mmap_mode='r+')
+
+        capacity = max(INITIAL_CAPACITY, 2 * (self._matrix.shape[0] if self._matrix is not None else 0))
+        while capacity < needed:
+            capacity *= 2
+        tmp_path = f"{self.matrix_path}.tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                          shape=(capacity, EMBEDDING_DIM))
+        grown[:len(self.ids)] = self.matrix
+        grown.flush()
+        del grown
+        # No Windows um arquivo mapeado não pode ser substituído: soltar o memory-map antes
+        self._matrix = None
+        try:
+            os.replace(tmp_path, self.matrix_path)
+        finally:
+            if os.path.exists(self.matrix_path):
+                self._matrix = np.load(self.matrix_path, mmap_mode='r')
+        return np.load(self.matrix_path, mmap_mode='r+')
+
+    def add(self, track_ids: Sequence[str], embeddings: np.ndarray) -> int:
+        """
+        Acrescenta (ou substitui) os vetores de faixas.
+
+        Args:
+            track_ids: ids do Spotify
+            embeddings: Matriz (len(track_ids), EMBEDDING_DIM)
+
+        Returns:
+            Número de faixas novas no índice
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(track_ids), EMBEDDING_DIM)
+        with self._lock:
+            new_ids = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in self._rows]
+            writable = self._writable(len(self.ids) + len(new_ids))
+            for track_id in new_ids:
+                self._rows[track_id] = len(self.ids)
+                self.ids.append(track_id)
+            rows = [self._rows[track_id] for track_id in track_ids]
+            writable[rows] = embeddings
+            writable.flush()
+            del writable
+            self._save_ids()
+            self._matrix = np.load(self.matrix_path, mmap_mode='r')
+        return len(new_ids)
+
+    def _save_ids(self) -> None:
+        # Gravado depois da matriz: uma queda no meio deixa linhas sobrando, nunca ids sem vetor
+        tmp_path = f"{self.ids_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'dim': EMBEDDING_DIM, 'ids': self.ids}, f)
+        os.replace(tmp_path, self.ids_path)
+
+    def vector(self, track_id: str) -> Optional[np.ndarray]:
+        """Vetor de uma faixa indexada (None se ela não estiver no índice)."""
+        row = self._rows.get(track_id)
+        return None if row is None else np.array(self.matrix[row])
+
+    def query(self, vectors: np.ndarray, k: int = 10,
+              exclude: Optional[Sequence[Optional[str]]] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Busca as k faixas mais parecidas com cada vetor de consulta.
+
+        Args:
+            vectors: Matriz (consultas, EMBEDDING_DIM) ou um único vetor
+            k: Número de vizinhos por consulta
+            exclude: id a omitir em cada consulta (ex.: a própria faixa), na ordem das consultas
+
+        Returns:
+            Para cada consulta, lista de (id do Spotify, similaridade) em ordem decrescente
+        """
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        matrix = self.matrix
+        if len(matrix) == 0:
+            return [[] for _ in queries]
+        scores = queries @ matrix.T
+        if exclude is not None:
+            for i, track_id in enumerate(exclude):
+                if track_id in self._rows:
+                    scores[i, self._rows[track_id]] = -np.inf
+
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [[(self.ids[row], float(score)) for row, score in zip(rows, row_scores) if np.isfinite(score)]
+                for rows, row_scores in zip(top, top_scores)]
+
+    def similar_to(self, track_ids: Sequence[str], k: int = 10) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        Faixas mais parecidas com faixas já indexadas (sem incluir a própria faixa).
+
+        Args:
+            track_ids: ids do Spotify consultados
+            k: Número de vizinhos por faixa
+
+        Returns:
+            Dicionário {id consultado: [(id, similaridade)]}; ids fora do índice são omitidos
+        """
+        known = [track_id for track_id in track_ids if track_id in self._rows]
+        if not known:
+            return {}
+        rows = [self._rows[track_id] for track_id in known]
+        results = self.query(self.matrix[rows], k, exclude=known)
+        return dict(zip(known, results))
+
+
+def build_index(audio_paths: Sequence[str], index: Optional[FeatureIndex] = None,
+                max_workers: Optional[int] = None, batch_size: int = 64) -> int:
+    """
+    Acrescenta ao índice as faixas dos áudios que ainda não estão nele.
+
+    O id de cada áudio vem do manifesto (ou do nome do arquivo); áudios antigos,
+    nomeados pelo título do vídeo, são ignorados.
+
+    Args:
+        audio_paths: Arquivos de áudio
+        index: Índice a atualizar (padrão: index/)
+        max_workers: Processos de extração (padrão: um por núcleo)
+        batch_size: Faixas gravadas no índice por vez
+
+    Returns:
+        Número de faixas acrescentadas
+    """
+    index = index or FeatureIndex()
+    pending = {}
+    for path in audio_paths:
+        track_id = track_id_for(path)
+        if is_spotify_id(track_id) and track_id not in index and track_id not in pending:
+            pending[track_id] = path
+    if not pending:
+        return 0
+
+    added = 0
+    ids, vectors = [], []
+    # Extração é CPU-bound: um processo por núcleo
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        for track_id, embedding in zip(pending, executor.map(extract_embedding, pending.values())):
+            if embedding is None:
+                continue
+            ids.append(track_id)
+            vectors.append(embedding)
+            if len(ids) >= batch_size:
+                added += index.add(ids, np.stack(vectors))
+                ids, vectors = [], []
+    if ids:
+        added += index.add(ids, np.stack(vectors))
+    return added
+
+
+def _track_names(track_ids: Sequence[str], db_path: str = DEFAULT_DB_PATH) -> Dict[str, str]:
+    """Nome e artistas das faixas no banco, para exibição."""
+    if not os.path.exists(db_path):
+        return {}
+    conn = sqlite3.connect(db_path)
+    try:
+        placeholders = ','.join('?' * len(track_ids))
+        rows = conn.execute(f"SELECT id, nome, artistas FROM tracks WHERE id IN ({placeholders})",
+                            list(track_ids)).fetchall()
+    finally:
+        conn.close()
+    return {track_id: f"{nome} - {artistas}" for track_id, nome, artistas in rows}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+    if command == 'build':
+        directory = sys.argv[2] if len(sys.argv) > 2 else 'audios'
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if is_audio_file(name)]
+        index = FeatureIndex()
+        print(f"{build_index(paths, index)} faixas acrescentadas ({len(index)} no índice).")
+    elif command == 'similar' and len(sys.argv) > 2:
+        track_id = sys.argv[2]
+        k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+        neighbours = FeatureIndex().similar_to([track_id], k).get(track_id)
+        if neighbours is None:
+            print(f"Faixa {track_id} não está no índice.")
+        else:
+            names = _track_names([track_id] + [other for other, _ in neighbours])
+            print(f"Parecidas com {names.get(track_id, track_id)}:")
+            for other, score in neighbours:
+                print(f"  {score:.3f}  {names.get(other, other)}")
+    else:
+        print("Uso: python feature_index.py [build [diretório]|similar <id> [k]]")
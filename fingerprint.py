@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Impressões digitais de áudio para deduplicar faixas antes da análise.
+
+A mesma música costuma chegar várias vezes em `audios/` (lyric video, áudio
+oficial, upload ao vivo), cada cópia com um título diferente no YouTube e, até
+aqui, com o seu próprio job pago no Music.ai. Cada arquivo ganha uma impressão
+compacta: a sequência de cromagramas (12 classes de altura) em passos de ~1 s,
+centrada e normalizada por passo, mais o perfil cromático médio.
+
+Duas impressões são comparadas pela matriz de similaridade entre passos
+(um único produto de matrizes) e pela melhor diagonal, o que tolera introduções
+e finais diferentes entre as cópias. O índice guarda as impressões por hash do
+conteúdo (não recalcula arquivos já vistos) e usa o perfil médio para escolher
+os poucos candidatos que passam pela comparação completa.
+
+    python fingerprint.py [diretório]   # agrupa os áudios duplicados
+"""
+
+import os
+import sys
+import threading
+import concurrent.futures
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from analysis_cache import hash_file
+from track_manifest import is_audio_file
+
+DEFAULT_INDEX_PATH = os.path.join('cache', 'fingerprints.npz')
+
+FINGERPRINT_SR = 11025
+FINGERPRINT_HOP = 2048
+# Quadros do cromagrama por passo da impressão (5 × 2048 / 11025 ≈ 0,93 s)
+FRAMES_PER_STEP = 5
+# Apenas o início da faixa é usado (suficiente para identificar a gravação)
+FINGERPRINT_DURATION = 240.0
+
+# Similaridade média mínima na melhor diagonal para considerar duas cópias iguais
+DEFAULT_THRESHOLD = 0.8
+# Sobreposição mínima, em passos e em fração da impressão mais curta
+MIN_OVERLAP_STEPS = 20
+MIN_OVERLAP_RATIO = 0.5
+# Candidatos comparados por consulta (pelo perfil médio)
+MAX_CANDIDATES = 20
+MIN_PROFILE_SIMILARITY = 0.5
+
+
+def compute_fingerprint(file_path: str) -> Optional[np.ndarray]:
+    """
+    Calcula a impressão digital de um arquivo de áudio.
+
+    Args:
+        file_path: Caminho do arquivo de áudio
+
+    Returns:
+        Matriz float16 (12, passos) com colunas centradas e de norma 1 (zero nos
+        passos em silêncio), ou None se o áudio não puder ser lido
+    """
+    import librosa
+
+    try:
+        y, sr = librosa.load(file_path, sr=FINGERPRINT_SR, mono=True, duration=FINGERPRINT_DURATION)
+    except Exception as e:
+        print(f"Erro ao calcular a impressão digital de {file_path}: {e}")
+        return None
+    if y.size < FINGERPRINT_HOP * FRAMES_PER_STEP:
+        return None
+
+    chroma = librosa.feature.chroma_stft(y=y, sr=sr, n_fft=2 * FINGERPRINT_HOP, hop_length=FINGERPRINT_HOP)
+    rms = librosa.feature.rms(y=y, frame_length=2 * FINGERPRINT_HOP, hop_length=FINGERPRINT_HOP)[0]
+
+    steps = min(chroma.shape[1], rms.size) // FRAMES_PER_STEP
+    usable = steps * FRAMES_PER_STEP
+    blocks = chroma[:, :usable].reshape(12, steps, FRAMES_PER_STEP).mean(axis=2)
+    energy = rms[:usable].reshape(steps, FRAMES_PER_STEP).mean(axis=1)
+
+    # Centrar cada passo tira o "piso" do cromagrama: faixas diferentes ficam perto de 0
+    blocks = blocks - blocks.mean(axis=0, keepdims=True)
+    norms = np.linalg.norm(blocks, axis=0, keepdims=True)
+    blocks = np.divide(blocks, norms, out=np.zeros_like(blocks), where=norms > 1e-6)
+    blocks[:, energy < 0.05 * energy.max()] = 0.0
+    return blocks.astype(np.float16)
+
+
+def profile_of(fingerprint: np.ndarray) -> np.ndarray:
+    """
+    Perfil cromático médio (norma 1) usado para pré-selecionar candidatos.
+    """
+    profile = fingerprint.astype(np.float32).mean(axis=1)
+    norm = np.linalg.norm(profile)
+    return profile / norm if norm > 1e-6 else profile
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Similaridade entre duas impressões: média da melhor diagonal da matriz de
+    similaridade entre passos, considerando só os passos com som nas duas.
+
+    Args:
+        a: Impressão (12, n)
+        b: Impressão (12, m)
+
+    Returns:
+        Valor entre -1 e 1 (0 se a sobreposição mínima não for atingida)
+    """
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    scores = a.T @ b
+    voiced = np.outer(np.any(a != 0, axis=0), np.any(b != 0, axis=0))
+    n, m = scores.shape
+    min_overlap = max(MIN_OVERLAP_STEPS, int(MIN_OVERLAP_RATIO * min(n, m)))
+
+    best = 0.0
+    for offset in range(-(n - min_overlap), m - min_overlap + 1):
+        count = np.trace(voiced, offset)
+        if count >= min_overlap:
+            best = max(best, float(np.trace(scores, offset)) / count)
+    return best
+
+
+class FingerprintIndex:
+    """
+    Índice persistente de impressões digitais, seguro para uso entre threads.
+
+    As impressões ficam em um único arquivo .npz, indexadas pelo hash do conteúdo
+    do áudio; o caminho de cada arquivo só é usado para devolver o representante.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH, threshold: float = DEFAULT_THRESHOLD):
+        """
+        Args:
+            path: Arquivo .npz onde as impressões são persistidas
+            threshold: Similaridade mínima para considerar dois arquivos a mesma gravação
+        """
+        self.path = path
+        self.threshold = threshold
+        self.computed = 0
+        self._fingerprints: Dict[str, np.ndarray] = {}
+        self._paths: Dict[str, str] = {}
+        self._profiles = np.zeros((0, 12), dtype=np.float32)
+        self._profile_keys: List[str] = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Carrega o índice do disco, ignorando arquivos corrompidos.
+        """
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                for key in data.files:
+                    if key not in ('_keys', '_paths'):
+                        self._fingerprints[key] = data[key]
+                if '_keys' in data.files:
+                    self._paths = dict(zip(data['_keys'].tolist(), data['_paths'].tolist()))
+        except Exception as e:
+            print(f"Erro ao carregar o índice de impressões {self.path}: {e}")
+            self._fingerprints = {}
+            self._paths = {}
+        self._profile_keys = list(self._fingerprints)
+        if self._profile_keys:
+            self._profiles = np.stack([profile_of(self._fingerprints[key]) for key in self._profile_keys])
+            self._profiles = self._profiles.astype(np.float32)
+
+    def fingerprint(self, file_path: str) -> Tuple[str, Optional[np.ndarray]]:
+        """
+        Retorna o hash do conteúdo e a impressão de um arquivo, calculando-a se necessário.
+
+        Args:
+            file_path: Caminho do arquivo de áudio
+
+        Returns:
+            Tupla (hash do conteúdo, impressão ou None)
+        """
+        key = hash_file(file_path)
+        with self._lock:
+            fingerprint = self._fingerprints.get(key)
+        if fingerprint is None:
+            fingerprint = compute_fingerprint(file_path)
+            if fingerprint is None:
+                return key, None
+            self.computed += 1
+        return key, fingerprint
+
+    def _candidates(self, key: str, fingerprint: np.ndarray) -> List[str]:
+        # Pré-seleção vetorizada pelo perfil médio; só os melhores passam pela diagonal
+        with self._lock:
+            if not self._profile_keys:
+                return []
+            scores = self._profiles[:len(self._profile_keys)] @ profile_of(fingerprint)
+            keys = list(self._profile_keys)
+        order = np.argsort(scores)[::-1][:MAX_CANDIDATES]
+        return [keys[i] for i in order if scores[i] >= MIN_PROFILE_SIMILARITY and keys[i] != key]
+
+    def match(self, file_path: str, register: bool = True) -> Optional[str]:
+        """
+        Procura, entre os arquivos do índice, uma cópia da mesma gravação.
+
+        Args:
+            file_path: Caminho do arquivo de áudio
+            register: Acrescentar o arquivo ao índice (como candidato a representante)
+
+        Returns:
+            Caminho do arquivo equivalente já indexado, ou None se o áudio for inédito
+        """
+        key, fingerprint = self.fingerprint(file_path)
+        if fingerprint is None:
+            return None
+        return self.find(file_path, key, fingerprint, register)
+
+    def find(self, file_path: str, key: str, fingerprint: np.ndarray, register: bool = True) -> Optional[str]:
+        """
+        Como match, para uma impressão já calculada (ver fingerprint).
+        """
+        match = None
+        best = self.threshold
+        for candidate in self._candidates(key, fingerprint):
+            path = self._paths.get(candidate)
+            if path is None or not os.path.exists(path):
+                continue
+            score = similarity(fingerprint, self._fingerprints[candidate])
+            if score >= best:
+                match, best = path, score
+        if match is None:
+            # Conteúdo idêntico (mesmo hash) com outro nome
+            path = self._paths.get(key)
+            if path is not None and path != file_path and os.path.exists(path):
+                match = path
+
+        if register:
+            self.add(file_path, key, fingerprint)
+        return match
+
+    def add(self, file_path: str, key: str, fingerprint: np.ndarray) -> None:
+        """
+        Acrescenta (ou atualiza) a impressão de um arquivo no índice.
+        """
+        with self._lock:
+            if not os.path.exists(self._paths.get(key, '')):
+                self._paths[key] = file_path
+            if key in self._fingerprints:
+                return
+            self._fingerprints[key] = fingerprint
+            count = len(self._profile_keys)
+            if count == len(self._profiles):
+                # Capacidade dobra quando enche: inserir n impressões custa O(n), não O(n²)
+                grown = np.zeros((max(64, 2 * count), self._profiles.shape[1]), dtype=np.float32)
+                grown[:count] = self._profiles[:count]
+                self._profiles = grown
+            self._profiles[count] = profile_of(fingerprint)
+            self._profile_keys.append(key)
+
+    def index_files(self, file_paths: Sequence[str], max_workers: Optional[int] = None) -> None:
+        """
+        Calcula em paralelo as impressões que faltam e registra os caminhos dos arquivos.
+        """
+        def load(path):
+            key, fingerprint = self.fingerprint(path)
+            if fingerprint is not None:
+                self.add(path, key, fingerprint)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            list(pool.map(load, file_paths))
+
+    def save(self) -> None:
+        """
+        Grava o índice no disco de forma atômica.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npz"
+        with self._lock:
+            # Os caminhos seguem junto, para reaproveitar representantes de execuções anteriores
+            np.savez(tmp_path, _keys=np.array(list(self._paths), dtype=str),
+                     _paths=np.array(list(self._paths.values()), dtype=str), **self._fingerprints)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+
+def cluster_files(file_paths: Sequence[str], index: Optional[FingerprintIndex] = None) -> List[List[str]]:
+    """
+    Agrupa arquivos que são cópias da mesma gravação.
+
+    Args:
+        file_paths: Arquivos de áudio
+        index: Índice de impressões (padrão: cache/fingerprints.npz)
+
+    Returns:
+        Grupos de caminhos; o primeiro de cada grupo é o representante (o mais longo)
+    """
+    index = index or FingerprintIndex()
+    index.index_files(file_paths)
+    fingerprints = {}
+    for path in file_paths:
+        key, fingerprint = index.fingerprint(path)
+        if fingerprint is not None:
+            fingerprints[path] = (key, fingerprint)
+
+    # União-busca sobre os pares acima do limiar
+    parent = {path: path for path in fingerprints}
+
+    def find(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    by_key: Dict[str, str] = {}
+    for path, (key, _) in fingerprints.items():
+        if key in by_key:
+            # Conteúdo idêntico com outro nome
+            parent[path] = by_key[key]
+        else:
+            by_key[key] = path
+    for path, (key, fingerprint) in fingerprints.items():
+        for candidate in index._candidates(key, fingerprint):
+            other = by_key.get(candidate)
+            if other is None or find(other) == find(path):
+                continue
+            if similarity(fingerprint, fingerprints[other][1]) >= index.threshold:
+                parent[find(other)] = find(path)
+
+    clusters: Dict[str, List[str]] = {}
+    for path in fingerprints:
+        clusters.setdefault(find(path), []).append(path)
+    return [sorted(members, key=lambda p: fingerprints[p][1].shape[1], reverse=True)
+            for members in clusters.values()]
+
+
+class Deduplicator:
+    """
+    Garante que só um arquivo de cada grupo de cópias seja analisado no pipeline.
+
+    O primeiro arquivo de um grupo a chegar à análise vira o representante; as
+    cópias que chegam depois esperam o resultado dele e o reaproveitam. Se o
+    representante falhar, as cópias são analisadas normalmente.
+    """
+
+    def __init__(self, index: Optional[FingerprintIndex] = None):
+        """
+        Args:
+            index: Índice de impressões (padrão: cache/fingerprints.npz)
+        """
+        self.index = index or FingerprintIndex()
+        self.duplicates = 0
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        self._claiming: Set[str] = set()
+        self._lock = threading.Condition()
+
+    def claim(self, file_path: str) -> Tuple[Optional[str], Optional[concurrent.futures.Future]]:
+        """
+        Registra um arquivo que vai para a análise.
+
+        Args:
+            file_path: Caminho do arquivo de áudio
+
+        Returns:
+            Tupla (representante, future do resultado dele): (None, None) se o arquivo
+            for o representante do seu grupo; future None se o representante já tiver
+            sido analisado em outra execução (o resultado vem do cache de análise)
+        """
+        try:
+            key, fingerprint = self.index.fingerprint(file_path)
+        except Exception as e:
+            print(f"Erro ao deduplicar {file_path}: {e}")
+            fingerprint = None
+        if fingerprint is None:
+            with self._lock:
+                self._pending[file_path] = concurrent.futures.Future()
+            return None, None
+
+        # Reserva por hash do conteúdo: cópias idênticas simultâneas são tratadas uma de
+        # cada vez (a segunda encontra a primeira já registrada), enquanto arquivos
+        # diferentes pontuam seus candidatos em paralelo, fora do lock
+        with self._lock:
+            while key in self._claiming:
+                self._lock.wait()
+            self._claiming.add(key)
+        try:
+            match = self.index.find(file_path, key, fingerprint)
+            with self._lock:
+                if match is None:
+                    self._pending[file_path] = concurrent.futures.Future()
+                    return None, None
+                self.duplicates += 1
+                future = self._pending.get(match)
+                if future is not None:
+                    # Cópias de uma cópia acabam no mesmo representante
+                    self._pending[file_path] = future
+                return match, future
+        finally:
+            with self._lock:
+                self._claiming.discard(key)
+                self._lock.notify_all()
+
+    def publish(self, file_path: str, analysis: Tuple) -> None:
+        """
+        Registra um arquivo cujo resultado já é conhecido (ex.: veio do cache de análise),
+        para que as cópias dele que chegarem depois o reaproveitem.
+        """
+        try:
+            key, fingerprint = self.index.fingerprint(file_path)
+        except Exception as e:
+            print(f"Erro ao deduplicar {file_path}: {e}")
+            return
+        if fingerprint is None:
+            return
+        future = concurrent.futures.Future()
+        future.set_result(analysis)
+        self.index.add(file_path, key, fingerprint)
+        with self._lock:
+            self._pending.setdefault(file_path, future)
+
+    def resolve(self, file_path: str, analysis: Optional[Tuple]) -> None:
+        """
+        Publica o resultado (URL, BPM, tonalidade, nome) do representante para as cópias.
+
+        Um resultado vazio (falha) é publicado como None.
+        """
+        with self._lock:
+            future = self._pending.get(file_path)
+        if future is not None and not future.done():
+            future.set_result(analysis)
+
+    def report(self) -> Dict[str, int]:
+        """
+        Imprime e retorna o número de cópias encontradas e de impressões calculadas.
+        """
+        stats = {'duplicates': self.duplicates, 'computed': self.index.computed, 'indexed': len(self.index)}
+        print(f"Deduplicação: {self.duplicates} cópias de áudios já vistos "
+              f"({self.index.computed} impressões calculadas, {len(self.index)} no índice)")
+        return stats
+
+    def save(self) -> None:
+        self.index.save()
+
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'audios'
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if is_audio_file(name))
+    index = FingerprintIndex()
+    clusters = cluster_files(paths, index)
+    index.save()
+    duplicated = [cluster for cluster in clusters if len(cluster) > 1]
+    for cluster in duplicated:
+        print(f"{cluster[0]} (representante)")
+        for path in cluster[1:]:
+            print(f"    {path}")
+    print(f"{len(paths)} arquivos, {len(clusters)} gravações distintas, "
+          f"{sum(len(c) - 1 for c in duplicated)} cópias")
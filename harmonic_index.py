@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Índice de compatibilidade para mixagem harmônica (roda de Camelot + BPM).
+
+Duas faixas "mixam" quando as tonalidades são vizinhas na roda de Camelot
+(mesmo código, ±1 no mesmo anel ou a relativa maior/menor) e os BPMs ficam a
+até ±N% um do outro, contando meio tempo e tempo dobrado. As tonalidades do
+dataset ("D major", "E minor") são convertidas para códigos de Camelot e as
+faixas de cada código ficam em um vetor de BPMs ordenado: cada consulta é uma
+busca binária por código compatível e faixa de BPM, sem percorrer o dataset.
+
+    python harmonic_index.py compatible <id do Spotify> [tolerância]
+    python harmonic_index.py pairs [pares.csv] [tolerância]
+"""
+
+import re
+import csv
+import sys
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Tolerância padrão de BPM (fração do BPM da faixa consultada)
+DEFAULT_TOLERANCE = 0.06
+# Relações de tempo aceitas: mesmo tempo, meio tempo e tempo dobrado
+TEMPO_RATIOS = ((1.0, '1x'), (0.5, '1/2x'), (2.0, '2x'))
+
+_PITCH_CLASSES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+_ACCIDENTALS = {'': 0, '#': 1, '♯': 1, 'b': -1, '♭': -1}
+_KEY_RE = re.compile(r'^([A-Ga-g])\s*([#♯b♭]?)\s*(major|maj|minor|min|m)?$', re.IGNORECASE)
+_CAMELOT_RE = re.compile(r'^0?(1[0-2]|[1-9])\s*([AaBb])$')
+_MINOR_MODES = ('minor', 'min', 'm')
+
+
+def to_camelot(key) -> Optional[str]:
+    """
+    Converte uma tonalidade para o código de Camelot.
+
+    Aceita o formato do dataset ("D major", "Eb minor"), abreviações ("Dm", "F#maj",
+    "Bb") e códigos de Camelot ("8A", "08b").
+
+    Args:
+        key: Tonalidade
+
+    Returns:
+        Código de Camelot (ex.: "10B"), ou None se a tonalidade não for reconhecida
+    """
+    if not isinstance(key, str):
+        return None
+    text = ' '.join(key.strip().split())
+    match = _CAMELOT_RE.match(text)
+    if match:
+        return f"{int(match.group(1))}{match.group(2).upper()}"
+    match = _KEY_RE.match(text)
+    if not match:
+        return None
+    letter, accidental, mode = match.groups()
+    pitch = (_PITCH_CLASSES[letter.upper()] + _ACCIDENTALS[accidental]) % 12
+    # "m" minúsculo é menor; "M" maiúsculo sozinho é maior
+    minor = mode is not None and mode.lower() in _MINOR_MODES and mode != 'M'
+    if minor:
+        # A menor compartilha o número da relativa maior (três semitons acima)
+        pitch = (pitch + 3) % 12
+    # Cada quinta acima avança uma posição na roda; C maior é 8B
+    number = (7 * pitch + 7) % 12 + 1
+    return f"{number}{'A' if minor else 'B'}"
+
+
+def compatible_codes(code: str) -> List[str]:
+    """
+    Códigos de Camelot compatíveis: o próprio, os vizinhos no mesmo anel e a relativa.
+    """
+    number, letter = int(code[:-1]), code[-1]
+    other = 'A' if letter == 'B' else 'B'
+    return [code, f"{number % 12 + 1}{letter}", f"{(number - 2) % 12 + 1}{letter}", f"{number}{other}"]
+
+
+def _bpm(value) -> Optional[float]:
+    try:
+        bpm = float(value)
+    except (TypeError, ValueError):
+        return None
+    return bpm if math.isfinite(bpm) and bpm > 0 else None
+
+
+class Match(NamedTuple):
+    """Faixa compatível com uma consulta."""
+    track_id: str
+    bpm: float
+    camelot: str
+    bpm_diff: float
+    tempo: str
+
+
+class HarmonicIndex:
+    """
+    Faixas agrupadas por código de Camelot, com os BPMs de cada grupo ordenados.
+    """
+
+    def __init__(self, tracks: Iterable[Tuple[str, object, object]], tolerance: float = DEFAULT_TOLERANCE):
+        """
+        Args:
+            tracks: Tuplas (id do Spotify, BPM, tonalidade); faixas sem BPM ou com
+                tonalidade não reconhecida ficam fora do índice
+            tolerance: Diferença máxima de BPM, como fração do BPM da faixa consultada
+        """
+        self.tolerance = tolerance
+        self.tracks: Dict[str, Tuple[float, str]] = {}
+        for track_id, bpm, key in tracks:
+            bpm, code = _bpm(bpm), to_camelot(key)
+            if track_id and bpm is not None and code is not None:
+                self.tracks[str(track_id)] = (bpm, code)
+
+        grouped: Dict[str, List[Tuple[float, str]]] = {}
+        for track_id, (bpm, code) in self.tracks.items():
+            grouped.setdefault(code, []).append((bpm, track_id))
+        self._bpms: Dict[str, List[float]] = {}
+        self._ids: Dict[str, List[str]] = {}
+        for code, entries in grouped.items():
+            entries.sort()
+            self._bpms[code] = [bpm for bpm, _ in entries]
+            self._ids[code] = [track_id for _, track_id in entries]
+
+    @classmethod
+    def from_dataframe(cls, df, tolerance: float = DEFAULT_TOLERANCE) -> 'HarmonicIndex':
+        """
+        Constrói o índice a partir das colunas `id`, `BPM` e `Root_key` do dataset.
+        """
+        return cls(zip(df['id'], df['BPM'], df['Root_key']), tolerance)
+
+    @classmethod
+    def from_csv(cls, csv_path: str = 'tracks_with_stems.csv', tolerance: float = DEFAULT_TOLERANCE) -> 'HarmonicIndex':
+        """
+        Constrói o índice a partir de um CSV no formato de tracks_with_stems.csv.
+        """
+        from schema import read_tracks_csv
+
+        return cls.from_dataframe(read_tracks_csv(csv_path, typed=False), tolerance)
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self.tracks
+
+    def compatible(self, bpm: float, key, tolerance: Optional[float] = None,
+                   exclude: Optional[str] = None) -> List[Match]:
+        """
+        Faixas compatíveis com um BPM e uma tonalidade.
+
+        Args:
+            bpm: BPM de referência
+            key: Tonalidade (qualquer formato aceito por to_camelot)
+            tolerance: Diferença máxima de BPM (padrão: a do índice)
+            exclude: id a omitir (ex.: a própria faixa)
+
+        Returns:
+            Faixas compatíveis, da menor para a maior diferença de BPM
+        """
+        bpm, code = _bpm(bpm), to_camelot(key)
+        if bpm is None or code is None:
+            return []
+        tolerance = self.tolerance if tolerance is None else tolerance
+
+        found: Dict[str, Match] = {}
+        for candidate_code in compatible_codes(code):
+            bpms = self._bpms.get(candidate_code)
+            if not bpms:
+                continue
+            ids = self._ids[candidate_code]
+            for ratio, tempo in TEMPO_RATIOS:
+                target = bpm * ratio
+                low = bisect_left(bpms, target * (1 - tolerance))
+                high = bisect_right(bpms, target * (1 + tolerance))
+                for position in range(low, high):
+                    track_id = ids[position]
+                    if track_id == exclude:
+                        continue
+                    diff = abs(bpms[position] - target) / target
+                    if track_id not in found or diff < found[track_id].bpm_diff:
+                        found[track_id] = Match(track_id, bpms[position], candidate_code, round(diff, 4), tempo)
+        return sorted(found.values(), key=lambda match: (match.bpm_diff, match.track_id))
+
+    def compatible_with(self, track_id: str, tolerance: Optional[float] = None) -> List[Match]:
+        """
+        Faixas que mixam com uma faixa do índice.
+
+        Args:
+            track_id: id do Spotify
+            tolerance: Diferença máxima de BPM (padrão: a do índice)
+
+        Returns:
+            Faixas compatíveis (vazio se a faixa não estiver no índice)
+        """
+        if track_id not in self.tracks:
+            return []
+        bpm, code = self.tracks[track_id]
+        return self.compatible(bpm, code, tolerance, exclude=track_id)
+
+    def pairs(self, tolerance: Optional[float] = None) -> Iterator[Tuple[str, str, Match]]:
+        """
+        Todos os pares compatíveis, cada par uma única vez.
+
+        A tolerância é relativa ao BPM da faixa consultada, então o par é gerado a
+        partir da faixa de menor BPM (a relação mais restrita).
+
+        Yields:
+            Tuplas (id, id compatível, Match da faixa compatível)
+        """
+        for track_id, (bpm, _) in self.tracks.items():
+            for match in self.compatible_with(track_id, tolerance):
+                if (bpm, track_id) < (self.tracks[match.track_id][0], match.track_id):
+                    yield track_id, match.track_id, match
+
+    def export_pairs(self, csv_path: str = 'compatible_pairs.csv', tolerance: Optional[float] = None,
+                     sep: str = ';') -> int:
+        """
+        Grava o grafo de pares compatíveis em CSV (uma aresta por linha).
+
+        Args:
+            csv_path: Arquivo de saída
+            tolerance: Diferença máxima de BPM (padrão: a do índice)
+            sep: Separador do CSV (o mesmo de tracks_with_stems.csv)
+
+        Returns:
+            Número de pares gravados
+        """
+        count = 0
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=sep)
+            writer.writerow(['id_a', 'id_b', 'camelot_a', 'camelot_b', 'bpm_a', 'bpm_b', 'bpm_diff', 'tempo'])
+            for track_id, other_id, match in self.pairs(tolerance):
+                bpm, code = self.tracks[track_id]
+                writer.writerow([track_id, other_id, code, match.camelot, bpm, match.bpm,
+                                 match.bpm_diff, match.tempo])
+                count += 1
+        return count
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'pairs'
+    if command == 'compatible' and len(sys.argv) > 2:
+        index = HarmonicIndex.from_csv()
+        tolerance = float(sys.argv[3]) if len(sys.argv) > 3 else None
+        if sys.argv[2] not in index:
+            print(f"Faixa {sys.argv[2]} sem BPM/tonalidade no dataset.")
+        for match in index.compatible_with(sys.argv[2], tolerance):
+            print(f"{match.track_id}  {match.camelot:>3}  {match.bpm:6.1f} BPM  "
+                  f"{match.bpm_diff:.1%} ({match.tempo})")
+    elif command == 'pairs':
+        output = sys.argv[2] if len(sys.argv) > 2 else 'compatible_pairs.csv'
+        tolerance = float(sys.argv[3]) if len(sys.argv) > 3 else None
+        index = HarmonicIndex.from_csv()
+        print(f"{index.export_pairs(output, tolerance)} pares compatíveis entre {len(index)} faixas "
+              f"gravados em {output}.")
+    else:
+        print("Uso: python harmonic_index.py [compatible <id> [tolerância]|pairs [arquivo.csv] [tolerância]]")
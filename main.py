@@ -1,14 +1,29 @@
 import pandas as pd
 import os
 from tracks import take_tracks
-from youtuber_catcher import youtube_catcher
-from downloader import download
-from stems import separate_guitar, download_stem, process_audio_files, download_stems_parallel
+from youtuber_catcher import buscar_com_cache
+from downloader import download_track
+from stems import download_stem
 import time
 import concurrent.futures
 import re
-from typing import List, Tuple, Optional
+import threading
+from typing import List, Tuple, Optional, Union
 from update_dataset_from_debug import update_dataset
+from matcher import TrackMatcher, top_indices
+from analysis import get_backend
+from analysis_cache import AnalysisCache
+from search_cache import SearchCache
+from search_backends import default_workers, get_search_backend, max_workers as search_max_workers
+from concurrency import get_limiter, limiter_report
+from rate_limit import rate_limit_report
+from track_manifest import audio_name, is_audio_file, track_id_for
+from fingerprint import Deduplicator
+from pipeline import Pipeline, Stage
+from track_store import TrackStore, open_store
+from track_state import TrackState
+from metrics import METRICS, ProgressPrinter
+from schema import memory_report, set_value
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -20,14 +35,10 @@ def sanitize_filename(filename: str) -> str:
     sanitized = sanitized.replace(' ', '_')
     return sanitized
 
-def process_single_audio(audio_path: str) -> Tuple[str, float, str, str, str]:
+def fetch_stem(audio_url: Optional[str], original_name: str) -> Optional[str]:
     """
-    Processa um único arquivo de áudio sem usar paralelismo.
+    Baixa o stem de um resultado de análise, se houver URL.
     """
-    print(f"Processando {audio_path}...")
-    audio_url, bpm, root_key, original_name = separate_guitar(audio_path)
-    print(f"Processamento concluído: {original_name}, BPM={bpm}, Tonalidade={root_key}")
-    
     if audio_url:
         # Sanitizar o nome apenas para o download do stem
         sanitized_name = sanitize_filename(original_name)
@@ -36,127 +47,517 @@ def process_single_audio(audio_path: str) -> Tuple[str, float, str, str, str]:
     else:
         stem_path = None
         print(f"Sem URL para baixar stem para {original_name}")
-        
+    return stem_path
+
+def cached_result(audio_path: str, backend: str, cache: Optional[AnalysisCache]) -> Optional[Tuple[str, float, str, str, str]]:
+    """
+    Busca o resultado de um arquivo no cache de análise.
+    
+    Se o resultado tem URL mas o stem não existe no disco (removido ou nunca baixado),
+    ele é baixado novamente; se o download falhar, stem_path volta como None.
+    """
+    if cache is None:
+        return None
+    try:
+        cached = cache.get(audio_path, backend)
+    except Exception as e:
+        print(f"Erro ao consultar o cache para {audio_path}: {e}")
+        return None
+    if cached is None:
+        return None
+    
+    audio_url, bpm, root_key, original_name, stem_path = cached
+    print(f"Cache: resultado reaproveitado para {original_name}, BPM={bpm}, Tonalidade={root_key}")
+    if audio_url and not (stem_path and os.path.exists(stem_path)):
+        stem_path = fetch_stem(audio_url, original_name)
+        if stem_path:
+            cache.put(audio_path, (audio_url, bpm, root_key, original_name, stem_path), backend)
     return audio_url, bpm, root_key, original_name, stem_path
 
-def main(playlist_id: str) -> None:
-    """Main function to execute the entire pipeline."""
-    print("Iniciando o processamento...")
-    start_time = time.time()
+def update_tracks(df: pd.DataFrame, indices: List, bpm: float, root_key: str, stem_path: Optional[str],
+                  store: Optional[TrackStore] = None) -> int:
+    """
+    Atualiza BPM, tonalidade e stem das linhas indicadas do dataset.
     
-    # Obtém informações das faixas e uma lista formatada para busca no YouTube
-    print("Obtendo informações das faixas...")
-    tracks_info, tracks_names = take_tracks(playlist_id)
-    print(f"Total de faixas encontradas: {len(tracks_names)}")
+    Se um TrackStore for informado, as mesmas linhas são gravadas nele (por id do Spotify).
+    
+    Returns:
+        Número de registros atualizados
+    """
+    for i in indices:
+        # Atualiza registro por registro explicitamente
+        set_value(df, i, 'stem_path', stem_path)  # Acesso elemento a elemento (.at)
+        set_value(df, i, 'BPM', bpm)
+        set_value(df, i, 'Root_key', root_key)  # Coluna categórica: novas tonalidades viram categorias
+        if store is not None:
+            store.stage_analysis(df.at[i, 'id'], bpm, root_key, stem_path)
+    return len(indices)
+
+def plan_resume(state: TrackState, tracks: List[dict], existing_audio: List[str],
+                resume: bool = True, retry_failed: bool = False) -> Tuple[List[dict], dict, List[str]]:
+    """
+    Distribui as faixas pelos estágios do pipeline de acordo com o estado salvo.
+    
+    Cada faixa entra no estágio seguinte ao último concluído (com a URL, o áudio ou o
+    resultado da análise guardados no estado); faixas já incorporadas ao dataset são puladas.
+    
+    Args:
+        state: Estado persistente por faixa
+        tracks: Itens {'nome', 'artista', 'spotify_id'} da execução atual
+        existing_audio: Arquivos presentes em audios/
+        resume: Usar o estado salvo (False reprocessa tudo, mas continua registrando o progresso)
+        retry_failed: Apenas as faixas com falha registrada
+        
+    Returns:
+        Tupla (itens do primeiro estágio, itens injetados por estágio, áudios avulsos a analisar)
+    """
+    state.discover((t['spotify_id'], t['nome'], t['artista']) for t in tracks)
+    if not resume:
+        return tracks, {}, existing_audio
+    
+    # Áudios já baixados, pelo id (ex.: download concluído pouco antes de uma queda)
+    audio_by_id = {}
+    loose_audio = []
+    known = state.load()
+    for path in existing_audio:
+        track_id = track_id_for(path)
+        if track_id in known:
+            audio_by_id[track_id] = path
+        elif not retry_failed:
+            # Áudios sem estado (antigos ou de outras playlists) continuam sendo analisados
+            loose_audio.append(path)
+    
+    plan = state.plan([t['spotify_id'] for t in tracks if t['spotify_id']], retry_failed)
+    by_id = {t['spotify_id']: t for t in tracks if t['spotify_id']}
+    items = [] if retry_failed else [t for t in tracks if not t['spotify_id']]
+    inject = {'download': [], 'analyze': [], 'stem': []}
+    resumed = 0
+    for stage, entries in plan.items():
+        for entry in entries:
+            item = dict(by_id[entry['spotify_id']])
+            data = entry['data']
+            audio_path = data.get('audio_path') or audio_by_id.get(item['spotify_id'])
+            if stage == 'stem_fetched' and data.get('result'):
+                item['result'] = tuple(data['result'])
+                item['audio_path'] = audio_path
+                inject['stem'].append(item)
+            elif stage == 'analyzed' and data.get('analysis'):
+                item['analysis'] = tuple(data['analysis'])
+                item['audio_path'] = audio_path
+                inject['stem'].append(item)
+            elif audio_path and os.path.exists(audio_path):
+                item['audio_path'] = audio_path
+                inject['analyze'].append(item)
+            elif data.get('url'):
+                item['url'] = data['url']
+                inject['download'].append(item)
+            else:
+                items.append(item)
+                continue
+            resumed += 1
+    
+    skipped = len(by_id) - sum(len(entries) for entries in plan.values())
+    print(f"Retomada: {resumed} faixas continuam de onde pararam, {len(items)} começam do início, "
+          f"{skipped} puladas (concluídas{' ou sem falha' if retry_failed else ' ou com falhas demais'}).")
+    return items, inject, loose_audio
+
+def run_streaming_pipeline(tracks_names: List[Tuple[str, str]], df: pd.DataFrame, backend: str = 'musicai',
+                           cache: Optional[AnalysisCache] = None, search_workers: Optional[int] = None,
+                           download_workers: int = 2, analyze_workers: Optional[int] = None,
+                           stem_workers: int = 2, existing_audio: Optional[List[str]] = None,
+                           store: Optional[TrackStore] = None, progress: bool = False,
+                           pipeline_stats: Optional[dict] = None,
+                           search_cache: Optional[SearchCache] = None, refresh_search: bool = False,
+                           track_ids: Optional[List[str]] = None,
+                           search_backend: str = 'selenium', audio_mode: str = 'mp3',
+                           state: Optional[TrackState] = None, resume: bool = True,
+                           retry_failed: bool = False, dedup: Optional[Deduplicator] = None) -> int:
+    """
+    Executa busca → download → análise → stem como estágios sobrepostos.
+    
+    Cada faixa avança para o próximo estágio assim que o anterior termina, através de
+    filas limitadas, e os resultados são incorporados ao dataset à medida que chegam.
+    
+    Args:
+        tracks_names: Lista de tuplas (nome_da_musica, nome_do_artista)
+        df: Dataset a ser atualizado (modificado apenas na thread chamadora)
+        backend: Backend de análise: "musicai", "local", "hybrid", "stream" ou "stream-windows"
+        cache: Cache de resultados por hash do áudio (opcional)
+        search_workers: Número inicial de buscas simultâneas (padrão: 3 com Selenium, 16 com yt-dlp)
+        download_workers: Número inicial de downloads simultâneos
+        analyze_workers: Número de análises simultâneas (padrão: 4 jobs iniciais no Music.ai,
+            um por núcleo para a análise local)
+        stem_workers: Número inicial de downloads de stems simultâneos
+        existing_audio: Arquivos já presentes em `audios/`, injetados direto na análise
+        store: Banco de faixas onde cada resultado é gravado assim que chega
+        progress: Mostrar uma linha de progresso por estágio durante a execução
+        pipeline_stats: Dicionário preenchido com as estatísticas de cada estágio do pipeline
+        search_cache: Cache de buscas no YouTube; faixas em cache não abrem o navegador
+        refresh_search: Refazer as buscas mesmo quando houver resultado em cache
+        track_ids: ids do Spotify na mesma ordem de tracks_names (chave adicional do cache de buscas)
+        search_backend: Backend de busca: "selenium" (navegador headless) ou "ytdlp" (sem navegador)
+        audio_mode: Formato dos áudios baixados: "mp3" (recodifica), "native" (codec original
+            opus/m4a, sem recodificar) ou "analysis" (menor formato adequado para a análise)
+        state: Estado persistente por faixa; cada estágio concluído ou falho é registrado nele
+        resume: Retomar cada faixa no primeiro estágio incompleto e pular as já incorporadas
+        retry_failed: Processar apenas as faixas com falha registrada no estado
+        dedup: Deduplicador por impressão digital; cópias da mesma gravação (lyric video,
+            áudio oficial, ao vivo) reaproveitam a análise de um único representante
+        
+    Returns:
+        Número de registros atualizados no dataset
+    """
+    if analyze_workers is None:
+        analyze_workers = 4 if backend == 'musicai' else (os.cpu_count() or 1)
+    if pipeline_stats is None:
+        pipeline_stats = {}
+    if search_workers is None:
+        search_workers = default_workers(search_backend)
+    
+    # Os valores de *_workers são o ponto de partida: cada subsistema tem um limitador adaptativo
+    # que aumenta a concorrência enquanto a latência se mantém e a reduz com erros e HTTP 429
+    search_limiter = get_limiter(f"search_{search_backend}", initial=search_workers,
+                                 max_limit=max(search_workers, search_max_workers(search_backend)))
+    download_limiter = get_limiter('download', initial=download_workers, max_limit=max(download_workers, 16))
+    stem_limiter = get_limiter('stems', initial=stem_workers, max_limit=max(stem_workers, 32))
+    
+    process_pool = None
+    musicai_limiter = None
+    if backend != 'musicai':
+        process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=analyze_workers)
+    if backend in ('musicai', 'hybrid'):
+        musicai_limiter = get_limiter('musicai', initial=analyze_workers, max_limit=max(analyze_workers, 16))
+    # Os jobs do Music.ai compartilham um único cliente e um único loop de polling
+    engine = get_backend(backend, process_pool, max_in_flight=analyze_workers, limiter=musicai_limiter)
+    analyze_stage_workers = musicai_limiter.max_limit if backend == 'musicai' else analyze_workers
+    
+    # Faixas com id do Spotify são gravadas direto pela chave; o índice de títulos só é
+    # construído se aparecer um áudio antigo, nomeado pelo título do vídeo
+    row_by_id = {track_id: idx for idx, track_id in zip(df.index, df['id'])}
+    matcher = None
+    analyzed = set()
+    analyzed_lock = threading.Lock()
+    update_count = 0
+    
+    def record(item, stage, **data):
+        if state is not None:
+            state.advance(item.get('spotify_id'), stage, **data)
+    
+    def record_failure(item, stage, error):
+        if state is not None:
+            state.fail(item.get('spotify_id'), stage, error)
     
-    # Busca os vídeos no YouTube usando Selenium em paralelo com 2 workers
-    print("Buscando vídeos no YouTube com Selenium (paralelizado)...")
-    videos = youtube_catcher(tracks_names, max_workers=2)
-    valid_count = len([v for v in videos if v is not None])
-    print(f"URLs encontradas: {valid_count}/{len(videos)}")
+    def tracked(stage, func):
+        # Exceções de um estágio também ficam registradas no estado da faixa
+        def wrapper(item):
+            try:
+                return func(item)
+            except Exception as e:
+                record_failure(item, stage, f"{type(e).__name__}: {e}")
+                raise
+        return wrapper
     
-    if valid_count == 0:
-        print("Nenhum vídeo válido encontrado para download.")
-        return
+    def search_stage(item):
+        url = buscar_com_cache(item['nome'], item['artista'], search_engine, search_cache,
+                               item['spotify_id'], refresh_search, search_limiter)
+        if not url:
+            record_failure(item, 'searched', 'vídeo não encontrado')
+            return None
+        item['url'] = url
+        record(item, 'searched', url=url)
+        return item
     
-    # Filtra URLs None
-    valid_videos = [url for url in videos if url is not None]
+    def download_stage(item):
+        audio_path = download_limiter.wrap(download_track)(item['url'], track_id=item['spotify_id'],
+                                                           mode=audio_mode, nome=item['nome'], artista=item['artista'])
+        if not audio_path:
+            record_failure(item, 'downloaded', 'falha no download')
+            if search_cache is not None:
+                # URL em cache que não baixa (vídeo removido/privado): buscar de novo na próxima execução
+                search_cache.invalidate(item['nome'], item['artista'], item['spotify_id'])
+            return None
+        item['audio_path'] = audio_path
+        record(item, 'downloaded', audio_path=audio_path)
+        return item
     
-    if valid_videos:
-        # Baixa os vídeos como MP3 usando paralelização (max_workers=2 na função download)
-        print(f"Baixando {len(valid_videos)} vídeos...")
+    def shared_analysis(item):
+        # Cópia de um áudio já analisado (nesta execução ou em outra): reaproveita o resultado
+        representative, future = dedup.claim(item['audio_path'])
+        if representative is None:
+            return None
+        if future is not None:
+            shared = future.result()
+        else:
+            shared = cached_result(representative, backend, cache)
+            shared = shared[:4] if shared is not None else None
+        if shared is None:
+            return None
+        audio_url, bpm, root_key, _ = shared
+        METRICS.count('dedup_reused')
+        print(f"Deduplicação: {item['audio_path']} é cópia de {representative}; análise reaproveitada")
+        return audio_url, bpm, root_key, audio_name(item['audio_path'])
+    
+    def analyze_stage(item):
+        audio_path = os.path.abspath(item['audio_path'])
+        # O mesmo arquivo pode chegar por duas faixas ou já existir em audios/
+        with analyzed_lock:
+            if audio_path in analyzed:
+                return None
+            analyzed.add(audio_path)
+        if not item.get('spotify_id'):
+            # Áudios injetados de audios/: o id vem do manifesto (ou do nome do arquivo)
+            item['spotify_id'] = track_id_for(item['audio_path'])
+        
+        cached = cached_result(item['audio_path'], backend, cache)
+        if cached is not None:
+            item['result'] = cached
+            if dedup is not None:
+                dedup.publish(item['audio_path'], cached[:4])
+            if cached[0] and not cached[4]:
+                # Análise reaproveitada, mas o stem continua faltando: a faixa fica pendente
+                item['stem_failed'] = True
+                record(item, 'analyzed', audio_path=item['audio_path'], analysis=list(cached[:4]))
+                record_failure(item, 'stem_fetched', 'falha no download do stem')
+            else:
+                record(item, 'stem_fetched', audio_path=item['audio_path'], result=list(cached))
+            return item
+        
+        shared = shared_analysis(item) if dedup is not None else None
+        if shared is not None:
+            audio_url, bpm, root_key, original_name = shared
+        else:
+            print(f"Processando {item['audio_path']}...")
+            analysis = None
+            try:
+                analysis = engine.analyze(item['audio_path'])
+            finally:
+                if dedup is not None:
+                    # Libera as cópias que esperam por este arquivo; sem resultado, elas são analisadas
+                    succeeded = analysis is not None and (analysis[1] is not None or analysis[2])
+                    dedup.resolve(item['audio_path'], analysis if succeeded else None)
+            audio_url, bpm, root_key, original_name = analysis
+            print(f"Processamento concluído: {original_name}, BPM={bpm}, Tonalidade={root_key}")
+        if bpm is None and not root_key:
+            record_failure(item, 'analyzed', 'sem resultado de análise')
+        else:
+            record(item, 'analyzed', audio_path=item['audio_path'],
+                   analysis=[audio_url, bpm, root_key, original_name])
+        item['analysis'] = (audio_url, bpm, root_key, original_name)
+        return item
+    
+    def stem_stage(item):
+        if 'result' not in item:
+            audio_url, bpm, root_key, original_name = item['analysis']
+            if audio_url:
+                stem_path = stem_limiter.wrap(fetch_stem)(audio_url, original_name)
+            else:
+                stem_path = fetch_stem(audio_url, original_name)
+            item['result'] = (audio_url, bpm, root_key, original_name, stem_path)
+            if cache is not None and item.get('audio_path'):
+                # Resultados com stem faltando não entram no cache (AnalysisCache.put recusa)
+                cache.put(item['audio_path'], item['result'], backend)
+            if audio_url and not stem_path:
+                # BPM/tonalidade ainda são incorporados; a faixa fica pendente para refazer o stem
+                item['stem_failed'] = True
+                record_failure(item, 'stem_fetched', 'falha no download do stem')
+            elif bpm is not None or root_key:
+                record(item, 'stem_fetched', result=list(item['result']))
+        return item
+    
+    def merge(item):
+        nonlocal update_count, matcher
+        _, bpm, root_key, original_name, stem_path = item['result']
+        if not original_name:
+            return
+        if bpm is None and not root_key:
+            print(f"Sem resultado de análise para '{original_name}'. Dataset não alterado.")
+            if 'analysis' not in item:
+                record_failure(item, 'analyzed', 'sem resultado de análise')
+            return
+        spotify_id = item.get('spotify_id')
+        if spotify_id in row_by_id:
+            idx = [row_by_id[spotify_id]]
+            METRICS.count('keyed_merges')
+        else:
+            with METRICS.span('matching', track=original_name) as span:
+                if matcher is None:
+                    matcher = TrackMatcher.from_dataframe(df)
+                candidates = matcher.match(original_name, limit=1, keep_ties=True)
+                idx = top_indices(candidates)
+                if not idx:
+                    span.fail('sem correspondência')
+            if idx:
+                print(f"Encontrada correspondência para '{original_name}' "
+                      f"(score={candidates[0].score}). Atualizando {len(idx)} registros.")
+        if len(idx) > 0:
+            update_count += update_tracks(df, idx, bpm, root_key, stem_path, store)
+            if store is not None:
+                # Uma transação por faixa: o progresso sobrevive a uma queda no meio da execução
+                store.flush()
+            # Só depois da gravação no banco a faixa conta como concluída
+            if not item.get('stem_failed'):
+                record(item, 'merged')
+        else:
+            record_failure(item, 'merged', 'sem correspondência no dataset')
+            print(f"⚠ Não foi possível encontrar correspondência para '{original_name}' no dataset")
+            sample = df['nome'].sample(min(5, len(df))).tolist()
+            print(f"Algumas entradas no dataset: {sample}")
+    
+    def merge_result(item):
+        # Falha ao gravar uma faixa fica registrada nela; o Pipeline segue com as demais
         try:
-            download_results = download(valid_videos)
-            success_count = sum(1 for r in download_results if r)
-            print(f"Downloads concluídos: {success_count} de {len(valid_videos)}")
+            merge(item)
         except Exception as e:
-            print(f"Erro durante o download dos vídeos: {e}")
+            record_failure(item, 'merged', f"{type(e).__name__}: {e}")
+            raise
+    
+    stages = [
+        Stage('search', tracked('searched', search_stage), workers=search_limiter.max_limit),
+        Stage('download', tracked('downloaded', download_stage), workers=download_limiter.max_limit),
+        Stage('analyze', tracked('analyzed', analyze_stage), workers=analyze_stage_workers),
+        Stage('stem', tracked('stem_fetched', stem_stage), workers=stem_limiter.max_limit),
+    ]
+    ids = track_ids if track_ids is not None else [None] * len(tracks_names)
+    tracks = [{'nome': nome_musica, 'artista': nome_artista, 'spotify_id': spotify_id}
+              for (nome_musica, nome_artista), spotify_id in zip(tracks_names, ids)]
+    existing_audio = existing_audio or []
+    if state is not None:
+        items, inject, existing_audio = plan_resume(state, tracks, existing_audio, resume, retry_failed)
     else:
-        print("Nenhum vídeo válido encontrado para download.")
-        return
+        items, inject = tracks, {}
+    inject.setdefault('analyze', []).extend({'audio_path': path} for path in existing_audio)
+    
+    try:
+        pipeline = Pipeline(stages)
+        with get_search_backend(search_backend, workers=search_limiter.max_limit) as search_engine:
+            if progress:
+                with ProgressPrinter(METRICS):
+                    stats = pipeline.run(items, on_result=merge_result, inject=inject)
+            else:
+                stats = pipeline.run(items, on_result=merge_result, inject=inject)
+            search_engine.report()
+    finally:
+        engine.report()
+        engine.close()
+        if process_pool is not None:
+            process_pool.shutdown()
+    
+    for name, stage_stats in stats.items():
+        print(f"Estágio {name}: {stage_stats['processed']} itens, {stage_stats['dropped']} descartados, "
+              f"{stage_stats['errors']} erros, utilização {stage_stats['utilization']:.0%}")
+    if pipeline.result_errors:
+        print(f"{pipeline.result_errors} resultados não puderam ser incorporados ao dataset")
+    pipeline_stats.update(stats)
+    pipeline_stats['merge_errors'] = pipeline.result_errors
+    pipeline_stats['concurrency'] = limiter_report()
+    pipeline_stats['rate_limits'] = rate_limit_report()
+    
+    return update_count
+
+def main(playlist_id: Union[str, List[str]], backend: str = 'musicai', use_cache: bool = True,
+         search_workers: Optional[int] = None, download_workers: int = 2,
+         analyze_workers: Optional[int] = None, stem_workers: int = 2,
+         export_csv: bool = True, progress: bool = False, report_dir: Optional[str] = 'reports',
+         use_search_cache: bool = True, refresh_search: bool = False,
+         search_backend: str = 'selenium', audio_mode: str = 'mp3',
+         resume: bool = True, retry_failed: bool = False, deduplicate: bool = True) -> None:
+    """
+    Main function to execute the entire pipeline.
+    
+    Args:
+        playlist_id: ID da playlist do Spotify (ou lista de IDs)
+        backend: Backend de análise: "musicai", "local", "hybrid", "stream" ou "stream-windows"
+        use_cache: Reaproveitar resultados de análises anteriores (cache por hash do áudio)
+        search_workers: Número de buscas simultâneas no YouTube (padrão depende do backend de busca)
+        download_workers: Número inicial de downloads simultâneos
+        analyze_workers: Número de análises simultâneas (padrão depende do backend)
+        stem_workers: Número inicial de downloads de stems simultâneos
+        export_csv: Exportar o banco para tracks_with_stems.csv ao final da execução
+        progress: Mostrar uma linha de progresso por estágio durante o pipeline
+        report_dir: Diretório do relatório de métricas da execução (None para não gravar)
+        use_search_cache: Reaproveitar buscas no YouTube de execuções anteriores
+        refresh_search: Refazer todas as buscas no YouTube, atualizando o cache
+        search_backend: Backend de busca no YouTube: "selenium" ou "ytdlp" (sem navegador)
+        audio_mode: Formato dos áudios: "mp3", "native" (opus/m4a sem recodificar) ou "analysis"
+        resume: Retomar cada faixa no primeiro estágio incompleto da execução anterior e pular
+            as já incorporadas ao dataset (False reprocessa todas)
+        retry_failed: Processar apenas as faixas que falharam em alguma execução anterior
+        deduplicate: Agrupar cópias da mesma gravação por impressão digital e analisar só uma
+            (as demais reaproveitam o resultado, sem novos jobs no Music.ai)
+    """
+    print("Iniciando o processamento...")
+    start_time = time.time()
+    METRICS.reset()
+    pipeline_stats = {}
+    
+    # Obtém informações das faixas e uma lista formatada para busca no YouTube
+    print("Obtendo informações das faixas...")
+    tracks_info, tracks_names = take_tracks(playlist_id)
+    print(f"Total de faixas encontradas: {len(tracks_names)}")
 
-    # Load the dataset with track information
+    # Load the dataset with track information (banco SQLite, populado a partir do CSV na primeira vez)
+    store = open_store()
     try:
-        df = pd.read_csv('tracks_with_stems.csv', sep=';')
-        print(f"Dataset carregado com {len(df)} registros.")
-    except FileNotFoundError:
-        # Cria um DataFrame a partir das informações das faixas
-        df = pd.DataFrame(tracks_info)
-        df['stem_path'] = None
-        df['BPM'] = None
-        df['Root_key'] = None
-        print("Novo dataset criado.")
+        store.upsert_tracks(tracks_info)
     except Exception as e:
-        print(f"Erro ao carregar o dataset: {e}")
-        # Cria um novo DataFrame
-        df = pd.DataFrame(tracks_info)
-        df['stem_path'] = None
-        df['BPM'] = None
-        df['Root_key'] = None
-        print("Erro ao carregar dataset existente. Novo dataset criado.")
+        print(f"Erro ao registrar as faixas no banco: {e}")
+    df = store.load_dataframe()
+    print(f"Dataset carregado com {len(df)} registros.")
+    pipeline_stats['dataset_memory'] = memory_report(df)
 
     # Ensure audios directory exists
     if not os.path.exists('audios'):
         os.makedirs('audios')
 
-    # Coletar todos os arquivos de áudio para processamento
-    audio_files = []
+    # Arquivos de áudio de execuções anteriores também são processados
+    existing_audio = []
     
     try:
         for filename in os.listdir('audios'):
-            if filename.endswith('.mp3'):
+            if is_audio_file(filename):
                 audio_path = os.path.join('audios', filename)
-                audio_files.append(audio_path)
+                existing_audio.append(audio_path)
         
-        print(f"Total de arquivos de áudio encontrados: {len(audio_files)}")
+        print(f"Arquivos de áudio já existentes: {len(existing_audio)}")
     except Exception as e:
         print(f"Erro ao listar arquivos de áudio: {e}")
     
-    if not audio_files:
-        print("Nenhum arquivo de áudio encontrado para processar.")
-        return
+    cache = AnalysisCache() if use_cache else None
+    search_cache = SearchCache() if use_search_cache else None
+    state = TrackState(store.path)
+    dedup = Deduplicator() if deduplicate else None
     
-    # Processar cada arquivo individualmente para evitar problemas de paralelismo
-    update_count = 0
-    for audio_path in audio_files:
+    # Busca, download, análise e stems sobrepostos, com o dataset atualizado a cada resultado
+    print("Executando pipeline de busca, download e análise...")
+    update_count = run_streaming_pipeline(
+        tracks_names, df, backend=backend, cache=cache,
+        search_workers=search_workers, download_workers=download_workers,
+        analyze_workers=analyze_workers, stem_workers=stem_workers,
+        existing_audio=existing_audio, store=store,
+        progress=progress, pipeline_stats=pipeline_stats,
+        search_cache=search_cache, refresh_search=refresh_search, track_ids=tracks_info['id'],
+        search_backend=search_backend, audio_mode=audio_mode,
+        state=state, resume=resume, retry_failed=retry_failed, dedup=dedup,
+    )
+    pipeline_stats['track_state'] = state.summary()
+    state.close()
+    if dedup is not None:
+        pipeline_stats['dedup'] = dedup.report()
         try:
-            # Processar e baixar stem sem paralelismo
-            audio_url, bpm, root_key, original_name, stem_path = process_single_audio(audio_path)
-            
-            # Atualizar o dataframe diretamente após cada processamento
-            if original_name:
-                # Método 1: Usando contains case-insensitive
-                idx1 = df[df['nome'].str.contains(original_name, case=False, na=False)].index
-                
-                # Método 2: Usando similiaridade de strings (se o nome contém ou é contido)
-                idx2 = []
-                for i, row in df.iterrows():
-                    track_name = str(row['nome']).lower()
-                    proc_name = original_name.lower()
-                    if proc_name in track_name or track_name in proc_name:
-                        idx2.append(i)
-                
-                # Combinando os dois métodos
-                idx = list(set(idx1.tolist() + idx2))
-                
-                if len(idx) > 0:
-                    print(f"Encontrada correspondência para '{original_name}'. Atualizando {len(idx)} registros.")
-                    
-                    # Update the dataframe with all extracted information
-                    for i in idx:
-                        # Atualiza registro por registro explicitamente
-                        df.at[i, 'stem_path'] = stem_path  # Usando .at para acesso elemento a elemento
-                        df.at[i, 'BPM'] = bpm
-                        df.at[i, 'Root_key'] = root_key
-                        update_count += 1
-                        
-                    # Removido salvamento incremental para evitar arquivos intermediários
-                else:
-                    print(f"⚠ Não foi possível encontrar correspondência para '{original_name}' no dataset")
-                    sample = df['nome'].sample(min(5, len(df))).tolist()
-                    print(f"Algumas entradas no dataset: {sample}")
+            dedup.save()
         except Exception as e:
-            print(f"Erro ao processar {audio_path}: {e}")
+            print(f"Erro ao salvar o índice de impressões digitais: {e}")
+    
+    if cache is not None:
+        try:
+            cache.save()
+        except Exception as e:
+            print(f"Erro ao salvar o cache de análise: {e}")
+    if search_cache is not None:
+        try:
+            search_cache.save()
+        except Exception as e:
+            print(f"Erro ao salvar o cache de buscas: {e}")
     
     print(f"Atualizados {update_count} registros no dataset.")
     
@@ -174,9 +575,9 @@ def main(playlist_id: str) -> None:
         for _, row in sample_df.iterrows():
             print(f"Nome: {row['nome']}, BPM: {row['BPM']}, Tonalidade: {row['Root_key']}, Stem: {row['stem_path']}")
 
-    # Salvar o dataset após o processamento direto
+    # Gravar pendências do processamento direto (as linhas alteradas já foram gravadas uma a uma)
     try:
-        df.to_csv('tracks_with_stems.csv', index=False, sep=';')
+        store.flush()
         print("Dataset salvo após processamento direto!")
     except Exception as e:
         print(f"Erro ao salvar o dataset após processamento direto: {e}")
@@ -193,10 +594,19 @@ def main(playlist_id: str) -> None:
     
     # Chama a função de atualização a partir dos JSONs de debug
     try:
-        update_dataset()
+        update_dataset(store=store, export_csv=False)
     except Exception as e:
         print(f"Erro ao executar update_dataset: {e}")
     
+    # Exportar o CSV uma única vez, ao final
+    if export_csv:
+        try:
+            count = store.export_csv()
+            print(f"Dataset exportado para tracks_with_stems.csv ({count} registros).")
+        except Exception as e:
+            print(f"Erro ao exportar o dataset: {e}")
+    store.close()
+    
     # Calcular e mostrar o tempo total de execução
     end_time = time.time()
     elapsed_time_total = end_time - start_time
@@ -204,6 +614,19 @@ def main(playlist_id: str) -> None:
     print(f"Tempo para atualização a partir dos arquivos de debug: {elapsed_time_update:.2f} segundos")
     print(f"Processamento total concluído em {elapsed_time_total:.2f} segundos")
     
+    if cache is not None:
+        cache.report()
+    if search_cache is not None:
+        search_cache.report()
+    
+    if report_dir:
+        try:
+            paths = METRICS.write_report(report_dir, extra={'pipeline': pipeline_stats})
+            print(f"Relatório de métricas salvo em {paths['json']} e {paths['prometheus']} "
+                  f"(gargalo: {METRICS.bottleneck()})")
+        except Exception as e:
+            print(f"Erro ao salvar o relatório de métricas: {e}")
+    
     # Limpar arquivos temporários que possam ter sido criados
     try:
         temp_files = ['tracks_with_stems_incremental.csv', 
@@ -0,0 +1,292 @@
+"""
+Casamento indexado entre nomes de arquivos/títulos do YouTube e o dataset.
+
+Os títulos são normalizados uma única vez (casefold, caracteres full-width e
+estilizados convertidos para ASCII, ruído como "(Official Video)" removido) e
+indexados em um índice invertido de tokens e trigramas sobre `nome` +
+`artistas`. Cada consulta só pontua as linhas que compartilham tokens com ela
+ou trigramas suficientes para alcançar a pontuação mínima, em vez de varrer o
+DataFrame inteiro.
+"""
+
+import re
+import heapq
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+import pandas as pd
+
+# Palavras que indicam ruído quando aparecem entre parênteses/colchetes
+# ou como sufixo após " - " (ex.: "Nothing Else Matters - Remastered 2021")
+NOISE_WORDS = (
+    'official', 'oficial', 'video', 'videoclipe', 'audio', 'lyric', 'lyrics',
+    'letra', 'legendado', 'visualizer', 'hd', 'hq', '4k', 'remaster',
+    'remastered', 'remasterizado', 'feat', 'ft', 'featuring', 'explicit',
+    'clean', 'radio edit', 'mv', 'music video',
+)
+
+_NOISE_PATTERN = '|'.join(re.escape(word) for word in NOISE_WORDS)
+_BRACKETED_NOISE = re.compile(
+    r'[\(\[\{][^\)\]\}]*\b(?:' + _NOISE_PATTERN + r')\b[^\)\]\}]*[\)\]\}]'
+)
+_SUFFIX_NOISE = re.compile(r'\s-\s[^-]*\b(?:remaster|remastered|remasterizado)\b.*$')
+_FEAT_SUFFIX = re.compile(r'\s(?:feat|ft|featuring)\.?\s.*$')
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+# Trigramas em comum exigidos de uma linha que não compartilha nenhum token com a consulta
+MIN_SHARED_TRIGRAMS = 3
+
+
+def normalize_title(text: Optional[str]) -> str:
+    """
+    Normaliza um título para comparação.
+
+    Converte caracteres full-width e estilizados para ASCII (ex.: o `＂` em
+    `Vundabar - ＂Alien Blues＂`), remove acentos, aplica casefold, descarta
+    trechos de ruído como "(Official Video)" e colapsa a pontuação em espaços.
+
+    Args:
+        text: Título original
+
+    Returns:
+        Título normalizado (tokens separados por um espaço)
+    """
+    if text is None or (isinstance(text, float) and pd.isna(text)):
+        return ''
+    text = unicodedata.normalize('NFKC', str(text))
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = text.casefold()
+    text = _BRACKETED_NOISE.sub(' ', text)
+    text = _SUFFIX_NOISE.sub(' ', text)
+    text = _FEAT_SUFFIX.sub(' ', text)
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def _trigrams(text: str) -> Set[str]:
+    """
+    Gera os trigramas de caracteres de um texto normalizado.
+
+    Um único espaço de cada lado marca o início e o fim das palavras; um segundo
+    espaço inicial geraria trigramas como "  a", compartilhados por todos os
+    títulos que começam com a mesma letra.
+    """
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Candidate(NamedTuple):
+    """Candidato de correspondência para uma consulta."""
+    index: Hashable
+    score: float
+    nome: str
+
+
+def _rank(candidate: Candidate):
+    # Maior pontuação primeiro; empates em ordem estável de índice
+    return -candidate.score, str(candidate.index)
+
+
+class TrackMatcher:
+    """
+    Índice invertido de tokens e trigramas sobre `nome` + `artistas`.
+
+    O índice é construído uma vez por DataFrame e responde lotes de consultas
+    retornando candidatos pontuados e ordenados.
+    """
+
+    def __init__(self, indices: Sequence[Hashable], nomes: Sequence[str],
+                 artistas: Optional[Sequence[str]] = None,
+                 min_score: float = 0.5):
+        """
+        Args:
+            indices: Rótulos das linhas (normalmente `df.index`)
+            nomes: Nomes das faixas, na mesma ordem dos índices
+            artistas: Artistas de cada faixa (opcional)
+            min_score: Pontuação mínima para um candidato ser aceito
+        """
+        self.min_score = min_score
+        self._labels = list(indices)
+        self._nomes = [str(nome) for nome in nomes]
+        artistas = artistas if artistas is not None else [''] * len(self._labels)
+
+        self._title_norm: List[str] = []
+        self._title_tokens: List[Set[str]] = []
+        self._artist_tokens: List[Set[str]] = []
+        self._title_grams: List[Set[str]] = []
+        self._token_index: Dict[str, Set[int]] = defaultdict(set)
+        self._trigram_index: Dict[str, Set[int]] = defaultdict(set)
+
+        for row, (nome, artista) in enumerate(zip(nomes, artistas)):
+            title = normalize_title(nome)
+            artist = normalize_title(artista)
+            title_tokens = set(title.split())
+            artist_tokens = set(artist.split())
+
+            self._title_norm.append(title)
+            self._title_tokens.append(title_tokens)
+            self._artist_tokens.append(artist_tokens)
+            self._title_grams.append(_trigrams(title) if title else set())
+
+            for token in title_tokens | artist_tokens:
+                self._token_index[token].add(row)
+            for gram in self._title_grams[row]:
+                self._trigram_index[gram].add(row)
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, min_score: float = 0.5) -> 'TrackMatcher':
+        """
+        Constrói o índice a partir das colunas `nome` e `artistas` do dataset.
+
+        Args:
+            df: DataFrame com o dataset
+            min_score: Pontuação mínima para um candidato ser aceito
+
+        Returns:
+            Instância de TrackMatcher
+        """
+        artistas = df['artistas'].tolist() if 'artistas' in df.columns else None
+        return cls(df.index.tolist(), df['nome'].tolist(), artistas, min_score=min_score)
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def _score(self, row: int, query: str, query_tokens: Set[str],
+               query_grams: Set[str]) -> float:
+        """
+        Pontua uma linha do índice contra uma consulta já normalizada.
+        """
+        title = self._title_norm[row]
+        title_tokens = self._title_tokens[row]
+        if not title_tokens:
+            return 0.0
+
+        # Título inteiro contido na consulta (com limites de palavra) é o sinal mais forte
+        if f' {title} ' in f' {query} ' or f' {query} ' in f' {title} ':
+            title_score = 1.0
+        else:
+            token_cov = len(title_tokens & query_tokens) / len(title_tokens)
+            title_grams = self._title_grams[row]
+            gram_cov = len(title_grams & query_grams) / len(title_grams)
+            title_score = 0.9 * max(token_cov, gram_cov)
+
+        artist_tokens = self._artist_tokens[row]
+        if artist_tokens:
+            artist_score = len(artist_tokens & query_tokens) / len(artist_tokens)
+        else:
+            artist_score = 0.0
+
+        return 0.7 * title_score + 0.3 * artist_score
+
+    def match(self, name: str, limit: int = 5, keep_ties: bool = False) -> List[Candidate]:
+        """
+        Retorna os melhores candidatos para um único nome.
+
+        Args:
+            name: Nome a buscar (título do arquivo/vídeo)
+            limit: Número máximo de candidatos retornados
+            keep_ties: Incluir além do limite os candidatos empatados com o último
+
+        Returns:
+            Lista de candidatos ordenada pela pontuação (maior primeiro)
+        """
+        return self.match_many([name], limit=limit, keep_ties=keep_ties)[0]
+
+    def match_many(self, names: Iterable[str], limit: int = 5,
+                   keep_ties: bool = False) -> List[List[Candidate]]:
+        """
+        Responde um lote de consultas em uma única passada.
+
+        Consultas repetidas (após normalização) são resolvidas uma única vez.
+
+        Args:
+            names: Nomes a buscar
+            limit: Número máximo de candidatos por consulta
+            keep_ties: Incluir além do limite os candidatos empatados com o último
+
+        Returns:
+            Uma lista de candidatos ordenados para cada nome, na ordem de entrada
+        """
+        names = list(names)
+        resolved: Dict[str, List[Candidate]] = {}
+        results = []
+
+        for name in names:
+            query = normalize_title(name)
+            if query not in resolved:
+                resolved[query] = self._lookup(query, limit, keep_ties)
+            results.append(resolved[query])
+
+        return results
+
+    def _lookup(self, query: str, limit: int, keep_ties: bool = False) -> List[Candidate]:
+        """
+        Gera e pontua os candidatos de uma consulta normalizada.
+        """
+        if not query:
+            return []
+
+        query_tokens = set(query.split())
+        query_grams = _trigrams(query)
+
+        rows: Set[int] = set()
+        for token in query_tokens:
+            rows.update(self._token_index.get(token, ()))
+
+        # Sem token em comum, a pontuação de uma linha é no máximo 0.7 * 0.9 * cobertura
+        # de trigramas: linhas que não alcançam a pontuação mínima nem são pontuadas
+        shared: Counter = Counter()
+        for gram in query_grams:
+            shared.update(self._trigram_index.get(gram, ()))
+        min_coverage = self.min_score / (0.7 * 0.9)
+        for row, count in shared.items():
+            if row not in rows and count >= max(MIN_SHARED_TRIGRAMS,
+                                                min_coverage * len(self._title_grams[row])):
+                rows.add(row)
+
+        candidates = []
+        for row in rows:
+            score = self._score(row, query, query_tokens, query_grams)
+            if score >= self.min_score:
+                candidates.append(Candidate(self._labels[row], round(score, 4), self._nomes[row]))
+
+        if not keep_ties:
+            return heapq.nsmallest(limit, candidates, key=_rank)
+        candidates.sort(key=_rank)
+        if len(candidates) > limit > 0:
+            last = candidates[limit - 1].score
+            while limit < len(candidates) and candidates[limit].score == last:
+                limit += 1
+        return candidates[:limit]
+
+    def best_matches(self, name: str) -> List[Hashable]:
+        """
+        Retorna os índices de todas as linhas empatadas com a melhor pontuação.
+
+        Linhas duplicadas da mesma faixa no dataset recebem a mesma pontuação e,
+        por isso, são todas atualizadas, como no comportamento anterior.
+
+        Args:
+            name: Nome a buscar
+
+        Returns:
+            Lista de índices das melhores correspondências (vazia se nenhuma)
+        """
+        return top_indices(self.match(name, limit=1, keep_ties=True))
+
+
+def top_indices(candidates: List[Candidate]) -> List[Hashable]:
+    """
+    Seleciona os índices empatados com a melhor pontuação de uma lista de candidatos.
+
+    Args:
+        candidates: Candidatos ordenados pela pontuação
+
+    Returns:
+        Lista de índices com a maior pontuação
+    """
+    if not candidates:
+        return []
+    best = candidates[0].score
+    return [c.index for c in candidates if c.score == best]
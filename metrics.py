@@ -0,0 +1,299 @@
+"""
+Instrumentação do pipeline: spans nomeados, contadores e relatório da execução.
+
+Cada estágio (página do Spotify, busca, download, upload, espera do job, stem,
+casamento, escrita no banco/CSV) registra spans com duração, bytes e erros,
+agregados por estágio e por faixa. Ao final, o relatório pode ser gravado em
+JSON e no formato texto do Prometheus, e uma linha de progresso opcional mostra
+o andamento durante a execução.
+
+Uso:
+
+    from metrics import METRICS
+
+    with METRICS.span('download', track=url) as span:
+        ...
+        span.add_bytes(os.path.getsize(path))
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Span:
+    """
+    Span em andamento; permite anotar bytes transferidos e marcar erro.
+    """
+
+    def __init__(self, metrics: 'Metrics', stage: str, track: Optional[str]):
+        self.metrics = metrics
+        self.stage = stage
+        self.track = track
+        self.bytes = 0
+        self.error: Optional[str] = None
+        self._began = time.perf_counter()
+        self._finished = False
+
+    def add_bytes(self, n: int) -> None:
+        self.bytes += n
+
+    def fail(self, reason: str = 'erro') -> None:
+        """Marca o span como erro sem lançar exceção (ex.: função que retorna None)."""
+        self.error = reason
+
+    def finish(self) -> None:
+        """Encerra o span e registra a duração (chamadas repetidas são ignoradas)."""
+        if self._finished:
+            return
+        self._finished = True
+        self.metrics.observe(self.stage, time.perf_counter() - self._began, track=self.track,
+                             nbytes=self.bytes, error=self.error, _active=True)
+
+
+class _StageStats:
+    __slots__ = ('count', 'errors', 'bytes', 'total_time', 'durations', 'active')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_time = 0.0
+        self.durations: List[float] = []
+        self.active = 0
+
+
+class Metrics:
+    """
+    Registro de spans e contadores, seguro para uso entre threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._stages: Dict[str, _StageStats] = defaultdict(_StageStats)
+        self._tracks: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(dict)
+        self._counters: Dict[str, float] = defaultdict(float)
+
+    def reset(self) -> None:
+        """
+        Descarta tudo o que foi registrado e reinicia o relógio da execução.
+        """
+        with self._lock:
+            self.started_at = time.time()
+            self._stages.clear()
+            self._tracks.clear()
+            self._counters.clear()
+
+    def start(self, stage: str, track: Optional[str] = None) -> Span:
+        """
+        Abre um span que deve ser encerrado com `Span.finish()`.
+
+        Args:
+            stage: Nome do estágio (ex.: 'download')
+            track: Identificação da faixa (nome, URL ou id), para o detalhamento por faixa
+        """
+        with self._lock:
+            self._stages[stage].active += 1
+        return Span(self, stage, track)
+
+    @contextmanager
+    def span(self, stage: str, track: Optional[str] = None) -> Iterator[Span]:
+        """
+        Mede um trecho de código como um span do estágio.
+
+        Exceções são contabilizadas como erro e relançadas.
+        """
+        current = self.start(stage, track)
+        try:
+            yield current
+        except Exception as e:
+            current.fail(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            current.finish()
+
+    def observe(self, stage: str, seconds: float, track: Optional[str] = None,
+                nbytes: int = 0, error: Optional[str] = None, _active: bool = False) -> None:
+        """
+        Registra uma duração medida externamente (ex.: tempo de espera de um job).
+        """
+        with self._lock:
+            stats = self._stages[stage]
+            if _active:
+                stats.active -= 1
+            stats.count += 1
+            stats.total_time += seconds
+            stats.durations.append(seconds)
+            stats.bytes += nbytes
+            if error:
+                stats.errors += 1
+            if track is not None:
+                entry = self._tracks[str(track)].setdefault(stage, {'seconds': 0.0, 'bytes': 0, 'errors': 0})
+                entry['seconds'] += seconds
+                entry['bytes'] += nbytes
+                if error:
+                    entry['errors'] += 1
+                    entry['last_error'] = error
+
+    def count(self, name: str, value: float = 1) -> None:
+        """
+        Incrementa um contador livre (ex.: 'cache_hits').
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def snapshot(self) -> Dict:
+        """
+        Resumo por estágio, contadores e detalhamento por faixa.
+        """
+        with self._lock:
+            elapsed = time.time() - self.started_at
+            stages = {}
+            for name, stats in self._stages.items():
+                stages[name] = {
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'bytes': stats.bytes,
+                    'active': stats.active,
+                    'total_seconds': round(stats.total_time, 4),
+                    'p50_seconds': round(_percentile(stats.durations, 50), 4),
+                    'p99_seconds': round(_percentile(stats.durations, 99), 4),
+                    'max_seconds': round(max(stats.durations, default=0.0), 4),
+                    'throughput_per_s': round(stats.count / elapsed, 3) if elapsed > 0 else 0.0,
+                }
+            return {
+                'started_at': self.started_at,
+                'elapsed_seconds': round(elapsed, 3),
+                'stages': stages,
+                'counters': dict(self._counters),
+                'tracks': {track: dict(values) for track, values in self._tracks.items()},
+            }
+
+    def bottleneck(self) -> Optional[str]:
+        """
+        Estágio com maior tempo total acumulado.
+        """
+        stages = self.snapshot()['stages']
+        if not stages:
+            return None
+        return max(stages, key=lambda name: stages[name]['total_seconds'])
+
+    def to_prometheus(self, prefix: str = 'musicdata') -> str:
+        """
+        Exporta os agregados no formato texto do Prometheus.
+        """
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Tempo acumulado por estágio",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        for name, stats in snap['stages'].items():
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{name}"}} {stats["total_seconds"]}')
+        for metric, key, kind, help_text in (
+            ('stage_operations_total', 'count', 'counter', 'Operações concluídas por estágio'),
+            ('stage_errors_total', 'errors', 'counter', 'Erros por estágio'),
+            ('stage_bytes_total', 'bytes', 'counter', 'Bytes transferidos por estágio'),
+            ('stage_in_progress', 'active', 'gauge', 'Operações em andamento por estágio'),
+        ):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, stats in snap['stages'].items():
+                lines.append(f'{prefix}_{metric}{{stage="{name}"}} {stats[key]}')
+        lines.append(f"# HELP {prefix}_stage_latency_seconds Latência por estágio")
+        lines.append(f"# TYPE {prefix}_stage_latency_seconds summary")
+        for name, stats in snap['stages'].items():
+            lines.append(f'{prefix}_stage_latency_seconds{{stage="{name}",quantile="0.5"}} {stats["p50_seconds"]}')
+            lines.append(f'{prefix}_stage_latency_seconds{{stage="{name}",quantile="0.99"}} {stats["p99_seconds"]}')
+            lines.append(f'{prefix}_stage_latency_seconds_sum{{stage="{name}"}} {stats["total_seconds"]}')
+            lines.append(f'{prefix}_stage_latency_seconds_count{{stage="{name}"}} {stats["count"]}')
+        for name, value in snap['counters'].items():
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"{prefix}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, directory: str = 'reports', name: Optional[str] = None,
+                     extra: Optional[Dict] = None) -> Dict[str, str]:
+        """
+        Grava o relatório da execução em JSON e em texto do Prometheus.
+
+        Args:
+            directory: Diretório de saída
+            name: Nome base dos arquivos (padrão: run_<timestamp>)
+            extra: Dados adicionais incluídos no JSON (ex.: estatísticas do pipeline)
+
+        Returns:
+            Caminhos dos arquivos gravados ({'json': ..., 'prometheus': ...})
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = name or time.strftime('run_%Y%m%d_%H%M%S', time.localtime(self.started_at))
+        json_path = os.path.join(directory, f"{name}.json")
+        prom_path = os.path.join(directory, f"{name}.prom")
+
+        report = self.snapshot()
+        report['bottleneck'] = self.bottleneck()
+        report.update(extra or {})
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        with open(prom_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        return {'json': json_path, 'prometheus': prom_path}
+
+    def progress_line(self) -> str:
+        """
+        Linha curta com o andamento de cada estágio.
+        """
+        stages = self.snapshot()['stages']
+        parts = [
+            f"{name}: {stats['count']}" + (f"+{stats['active']}" if stats['active'] else '')
+            + (f" ({stats['errors']} err)" if stats['errors'] else '')
+            for name, stats in stages.items()
+        ]
+        return ' | '.join(parts)
+
+
+class ProgressPrinter:
+    """
+    Imprime periodicamente a linha de progresso (reescrita com \\r) enquanto ativo.
+    """
+
+    def __init__(self, metrics: 'Metrics', interval: float = 1.0, stream=None):
+        self.metrics = metrics
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.stream.write('\r' + self.metrics.progress_line()[:200].ljust(80))
+            self.stream.flush()
+
+    def __enter__(self) -> 'ProgressPrinter':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+# Registro padrão compartilhado por todos os módulos do pipeline
+METRICS = Metrics()
@@ -0,0 +1,362 @@
+"""
+Orquestrador de jobs do Music.ai.
+
+Reutiliza um único MusicAiClient, faz uploads em paralelo, mantém no máximo
+`max_in_flight` jobs em andamento e acompanha todos eles em um único loop de
+polling com backoff exponencial. Cada arquivo recebe um Future que é resolvido
+assim que o job correspondente termina; latência, tempo de fila e motivo de
+falha ficam registrados em vez de serem substituídos por valores simulados.
+"""
+
+import os
+import time
+import threading
+import concurrent.futures
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import dotenv
+from musicai_sdk import MusicAiClient
+
+from concurrency import AdaptiveLimiter, is_throttle_error
+from metrics import METRICS
+from rate_limit import rate_limited
+from track_manifest import audio_name, track_id_for
+from stems import JOB_NAME, WORKFLOW_ID, parse_job_result, save_debug_result
+
+dotenv.load_dotenv()
+
+FINAL_STATUSES = ('SUCCEEDED', 'FAILED')
+
+
+@dataclass
+class JobRecord:
+    """
+    Registro de um arquivo enviado ao Music.ai.
+    """
+    file_path: str
+    name: str
+    spotify_id: Optional[str] = None
+    job_id: Optional[str] = None
+    status: str = 'PENDING'
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    uploaded_at: Optional[float] = None
+    submitted_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    audio_url: Optional[str] = None
+    bpm: Optional[float] = None
+    root_key: Optional[str] = None
+
+    @property
+    def upload_time(self) -> Optional[float]:
+        """Tempo gasto no upload do arquivo."""
+        if self.uploaded_at is None:
+            return None
+        return self.uploaded_at - self.created_at
+
+    @property
+    def queue_time(self) -> Optional[float]:
+        """Tempo entre a criação do job e o início do processamento (ou o fim, se não observado)."""
+        if self.submitted_at is None:
+            return None
+        end = self.started_at or self.finished_at
+        return end - self.submitted_at if end else None
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Tempo total, do início do upload até o fim do job."""
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.created_at
+
+    def as_tuple(self) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+        """Resultado no formato de stems.separate_guitar (URL, BPM, tonalidade, nome)."""
+        return self.audio_url, self.bpm, self.root_key, self.name
+
+
+def _original_name(file_path: str) -> str:
+    return audio_name(file_path)
+
+
+class MusicAiOrchestrator:
+    """
+    Envia arquivos ao Music.ai com uploads paralelos e polling em lote.
+    """
+
+    def __init__(self, client: Optional[MusicAiClient] = None, api_key: Optional[str] = None,
+                 max_in_flight: int = 4, upload_workers: int = 4,
+                 poll_interval: float = 2.0, max_poll_interval: float = 30.0,
+                 job_timeout: float = 1800.0, save_debug: bool = True,
+                 limiter: Optional[AdaptiveLimiter] = None):
+        """
+        Args:
+            client: Cliente já criado (se omitido, um é criado com a chave API_MUSIC_AI)
+            api_key: Chave da API (padrão: variável de ambiente API_MUSIC_AI)
+            max_in_flight: Número máximo de jobs em andamento ao mesmo tempo
+            upload_workers: Número de uploads simultâneos
+            poll_interval: Intervalo inicial entre rodadas de polling (segundos)
+            max_poll_interval: Intervalo máximo do backoff exponencial
+            job_timeout: Tempo máximo de espera por um job antes de considerá-lo falho
+            save_debug: Acrescentar o resultado ao diário debug/results.jsonl, como separate_guitar
+            limiter: Limitador adaptativo de jobs em andamento (se omitido, o limite é fixo
+                em max_in_flight)
+        """
+        if client is None:
+            api_key = api_key or os.getenv('API_MUSIC_AI')
+            if not api_key:
+                raise RuntimeError("API_MUSIC_AI não encontrada nas variáveis de ambiente")
+            client = MusicAiClient(api_key=api_key)
+        self.client = client
+        self.max_in_flight = max(1, max_in_flight)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.job_timeout = job_timeout
+        self.save_debug = save_debug
+
+        self.records: List[JobRecord] = []
+        self._slots = limiter or AdaptiveLimiter('musicai', initial=self.max_in_flight,
+                                                 min_limit=self.max_in_flight, max_limit=self.max_in_flight)
+        self._uploads = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, upload_workers))
+        self._outstanding: Dict[str, Tuple[JobRecord, concurrent.futures.Future]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._poller = threading.Thread(target=self._poll_loop, name='musicai-poller', daemon=True)
+        self._poller.start()
+
+    def submit(self, file_path: str) -> concurrent.futures.Future:
+        """
+        Agenda o envio de um arquivo; o Future resolve para o JobRecord final.
+
+        Args:
+            file_path: Caminho do arquivo de áudio
+
+        Returns:
+            Future com o JobRecord do arquivo
+        """
+        record = JobRecord(file_path=file_path, name=_original_name(file_path),
+                           spotify_id=track_id_for(file_path))
+        with self._lock:
+            self.records.append(record)
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._uploads.submit(self._start_job, record, future)
+        return future
+
+    def analyze(self, file_path: str) -> Tuple[Optional[str], Optional[float], Optional[str], str]:
+        """
+        Envia um arquivo e bloqueia até o resultado (URL, BPM, tonalidade, nome).
+
+        Pode ser chamado de várias threads; o polling continua compartilhado.
+        """
+        return self.submit(file_path).result().as_tuple()
+
+    def run(self, file_paths: Iterable[str]) -> Iterator[JobRecord]:
+        """
+        Envia vários arquivos e entrega os registros à medida que os jobs terminam.
+
+        Args:
+            file_paths: Caminhos dos arquivos de áudio
+
+        Returns:
+            Iterador de JobRecord na ordem de conclusão
+        """
+        futures = [self.submit(file_path) for file_path in file_paths]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+    def _start_job(self, record: JobRecord, future: concurrent.futures.Future) -> None:
+        """
+        Faz o upload e cria o job, respeitando o limite de jobs em andamento.
+        """
+        try:
+            with METRICS.span('upload', track=record.name) as span, rate_limited('musicai'):
+                file_url = self.client.upload_file(file_path=record.file_path)
+                span.add_bytes(os.path.getsize(record.file_path))
+            record.uploaded_at = time.time()
+            print(f'Arquivo "{record.name}" enviado: {file_url}')
+        except Exception as e:
+            self._finish(record, future, 'FAILED', f"upload: {e}", release=False)
+            return
+
+        # Só cria o job quando houver vaga entre os jobs em andamento
+        self._slots.acquire()
+        try:
+            with rate_limited('musicai'):
+                create_job_info = self.client.create_job(
+                    job_name=JOB_NAME, workflow_id=WORKFLOW_ID, params={'inputUrl': file_url}
+                )
+            record.job_id = create_job_info['id']
+            record.submitted_at = time.time()
+            record.status = 'QUEUED'
+        except Exception as e:
+            self._finish(record, future, 'FAILED', f"create_job: {e}")
+            return
+
+        with self._lock:
+            self._outstanding[record.job_id] = (record, future)
+        self._wakeup.set()
+
+    def _finish(self, record: JobRecord, future: concurrent.futures.Future, status: str,
+                error: Optional[str] = None, release: bool = True) -> None:
+        record.status = status
+        record.error = error
+        record.finished_at = time.time()
+        if record.submitted_at is not None:
+            # Tempo do job no Music.ai, da criação até o resultado (fila + processamento)
+            METRICS.observe('job_wait', record.finished_at - record.submitted_at,
+                            track=record.name, error=error)
+        if error:
+            print(f"Falha no Music.ai para {record.name}: {error}")
+        if release:
+            # O tempo do job e as falhas (incluindo HTTP 429) ajustam o limite de jobs simultâneos
+            latency = record.finished_at - record.submitted_at if record.submitted_at else None
+            self._slots.release(latency, error=bool(error),
+                                throttled=bool(error) and is_throttle_error(error))
+        future.set_result(record)
+
+    def _poll_loop(self) -> None:
+        """
+        Consulta todos os jobs pendentes em uma única rodada, com backoff exponencial.
+
+        O intervalo volta ao mínimo sempre que algum job muda de estado.
+        """
+        interval = self.poll_interval
+        while not self._closed:
+            with self._lock:
+                outstanding = list(self._outstanding.items())
+            if not outstanding:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                interval = self.poll_interval
+                continue
+
+            progressed = False
+            for job_id, (record, future) in outstanding:
+                try:
+                    progressed = self._poll_job(job_id, record, future) or progressed
+                except Exception as e:
+                    # Um job com resposta inesperada não pode derrubar o polling dos demais
+                    print(f"Erro ao processar job {job_id}: {e}")
+                    self._take(job_id)
+                    if not future.done():
+                        try:
+                            self._finish(record, future, 'FAILED', f"polling: {e}")
+                        except Exception as finish_error:
+                            print(f"Erro ao encerrar job {job_id}: {finish_error}")
+
+            interval = self.poll_interval if progressed else min(interval * 2, self.max_poll_interval)
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+
+    def _poll_job(self, job_id: str, record: JobRecord, future: concurrent.futures.Future) -> bool:
+        """
+        Consulta um job pendente e o encerra se chegou ao fim ou estourou o timeout.
+
+        Returns:
+            True se o job mudou de estado
+        """
+        try:
+            with rate_limited('musicai'):
+                job_info = self.client.get_job(job_id=job_id)
+        except Exception as e:
+            # Consulta falhou: o job continua pendente, mas o timeout ainda vale
+            print(f"Erro ao consultar job {job_id}: {e}")
+            job_info = {}
+
+        progressed = False
+        status = job_info.get('status', '')
+        if status == 'STARTED' and record.started_at is None:
+            record.started_at = time.time()
+            record.status = status
+            progressed = True
+
+        if status in FINAL_STATUSES:
+            if self._take(job_id):
+                self._complete(record, future, job_info)
+            return True
+        if time.time() - record.submitted_at > self.job_timeout:
+            if self._take(job_id):
+                self._finish(record, future, 'FAILED', f"timeout após {self.job_timeout:.0f}s")
+            return True
+        return progressed
+
+    def _take(self, job_id: str) -> bool:
+        """
+        Retira um job dos pendentes; só quem o retirou resolve o Future dele.
+        """
+        with self._lock:
+            return self._outstanding.pop(job_id, None) is not None
+
+    def _complete(self, record: JobRecord, future: concurrent.futures.Future, job_info: dict) -> None:
+        if job_info.get('status') != 'SUCCEEDED':
+            error = job_info.get('error') or job_info.get('result') or 'job falhou'
+            self._finish(record, future, 'FAILED', str(error))
+            return
+        try:
+            record.audio_url, record.bpm, record.root_key = parse_job_result(job_info.get('result') or {})
+        except Exception as e:
+            self._finish(record, future, 'FAILED', f"resultado inválido: {e}")
+            return
+
+        print(f'Processamento concluído para "{record.name}": BPM={record.bpm}, Tonalidade={record.root_key}')
+        if self.save_debug:
+            try:
+                save_debug_result(record.file_path, record.name, record.audio_url, record.bpm, record.root_key,
+                                  spotify_id=record.spotify_id)
+            except Exception as e:
+                print(f"Erro ao salvar debug de {record.name}: {e}")
+        self._finish(record, future, 'SUCCEEDED')
+
+    def report(self) -> Dict[str, float]:
+        """
+        Imprime e retorna um resumo de latência, tempo de fila e falhas dos jobs.
+
+        Returns:
+            Dicionário com contagens e latências (médias e máximas)
+        """
+        with self._lock:
+            records = list(self.records)
+        finished = [r for r in records if r.finished_at is not None]
+        failed = [r for r in finished if r.status == 'FAILED']
+        latencies = [r.latency for r in finished if r.latency is not None]
+        queue_times = [r.queue_time for r in finished if r.queue_time is not None]
+
+        stats = {
+            'jobs': len(records),
+            'succeeded': len(finished) - len(failed),
+            'failed': len(failed),
+            'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_max': max(latencies, default=0.0),
+            'queue_time_avg': sum(queue_times) / len(queue_times) if queue_times else 0.0,
+        }
+        print(f"Music.ai: {stats['jobs']} jobs, {stats['succeeded']} concluídos, {stats['failed']} falhas, "
+              f"latência média {stats['latency_avg']:.1f}s (máx {stats['latency_max']:.1f}s), "
+              f"fila média {stats['queue_time_avg']:.1f}s")
+        for record in failed:
+            print(f"  Falha: {record.name}: {record.error}")
+        return stats
+
+    def close(self) -> None:
+        """
+        Encerra o loop de polling e o pool de uploads.
+
+        Jobs ainda pendentes são encerrados como falha, para que ninguém fique
+        bloqueado esperando um Future que o polling não vai mais resolver.
+        """
+        self._uploads.shutdown(wait=True)
+        self._closed = True
+        self._wakeup.set()
+        self._poller.join(timeout=self.max_poll_interval)
+        with self._lock:
+            outstanding = list(self._outstanding.items())
+            self._outstanding.clear()
+        for job_id, (record, future) in outstanding:
+            self._finish(record, future, 'FAILED', 'orquestrador encerrado antes do fim do job')
+
+    def __enter__(self) -> 'MusicAiOrchestrator':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
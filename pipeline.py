@@ -0,0 +1,202 @@
+"""
+Executor de pipeline em estágios sobrepostos.
+
+Cada item flui pelos estágios (ex.: busca → download → análise → stem) através
+de filas limitadas. Cada estágio tem seu próprio número de workers, e as filas
+limitadas aplicam contrapressão: um estágio rápido bloqueia quando o seguinte
+está cheio, em vez de acumular tudo na memória. Os resultados do último
+estágio são entregues ao chamador (na thread que chamou `run`) à medida que
+ficam prontos, de modo que o tempo total tende ao tempo do estágio mais lento
+e não à soma de todos.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Marcadores de controle das filas
+_EOS = object()   # Fim do fluxo de um produtor
+_STOP = object()  # Sinal para os demais workers do estágio encerrarem
+
+
+class Stage:
+    """
+    Estágio do pipeline.
+
+    A função recebe um item e retorna o item transformado; retornar None
+    descarta o item (ex.: vídeo não encontrado). Exceções são contabilizadas
+    como erro e também descartam o item.
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1,
+                 queue_size: Optional[int] = None):
+        """
+        Args:
+            name: Nome do estágio (usado nas estatísticas e na injeção de itens)
+            func: Função aplicada a cada item
+            workers: Número de threads do estágio
+            queue_size: Capacidade da fila de entrada (padrão: definido pelo Pipeline)
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_time = 0.0
+
+
+class Pipeline:
+    """
+    Encadeia estágios com filas limitadas entre eles.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 8):
+        """
+        Args:
+            stages: Estágios na ordem em que os itens os percorrem
+            queue_size: Capacidade padrão das filas entre estágios
+        """
+        if not stages:
+            raise ValueError("O pipeline precisa de pelo menos um estágio")
+        self.stages = stages
+        self.queue_size = queue_size
+        self._names = [stage.name for stage in stages]
+        self.result_errors = 0
+
+    def run(self, items: Iterable[Any] = (), on_result: Optional[Callable[[Any], None]] = None,
+            inject: Optional[Dict[str, Iterable[Any]]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Executa o pipeline até que todos os itens tenham sido processados.
+
+        Args:
+            items: Itens que entram no primeiro estágio
+            on_result: Chamado para cada item que sai do último estágio
+                (sempre na thread que chamou `run`); uma exceção nele é registrada e
+                o pipeline segue com os próximos itens
+            inject: Itens que entram diretamente em um estágio intermediário,
+                indexados pelo nome do estágio (ex.: arquivos já baixados)
+
+        Returns:
+            Estatísticas por estágio (processados, descartados, erros, tempo ocupado)
+        """
+        inject = inject or {}
+        for name in inject:
+            if name not in self._names:
+                raise ValueError(f"Estágio desconhecido: {name}")
+
+        sources: Dict[int, List[Iterable[Any]]] = {0: [items]}
+        for name, extra in inject.items():
+            sources.setdefault(self._names.index(name), []).append(extra)
+
+        queues = [queue.Queue(maxsize=stage.queue_size or self.queue_size) for stage in self.stages]
+        output: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        threads = []
+        for position, stage in enumerate(self.stages):
+            # Produtores da fila deste estágio: o estágio anterior e os alimentadores
+            expected_eos = len(sources.get(position, [])) + (1 if position > 0 else 0)
+            downstream = queues[position + 1] if position + 1 < len(self.stages) else output
+            threads.extend(self._start_stage(stage, queues[position], downstream, expected_eos))
+
+        for position, feeds in sources.items():
+            for feed in feeds:
+                feeder = threading.Thread(target=self._feed, args=(feed, queues[position]), daemon=True)
+                feeder.start()
+                threads.append(feeder)
+
+        start = time.time()
+        while True:
+            item = output.get()
+            if item is _EOS:
+                break
+            if on_result is not None:
+                try:
+                    on_result(item)
+                except Exception as e:
+                    # Como nos estágios: a falha fica com o item, não interrompe a execução
+                    print(f"Erro ao incorporar resultado: {e}")
+                    self.result_errors += 1
+
+        for thread in threads:
+            thread.join()
+
+        return self._stats(time.time() - start)
+
+    @staticmethod
+    def _feed(items: Iterable[Any], target: queue.Queue) -> None:
+        try:
+            for item in items:
+                target.put(item)
+        finally:
+            target.put(_EOS)
+
+    def _start_stage(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue,
+                     expected_eos: int) -> List[threading.Thread]:
+        """
+        Inicia as threads de um estágio.
+        """
+        lock = threading.Lock()
+        state = {'eos': 0, 'exited': 0}
+
+        def worker():
+            try:
+                while True:
+                    item = inbox.get()
+                    if item is _STOP:
+                        break
+                    if item is _EOS:
+                        with lock:
+                            state['eos'] += 1
+                            finished = state['eos'] >= expected_eos
+                        if finished:
+                            # Todos os produtores terminaram: liberar os outros workers
+                            for _ in range(stage.workers - 1):
+                                inbox.put(_STOP)
+                            break
+                        continue
+
+                    began = time.time()
+                    try:
+                        result = stage.func(item)
+                    except Exception as e:
+                        print(f"Erro no estágio '{stage.name}': {e}")
+                        result = None
+                        with lock:
+                            stage.errors += 1
+                    with lock:
+                        stage.busy_time += time.time() - began
+                        stage.processed += 1
+                        if result is None:
+                            stage.dropped += 1
+                    if result is not None:
+                        outbox.put(result)
+            finally:
+                with lock:
+                    state['exited'] += 1
+                    last = state['exited'] == stage.workers
+                if last:
+                    outbox.put(_EOS)
+
+        threads = []
+        for i in range(stage.workers):
+            thread = threading.Thread(target=worker, name=f"{stage.name}-{i}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _stats(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for stage in self.stages:
+            stats[stage.name] = {
+                'workers': stage.workers,
+                'processed': stage.processed,
+                'dropped': stage.dropped,
+                'errors': stage.errors,
+                'busy_time': round(stage.busy_time, 3),
+                # Fração do tempo total em que os workers do estágio estiveram ocupados
+                'utilization': round(stage.busy_time / (elapsed * stage.workers), 3) if elapsed else 0.0,
+            }
+        return stats
@@ -0,0 +1,258 @@
+"""
+Limitação de taxa por serviço externo (token bucket).
+
+Enquanto concurrency.py controla quantas operações ficam em andamento ao mesmo
+tempo, este módulo controla quantas requisições por segundo cada serviço recebe.
+Cada serviço (Spotify, busca e download no YouTube, Music.ai) tem um balde
+compartilhado por todas as threads do processo: as fichas se recompõem a `rate`
+por segundo até o limite `burst`, e cada chamada consome uma ficha, esperando
+na fila se o balde estiver vazio. Um HTTP 429 esvazia o balde e bloqueia o
+serviço pelo tempo do cabeçalho `Retry-After` (ou por um backoff padrão).
+
+    with rate_limited('spotify'):
+        sp.playlist_items(...)
+
+    get_rate_limiter('youtube_download').acquire()
+    try:
+        ...
+    except Exception as e:
+        note_throttle('youtube_download', e)
+
+Os limites podem ser ajustados por variável de ambiente, no formato
+`taxa:rajada` (ex.: `RATE_LIMIT_SPOTIFY=8:20`).
+"""
+
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from concurrency import is_throttle_error
+
+# (requisições por segundo, rajada) de cada serviço
+DEFAULT_RATES: Dict[str, Tuple[float, int]] = {
+    'spotify': (5.0, 10),
+    'youtube_search': (2.0, 5),
+    'youtube_download': (1.0, 3),
+    'musicai': (5.0, 10),
+}
+# Bloqueio aplicado a um 429 sem Retry-After, em segundos
+DEFAULT_RETRY_AFTER = 5.0
+# Número de esperas mantidas para os percentis do relatório
+_WAIT_SAMPLES = 1000
+
+_RETRY_AFTER_RE = re.compile(r'retry[- ]after\D{0,5}(\d+(?:\.\d+)?)', re.IGNORECASE)
+
+
+def retry_after_from(error) -> Optional[float]:
+    """
+    Extrai o tempo de espera (em segundos) do cabeçalho Retry-After de um erro, se houver.
+
+    Procura em `error.headers` (spotipy), em `error.response.headers` (requests) e,
+    por último, na mensagem do erro.
+    """
+    for headers in (getattr(error, 'headers', None), getattr(getattr(error, 'response', None), 'headers', None)):
+        if not headers:
+            continue
+        value = headers.get('Retry-After') or headers.get('retry-after')
+        if value is not None:
+            try:
+                return max(0.0, float(value))
+            except (TypeError, ValueError):
+                pass
+    match = _RETRY_AFTER_RE.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """
+    Balde de fichas de um serviço, seguro para uso entre threads.
+    """
+
+    def __init__(self, service: str, rate: float, burst: int):
+        """
+        Args:
+            service: Nome do serviço (aparece no relatório)
+            rate: Fichas recompostas por segundo (taxa sustentada de requisições)
+            burst: Capacidade do balde (requisições seguidas permitidas após um período ocioso)
+        """
+        if rate <= 0:
+            raise ValueError(f"Taxa inválida para {service}: {rate} (deve ser maior que zero)")
+        self.service = service
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.blocked_until = 0.0
+        self.calls = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._waits: List[float] = []
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """
+        Consome uma ficha, esperando se necessário.
+
+        Returns:
+            Tempo de espera na fila, em segundos
+        """
+        began = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    waited = now - began
+                    self._record(waited)
+                    return waited
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def _record(self, waited: float) -> None:
+        self.calls += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self._waits.append(waited)
+        if len(self._waits) > _WAIT_SAMPLES:
+            del self._waits[:len(self._waits) - _WAIT_SAMPLES]
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """
+        Registra um HTTP 429: esvazia o balde e bloqueia o serviço por retry_after segundos.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.throttled += 1
+            self.tokens = 0.0
+            delay = DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+            self.blocked_until = max(self.blocked_until, now + delay)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Taxa configurada, chamadas, limitações e tempo de espera na fila.
+        """
+        with self._lock:
+            waits = sorted(self._waits)
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+            return {
+                'rate_per_s': self.rate,
+                'burst': self.burst,
+                'calls': self.calls,
+                'throttled': self.throttled,
+                'total_wait_seconds': round(self.total_wait, 3),
+                'avg_wait_seconds': round(self.total_wait / self.calls, 4) if self.calls else 0.0,
+                'p95_wait_seconds': round(p95, 4),
+                'max_wait_seconds': round(self.max_wait, 4),
+            }
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _configured_rate(service: str) -> Tuple[float, int]:
+    rate, burst = DEFAULT_RATES.get(service, (5.0, 10))
+    value = os.getenv(f"RATE_LIMIT_{service.upper()}")
+    if value:
+        try:
+            rate_text, _, burst_text = value.partition(':')
+            new_rate = float(rate_text)
+            new_burst = int(burst_text) if burst_text else burst
+            if new_rate <= 0 or new_burst <= 0:
+                raise ValueError(value)
+            rate, burst = new_rate, new_burst
+        except ValueError:
+            print(f"Valor inválido em RATE_LIMIT_{service.upper()}: {value!r} "
+                  f"(use taxa:rajada, maiores que zero); mantendo {rate:g}:{burst}")
+    return rate, burst
+
+
+def get_rate_limiter(service: str, rate: Optional[float] = None, burst: Optional[int] = None) -> TokenBucket:
+    """
+    Retorna o balde do serviço, criando-o na primeira chamada.
+
+    Args:
+        service: 'spotify', 'youtube_search', 'youtube_download' ou 'musicai'
+        rate: Requisições por segundo (padrão: RATE_LIMIT_<SERVIÇO> ou DEFAULT_RATES)
+        burst: Rajada permitida (idem)
+
+    Returns:
+        Balde compartilhado pelo processo
+    """
+    with _buckets_lock:
+        if service not in _buckets:
+            default_rate, default_burst = _configured_rate(service)
+            _buckets[service] = TokenBucket(service, rate or default_rate, burst or default_burst)
+        return _buckets[service]
+
+
+def set_rate_limit(service: str, rate: float, burst: int) -> TokenBucket:
+    """
+    Substitui o balde do serviço por um com a taxa e a rajada informadas
+    (ex.: para benchmarks contra serviços locais).
+
+    Returns:
+        Novo balde do serviço
+    """
+    bucket = TokenBucket(service, rate, burst)
+    with _buckets_lock:
+        _buckets[service] = bucket
+    return bucket
+
+
+def note_throttle(service: str, error) -> bool:
+    """
+    Se o erro indicar limitação de taxa, bloqueia o serviço pelo Retry-After.
+
+    Returns:
+        True se o erro era uma limitação de taxa
+    """
+    if not is_throttle_error(error):
+        return False
+    retry_after = retry_after_from(error)
+    get_rate_limiter(service).penalize(retry_after)
+    print(f"Limitação de taxa em {service}; pausando por {retry_after or DEFAULT_RETRY_AFTER:.1f}s")
+    return True
+
+
+@contextmanager
+def rate_limited(service: str) -> Iterator[None]:
+    """
+    Executa uma chamada ao serviço respeitando o balde; um 429 lançado pela chamada
+    bloqueia o serviço pelo Retry-After e é relançado.
+    """
+    get_rate_limiter(service).acquire()
+    try:
+        yield
+    except Exception as e:
+        note_throttle(service, e)
+        raise
+
+
+def rate_limit_report() -> Dict[str, Dict[str, float]]:
+    """
+    Imprime e retorna a espera na fila e as limitações de cada serviço.
+    """
+    with _buckets_lock:
+        buckets = list(_buckets.values())
+    report = {}
+    for bucket in buckets:
+        stats = bucket.stats()
+        report[bucket.service] = stats
+        print(f"Taxa {bucket.service}: {stats['rate_per_s']:g}/s (rajada {stats['burst']}), "
+              f"{stats['calls']} chamadas, espera média {stats['avg_wait_seconds']:.3f}s "
+              f"(p95 {stats['p95_wait_seconds']:.3f}s), {stats['throttled']} limitações de taxa")
+    return report
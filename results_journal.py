@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Diário (journal) append-only dos resultados de análise.
+
+Cada resultado vira uma linha JSON em `debug/results.jsonl`, em vez de um
+arquivo `debug/<nome>_result.json` por faixa. O `update_dataset` guarda em
+`debug/results.checkpoint.json` o offset (em bytes) até onde o diário já foi
+aplicado e, na execução seguinte, lê apenas as linhas adicionadas depois dele:
+o tempo de atualização cresce com os resultados novos, não com o histórico.
+
+A compactação reescreve o diário mantendo só o registro mais recente de cada
+faixa (pelo id do Spotify ou, nos resultados antigos, pelo nome):
+
+    python results_journal.py compact
+    python results_journal.py import-debug   # incorpora os JSONs antigos de debug/
+    python results_journal.py status
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_JOURNAL_PATH = os.path.join('debug', 'results.jsonl')
+
+_append_lock = threading.Lock()
+
+
+def _checkpoint_path(journal_path: str) -> str:
+    return f"{os.path.splitext(journal_path)[0]}.checkpoint.json"
+
+
+def _import_marker_path(journal_path: str) -> str:
+    return f"{os.path.splitext(journal_path)[0]}.imported.json"
+
+
+def _write_json_atomic(path: str, data: Dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def record_key(record: Dict) -> str:
+    """
+    Chave de uma faixa no diário: id do Spotify ou, para resultados antigos, o nome.
+    """
+    if record.get('spotify_id'):
+        return f"id:{record['spotify_id']}"
+    return f"name:{record.get('name', '')}"
+
+
+class ResultsJournal:
+    """
+    Diário JSONL de resultados com checkpoint de replay.
+
+    As linhas são gravadas com um único write em modo append, então escritores
+    concorrentes (threads ou processos) não intercalam registros. Uma linha final
+    sem quebra de linha (escrita interrompida) é ignorada até ser completada.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH):
+        """
+        Args:
+            path: Arquivo JSONL do diário (o checkpoint fica ao lado, com extensão .checkpoint.json)
+        """
+        self.path = path
+        self.checkpoint_path = _checkpoint_path(path)
+        self.import_marker_path = _import_marker_path(path)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def append(self, record: Dict) -> None:
+        """
+        Acrescenta um registro ao diário.
+
+        Args:
+            record: Dicionário serializável em JSON (ex.: spotify_id, name, result)
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        record = dict(record)
+        record.setdefault('recorded_at', time.time())
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with _append_lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def _identity(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+
+    def load_checkpoint(self) -> int:
+        """
+        Offset do diário já aplicado ao dataset.
+
+        Retorna 0 (replay completo, que é idempotente) se o checkpoint não existir,
+        não corresponder ao arquivo atual (diário recriado ou compactado por fora)
+        ou apontar além do fim do arquivo.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return 0
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except Exception as e:
+            print(f"Erro ao ler checkpoint {self.checkpoint_path}: {e}")
+            return 0
+        offset = int(checkpoint.get('offset', 0))
+        if checkpoint.get('inode') != self._identity():
+            return 0
+        if offset > os.path.getsize(self.path):
+            return 0
+        return offset
+
+    def save_checkpoint(self, offset: int, inode: Optional[int] = None) -> None:
+        """
+        Grava de forma atômica o offset até onde o diário foi aplicado.
+        """
+        _write_json_atomic(self.checkpoint_path, {
+            'offset': offset,
+            'inode': inode if inode is not None else self._identity(),
+            'updated_at': time.time(),
+        })
+
+    def read_from(self, offset: int = 0) -> Iterator[Tuple[Dict, int]]:
+        """
+        Lê os registros a partir de um offset.
+
+        Args:
+            offset: Posição em bytes (início de uma linha)
+
+        Yields:
+            Tuplas (registro, offset logo após a linha), para gravar o checkpoint
+        """
+        if not self.exists():
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            position = offset
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Escrita ainda em andamento: fica para a próxima leitura
+                    break
+                position += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line), position
+                except Exception as e:
+                    print(f"Linha inválida no diário {self.path} (offset {position - len(line)}): {e}")
+
+    def pending(self) -> Tuple[List[Dict], int, int]:
+        """
+        Registros adicionados desde o último checkpoint.
+
+        Returns:
+            Tupla (registros, offset do checkpoint, offset final a gravar após aplicá-los)
+        """
+        start = self.load_checkpoint()
+        records = []
+        end = start
+        for record, end in self.read_from(start):
+            records.append(record)
+        return records, start, end
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Reescreve o diário mantendo só o registro mais recente de cada faixa.
+
+        Os registros já aplicados (antes do checkpoint) são condensados e os pendentes
+        são mantidos depois deles, na ordem; o checkpoint passa a apontar para o fim da
+        parte condensada. Não deve rodar junto com o pipeline (acréscimos feitos durante
+        a compactação seriam perdidos).
+
+        Returns:
+            Dicionário com registros antes/depois e bytes antes/depois
+        """
+        if not self.exists():
+            return {'records_before': 0, 'records_after': 0, 'bytes_before': 0, 'bytes_after': 0}
+        checkpoint = self.load_checkpoint()
+        applied: Dict[str, Dict] = {}
+        pending: List[Dict] = []
+        total = 0
+        for record, end in self.read_from(0):
+            total += 1
+            if end <= checkpoint:
+                # O mais recente vence; reinserir move a chave para o fim da ordem
+                key = record_key(record)
+                applied.pop(key, None)
+                applied[key] = record
+            else:
+                pending.append(record)
+
+        bytes_before = os.path.getsize(self.path)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for record in applied.values():
+                f.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+            folded_offset = f.tell()
+            for record in pending:
+                f.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        # O checkpoint é gravado com a identidade do novo arquivo antes da troca: se o
+        # processo cair entre as duas operações, a identidade não confere e o próximo
+        # update_dataset faz um replay completo (idempotente) em vez de pular registros
+        self.save_checkpoint(folded_offset, inode=os.stat(tmp_path).st_ino)
+        os.replace(tmp_path, self.path)
+
+        return {
+            'records_before': total,
+            'records_after': len(applied) + len(pending),
+            'bytes_before': bytes_before,
+            'bytes_after': os.path.getsize(self.path),
+        }
+
+    def import_debug_files(self, debug_dir: str = 'debug') -> int:
+        """
+        Acrescenta ao diário os JSONs antigos (`debug/<nome>_result.json`).
+
+        A importação acontece uma única vez: um marcador ao lado do diário impede
+        que os mesmos arquivos sejam acrescentados de novo nas execuções seguintes.
+
+        Returns:
+            Número de arquivos importados
+        """
+        if os.path.exists(self.import_marker_path) or not os.path.isdir(debug_dir):
+            return 0
+        journal_name = os.path.basename(self.path)
+        imported = 0
+        for filename in sorted(os.listdir(debug_dir)):
+            if not filename.endswith('_result.json') or filename == journal_name:
+                continue
+            file_path = os.path.join(debug_dir, filename)
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+                record.setdefault('recorded_at', os.path.getmtime(file_path))
+                self.append(record)
+                imported += 1
+            except Exception as e:
+                print(f"Erro ao importar {filename}: {e}")
+        _write_json_atomic(self.import_marker_path, {'imported': imported, 'imported_at': time.time()})
+        return imported
+
+    def status(self) -> Dict[str, int]:
+        """
+        Tamanho do diário e quantidade de bytes ainda não aplicados.
+        """
+        size = os.path.getsize(self.path) if self.exists() else 0
+        checkpoint = self.load_checkpoint() if self.exists() else 0
+        return {'bytes': size, 'checkpoint': checkpoint, 'pending_bytes': size - checkpoint}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    journal = ResultsJournal(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_JOURNAL_PATH)
+    if command == 'compact':
+        stats = journal.compact()
+        print(f"Diário compactado: {stats['records_before']} → {stats['records_after']} registros, "
+              f"{stats['bytes_before']} → {stats['bytes_after']} bytes.")
+    elif command == 'import-debug':
+        print(f"Importados {journal.import_debug_files()} arquivos de debug para {journal.path}.")
+    elif command == 'status':
+        stats = journal.status()
+        print(f"{journal.path}: {stats['bytes']} bytes, aplicado até {stats['checkpoint']} "
+              f"({stats['pending_bytes']} bytes pendentes).")
+    else:
+        print("Uso: python results_journal.py [status|compact|import-debug] [diario.jsonl]")
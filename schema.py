@@ -0,0 +1,140 @@
+"""
+Esquema tipado do dataset de faixas.
+
+Centraliza as colunas e os dtypes de `tracks_with_stems.csv`/`tracks.db` para que
+os DataFrames não dependam da inferência do pandas (que deixa BPM, Root_key e
+stem_path como `object` e repete as mesmas strings de artista/álbum/tonalidade
+em cada linha):
+
+- inteiros compactos e anuláveis (`duracao_ms` Int32, `popularity` Int8)
+- `explicit` booleano, `BPM` float32, `release_date` como data
+- `artistas`, `album` e `Root_key` categóricos
+
+O CSV é lido com o engine do pyarrow quando ele está instalado (com fallback
+para o engine C do pandas).
+"""
+
+from typing import Dict
+
+import pandas as pd
+
+# Colunas na mesma ordem do CSV
+COLUMNS = [
+    'id', 'nome', 'artistas', 'album', 'release_date', 'duracao_ms',
+    'popularity', 'explicit', 'url', 'stem_path', 'BPM', 'Root_key',
+]
+METADATA_COLUMNS = COLUMNS[:9]
+ANALYSIS_COLUMNS = ['stem_path', 'BPM', 'Root_key']
+
+# Tipos numéricos/booleanos anuláveis (faixas sem duração ou popularidade não viram float)
+DTYPES: Dict[str, str] = {
+    'duracao_ms': 'Int32',
+    'popularity': 'Int8',
+    'explicit': 'boolean',
+    'BPM': 'float32',
+}
+CATEGORICAL_COLUMNS = ('artistas', 'album', 'Root_key')
+DATE_COLUMNS = ('release_date',)
+
+_BOOL_VALUES = {'true': True, 'false': False, '1': True, '0': False, '1.0': True, '0.0': False}
+
+
+def _to_boolean(series: pd.Series) -> pd.Series:
+    if series.dtype == 'boolean':
+        return series
+    if series.dtype == bool:
+        return series.astype('boolean')
+    return series.map(lambda v: v if isinstance(v, bool) or pd.isna(v)
+                      else _BOOL_VALUES.get(str(v).strip().lower())).astype('boolean')
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as colunas conhecidas do dataset para os dtypes do esquema.
+
+    Colunas ausentes são criadas vazias; colunas extras são mantidas como estão.
+
+    Args:
+        df: DataFrame com as colunas do CSV (valores crus, como lidos do CSV ou do SQLite)
+
+    Returns:
+        O mesmo DataFrame, com os dtypes convertidos
+    """
+    for column in COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+
+    for column, dtype in DTYPES.items():
+        if dtype == 'boolean':
+            df[column] = _to_boolean(df[column])
+        else:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+
+    for column in DATE_COLUMNS:
+        # O Spotify informa datas com precisão de ano, mês ou dia ("1998", "1998-05", "1998-05-01")
+        df[column] = pd.to_datetime(df[column], format='mixed', errors='coerce')
+
+    for column in CATEGORICAL_COLUMNS:
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def read_tracks_csv(csv_path: str, sep: str = ';', typed: bool = True) -> pd.DataFrame:
+    """
+    Lê um CSV no formato de tracks_with_stems.csv.
+
+    Args:
+        csv_path: Caminho do CSV
+        sep: Separador do CSV
+        typed: Aplicar os dtypes do esquema (False mantém os valores crus, ex.: para importar no banco)
+
+    Returns:
+        DataFrame com as colunas do CSV
+    """
+    # Datas lidas como texto: o pyarrow converteria "1998-05-01" em Timestamp e o valor
+    # cru (typed=False) chegaria ao banco como "1998-05-01 00:00:00"
+    dtype = {column: str for column in DATE_COLUMNS}
+    try:
+        df = pd.read_csv(csv_path, sep=sep, engine='pyarrow', dtype=dtype)
+    except ImportError:
+        df = pd.read_csv(csv_path, sep=sep, dtype=dtype)
+    return apply_schema(df) if typed else df
+
+
+def set_value(df: pd.DataFrame, index, column: str, value) -> None:
+    """
+    Atribui um valor a uma célula, acrescentando a categoria se a coluna for categórica.
+
+    Args:
+        df: Dataset tipado
+        index: Rótulo da linha
+        column: Nome da coluna
+        value: Novo valor (None para vazio)
+    """
+    dtype = df[column].dtype
+    if isinstance(dtype, pd.CategoricalDtype) and value is not None and not pd.isna(value) \
+            and value not in dtype.categories:
+        df[column] = df[column].cat.add_categories([value])
+    df.at[index, column] = value
+
+
+def memory_report(df: pd.DataFrame, label: str = 'Dataset') -> Dict[str, int]:
+    """
+    Imprime e retorna o uso de memória do DataFrame por coluna (incluindo as strings).
+
+    Args:
+        df: DataFrame a medir
+        label: Nome usado na mensagem
+
+    Returns:
+        Bytes por coluna, mais a chave 'total'
+    """
+    usage = df.memory_usage(deep=True)
+    report = {str(column): int(nbytes) for column, nbytes in usage.items()}
+    report['total'] = int(usage.sum())
+    largest = sorted(((c, b) for c, b in report.items() if c not in ('total', 'Index')),
+                     key=lambda item: item[1], reverse=True)[:3]
+    print(f"{label}: {len(df)} registros, {report['total'] / 1024 ** 2:.2f} MB em memória "
+          f"(maiores colunas: {', '.join(f'{c} {b / 1024 ** 2:.2f} MB' for c, b in largest)})")
+    return report
@@ -0,0 +1,213 @@
+"""
+Backends de busca de vídeos no YouTube.
+
+- "selenium": navegador Chrome headless por worker (DriverPool), igual à busca original.
+- "ytdlp": resolve `ytsearchN:<termo>` dentro do processo com o yt-dlp, sem navegador.
+  Cada busca custa uma requisição HTTP e poucos MB de memória, então o número de
+  workers pode ser bem maior que o de navegadores.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import yt_dlp
+
+from driver_pool import DriverPool
+from metrics import METRICS
+from rate_limit import get_rate_limiter, note_throttle
+
+SEARCH_BACKENDS = ('selenium', 'ytdlp')
+
+
+class SearchBackend:
+    """
+    Interface dos backends de busca: termo "música - artista" → URL do primeiro vídeo.
+    """
+
+    name = 'base'
+    # Número de buscas simultâneas usado quando o chamador não informa max_workers
+    default_workers = 1
+    # Teto do limitador adaptativo de buscas simultâneas
+    max_workers = 1
+
+    def search(self, termo_busca: str) -> Optional[str]:
+        """
+        Busca um único vídeo; retorna a URL ou None se a busca não tiver resultados.
+
+        Erros (timeout, bloqueio, falha de rede) são relançados, e não convertidos em None:
+        o chamador não deve gravá-los como "vídeo inexistente" no cache de buscas.
+        """
+        raise NotImplementedError
+
+    def report(self) -> None:
+        """
+        Imprime estatísticas do backend ao fim da execução (se houver).
+        """
+
+    def close(self) -> None:
+        """
+        Libera recursos do backend (navegadores, sessões).
+        """
+
+    def __enter__(self) -> 'SearchBackend':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SeleniumSearchBackend(SearchBackend):
+    """
+    Busca pela página de resultados do YouTube em navegadores reutilizados.
+    """
+
+    name = 'selenium'
+    default_workers = 3
+    max_workers = 8
+
+    def __init__(self, pool_size: int = 3, max_uses: int = 50):
+        """
+        Args:
+            pool_size: Número de navegadores mantidos abertos
+            max_uses: Número de buscas após o qual cada navegador é reciclado
+        """
+        self.pool = DriverPool(size=pool_size, max_uses=max_uses)
+
+    def search(self, termo_busca: str) -> Optional[str]:
+        # Import tardio: youtuber_catcher importa este módulo
+        from youtuber_catcher import buscar_unico_video
+        return buscar_unico_video(termo_busca, self.pool)
+
+    def report(self) -> None:
+        print(f"Navegadores criados: {self.pool.created}, reciclados: {self.pool.recycled}")
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class YtDlpSearchBackend(SearchBackend):
+    """
+    Busca sem navegador, com o extrator `ytsearch` do yt-dlp.
+
+    Cada thread reutiliza a sua própria instância de YoutubeDL.
+    """
+
+    name = 'ytdlp'
+    default_workers = 16
+    max_workers = 64
+
+    def __init__(self, candidates: int = 1, socket_timeout: float = 15):
+        """
+        Args:
+            candidates: Número de resultados pedidos por busca (o primeiro vídeo é usado)
+            socket_timeout: Timeout das requisições, em segundos
+        """
+        self.candidates = max(1, candidates)
+        self.ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+            # Não resolve cada vídeo da lista de resultados: só id, título e URL
+            'extract_flat': 'in_playlist',
+            'socket_timeout': socket_timeout,
+        }
+        self._local = threading.local()
+        self._instances: List[yt_dlp.YoutubeDL] = []
+        self._lock = threading.Lock()
+
+    def _ydl(self) -> yt_dlp.YoutubeDL:
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(self.ydl_opts)
+            self._local.ydl = ydl
+            with self._lock:
+                self._instances.append(ydl)
+        return ydl
+
+    @staticmethod
+    def _entry_url(entry: dict) -> Optional[str]:
+        url = entry.get('url') or entry.get('webpage_url')
+        if url and url.startswith('http'):
+            return url
+        if entry.get('id'):
+            return f"https://www.youtube.com/watch?v={entry['id']}"
+        return None
+
+    def search(self, termo_busca: str) -> Optional[str]:
+        with METRICS.span('search', track=termo_busca) as span:
+            get_rate_limiter('youtube_search').acquire()
+            try:
+                info = self._ydl().extract_info(f"ytsearch{self.candidates}:{termo_busca}", download=False)
+            except Exception as e:
+                span.fail(f"{type(e).__name__}: {e}")
+                note_throttle('youtube_search', e)
+                print(f"Erro ao buscar vídeo '{termo_busca}': {e}")
+                raise
+
+            for entry in (info or {}).get('entries') or []:
+                # Ignorar canais e playlists que possam aparecer nos resultados
+                if entry and entry.get('ie_key', 'Youtube') == 'Youtube':
+                    video_url = self._entry_url(entry)
+                    if video_url:
+                        print(f"Encontrado vídeo para '{termo_busca}': {video_url}")
+                        return video_url
+            span.fail('sem resultados')
+            print(f"Nenhum vídeo encontrado para '{termo_busca}'")
+            return None
+
+    def close(self) -> None:
+        with self._lock:
+            for ydl in self._instances:
+                ydl.close()
+            self._instances.clear()
+
+
+_BACKEND_CLASSES: Dict[str, type] = {
+    'selenium': SeleniumSearchBackend,
+    'ytdlp': YtDlpSearchBackend,
+}
+
+
+def _backend_class(backend) -> type:
+    if isinstance(backend, SearchBackend):
+        return type(backend)
+    if backend not in _BACKEND_CLASSES:
+        raise ValueError(f"Backend de busca desconhecido: {backend!r}. Use um de {SEARCH_BACKENDS}")
+    return _BACKEND_CLASSES[backend]
+
+
+def default_workers(backend: str = 'selenium') -> int:
+    """
+    Número de buscas simultâneas recomendado para o backend (limite inicial do limitador).
+    """
+    return _backend_class(backend).default_workers
+
+
+def max_workers(backend: str = 'selenium') -> int:
+    """
+    Número máximo de buscas simultâneas do backend (teto do limitador adaptativo).
+    """
+    return _backend_class(backend).max_workers
+
+
+def get_search_backend(backend: str = 'selenium', workers: Optional[int] = None,
+                       max_uses: int = 50) -> SearchBackend:
+    """
+    Obtém uma instância do backend de busca pelo nome.
+
+    Args:
+        backend: "selenium" (navegador headless) ou "ytdlp" (yt-dlp, sem navegador)
+        workers: Número de buscas simultâneas; define o número de navegadores no backend "selenium"
+        max_uses: Buscas por navegador antes de reciclá-lo (ignorado pelo backend "ytdlp")
+
+    Returns:
+        Instância do backend
+    """
+    if isinstance(backend, SearchBackend):
+        return backend
+    if backend not in _BACKEND_CLASSES:
+        raise ValueError(f"Backend de busca desconhecido: {backend!r}. Use um de {SEARCH_BACKENDS}")
+    if backend == 'selenium':
+        return SeleniumSearchBackend(pool_size=workers or SeleniumSearchBackend.default_workers,
+                                     max_uses=max_uses)
+    return YtDlpSearchBackend()
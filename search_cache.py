@@ -0,0 +1,213 @@
+"""
+Cache persistente das buscas no YouTube.
+
+A resposta de uma busca "música - artista" quase nunca muda entre execuções,
+então cada resultado fica gravado em disco e a próxima execução pula o
+navegador para todas as faixas já conhecidas. A chave é o título e o artista
+normalizados (mesma normalização do matcher) e, quando disponível, o id do
+Spotify. Buscas sem resultado também são guardadas (cache negativo), com uma
+validade menor, para não repetir a mesma busca fracassada a cada execução.
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from matcher import normalize_title
+
+DEFAULT_SEARCH_CACHE_PATH = os.path.join('cache', 'search_cache.json')
+
+
+class SearchCache:
+    """
+    Cache de URLs de vídeo por (título, artista) normalizados e id do Spotify.
+
+    As entradas expiram por idade (ttl_days, ou negative_ttl_days para buscas
+    sem resultado) e, acima de max_entries, as menos recentemente usadas são
+    removidas primeiro.
+    """
+
+    def __init__(self, path: str = DEFAULT_SEARCH_CACHE_PATH, max_entries: int = 100000,
+                 ttl_days: Optional[float] = 30, negative_ttl_days: Optional[float] = 1):
+        """
+        Args:
+            path: Arquivo JSON onde o cache é persistido
+            max_entries: Número máximo de entradas mantidas
+            ttl_days: Validade de um resultado encontrado, em dias (None para não expirar)
+            negative_ttl_days: Validade de uma busca sem resultado, em dias (0 desativa o cache negativo)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_days = ttl_days
+        self.negative_ttl_days = negative_ttl_days
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Carrega o cache do disco, ignorando arquivos corrompidos.
+        """
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get('entries', {})
+        except Exception as e:
+            print(f"Erro ao carregar cache de buscas {self.path}: {e}")
+            self._entries = {}
+
+    @staticmethod
+    def keys_for(nome_musica: str, nome_artista: str, spotify_id: Optional[str] = None) -> List[str]:
+        """
+        Monta as chaves de uma faixa: id do Spotify (se houver) e título + artista normalizados.
+
+        Args:
+            nome_musica: Nome da música
+            nome_artista: Nome do artista
+            spotify_id: id da faixa no Spotify
+
+        Returns:
+            Lista de chaves, da mais específica para a menos específica
+        """
+        keys = [f"id:{spotify_id}"] if spotify_id else []
+        keys.append(f"q:{normalize_title(nome_musica)}|{normalize_title(nome_artista)}")
+        return keys
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        ttl = self.ttl_days if entry.get('url') else self.negative_ttl_days
+        if ttl is None:
+            return False
+        return now - entry.get('created_at', 0) > ttl * 86400
+
+    def lookup(self, nome_musica: str, nome_artista: str,
+               spotify_id: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Busca o resultado de uma faixa no cache.
+
+        Args:
+            nome_musica: Nome da música
+            nome_artista: Nome do artista
+            spotify_id: id da faixa no Spotify
+
+        Returns:
+            Tupla (encontrado no cache, URL do vídeo). A URL é None em um acerto
+            negativo (busca anterior sem resultado).
+        """
+        now = time.time()
+        with self._lock:
+            for key in self.keys_for(nome_musica, nome_artista, spotify_id):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if self._expired(entry, now):
+                    del self._entries[key]
+                    self.evictions += 1
+                    continue
+                entry['last_access'] = now
+                if entry.get('url'):
+                    self.hits += 1
+                else:
+                    self.negative_hits += 1
+                return True, entry.get('url')
+            self.misses += 1
+            return False, None
+
+    def put(self, nome_musica: str, nome_artista: str, url: Optional[str],
+            spotify_id: Optional[str] = None) -> bool:
+        """
+        Armazena o resultado de uma busca (url None registra uma busca sem resultado).
+
+        Args:
+            nome_musica: Nome da música
+            nome_artista: Nome do artista
+            url: URL do vídeo encontrado, ou None
+            spotify_id: id da faixa no Spotify
+
+        Returns:
+            True se o resultado foi armazenado
+        """
+        if not url and not self.negative_ttl_days:
+            return False
+        now = time.time()
+        entry = {'url': url, 'created_at': now, 'last_access': now}
+        with self._lock:
+            for key in self.keys_for(nome_musica, nome_artista, spotify_id):
+                self._entries[key] = dict(entry)
+        return True
+
+    def invalidate(self, nome_musica: str, nome_artista: str, spotify_id: Optional[str] = None) -> None:
+        """
+        Remove as entradas de uma faixa (ex.: vídeo indisponível no download).
+        """
+        with self._lock:
+            for key in self.keys_for(nome_musica, nome_artista, spotify_id):
+                self._entries.pop(key, None)
+
+    def evict(self) -> int:
+        """
+        Remove entradas expiradas e, se necessário, as menos usadas além de max_entries.
+
+        Returns:
+            Número de entradas removidas
+        """
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if self._expired(entry, now)]
+            for key in expired:
+                del self._entries[key]
+
+            overflow = len(self._entries) - self.max_entries
+            lru = []
+            if overflow > 0:
+                lru = sorted(self._entries, key=lambda k: self._entries[k].get('last_access', 0))[:overflow]
+                for key in lru:
+                    del self._entries[key]
+
+            removed = len(expired) + len(lru)
+            self.evictions += removed
+        return removed
+
+    def save(self) -> None:
+        """
+        Aplica o despejo e grava o cache no disco de forma atômica.
+        """
+        self.evict()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'entries': self._entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def report(self) -> Dict[str, float]:
+        """
+        Imprime e retorna as estatísticas de acerto do cache nesta execução.
+
+        Returns:
+            Dicionário com hits, hits negativos, misses, taxa de acerto, despejos e entradas
+        """
+        total = self.hits + self.negative_hits + self.misses
+        hit_rate = (self.hits + self.negative_hits) / total if total else 0.0
+        stats = {
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_rate': hit_rate,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+        }
+        print(f"Cache de buscas: {self.hits} hits, {self.negative_hits} hits negativos, {self.misses} misses "
+              f"({hit_rate:.0%} de acerto), {self.evictions} despejos, {len(self._entries)} entradas")
+        return stats
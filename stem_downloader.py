@@ -0,0 +1,282 @@
+"""
+Download de stems com sessão HTTP compartilhada, retomada e verificação.
+
+Todas as transferências usam um único `requests.Session` com pool de conexões
+(keep-alive), evitando um handshake TLS por arquivo. Cada stem é gravado em um
+arquivo `.part` e só é renomeado para o destino final, de forma atômica, depois
+de verificado (tamanho e cabeçalho WAV). Transferências interrompidas são
+retomadas com HTTP Range, e falhas vão para uma fila de novas tentativas em
+vez de virarem arquivos de zeros.
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import threading
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from concurrency import note_error
+from metrics import METRICS
+
+DEFAULT_RETRY_QUEUE_PATH = os.path.join('cache', 'stem_retry_queue.json')
+
+
+class StemIntegrityError(Exception):
+    """O arquivo baixado não passou na verificação de tamanho/cabeçalho."""
+
+
+class StemTruncatedError(StemIntegrityError):
+    """O arquivo baixado está incompleto, mas o que chegou pode ser retomado."""
+
+
+def check_wav_header(path: str) -> None:
+    """
+    Verifica se o arquivo tem um cabeçalho RIFF/WAVE coerente com o tamanho em disco.
+
+    Args:
+        path: Caminho do arquivo
+
+    Raises:
+        StemTruncatedError: Se o arquivo for menor que o tamanho declarado no cabeçalho
+        StemIntegrityError: Se o cabeçalho for inválido
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise StemIntegrityError(f"cabeçalho WAV inválido em {path}")
+    riff_size = struct.unpack('<I', header[4:8])[0]
+    # Alguns encoders gravam 0 ou 0xFFFFFFFF quando o tamanho é desconhecido (streaming)
+    if riff_size not in (0, 0xFFFFFFFF) and riff_size + 8 > size:
+        raise StemTruncatedError(f"WAV truncado em {path}: esperado {riff_size + 8} bytes, obtido {size}")
+
+
+class RetryQueue:
+    """
+    Fila persistente de downloads que falharam, para nova tentativa posterior.
+    """
+
+    def __init__(self, path: str = DEFAULT_RETRY_QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except Exception as e:
+                print(f"Erro ao carregar fila de novas tentativas {path}: {e}")
+
+    def add(self, url: str, output_path: str, error: str) -> None:
+        """
+        Registra (ou atualiza) uma falha de download.
+        """
+        with self._lock:
+            entry = self._entries.setdefault(output_path, {'attempts': 0})
+            entry.update({'url': url, 'output_path': output_path, 'error': error, 'failed_at': time.time()})
+            entry['attempts'] += 1
+            self._save()
+
+    def remove(self, output_path: str) -> None:
+        with self._lock:
+            if self._entries.pop(output_path, None) is not None:
+                self._save()
+
+    def entries(self) -> List[Dict]:
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class StemDownloader:
+    """
+    Baixa stems por uma sessão HTTP compartilhada, com retomada e verificação.
+    """
+
+    def __init__(self, chunk_size: int = 1 << 20, pool_size: int = 16, timeout: float = 30,
+                 max_attempts: int = 3, retry_queue: Optional[RetryQueue] = None):
+        """
+        Args:
+            chunk_size: Tamanho dos blocos lidos da resposta
+            pool_size: Número de conexões mantidas abertas no pool
+            timeout: Timeout de conexão/leitura em segundos
+            max_attempts: Tentativas (com retomada) antes de enviar o stem para a fila
+            retry_queue: Fila de falhas (padrão: cache/stem_retry_queue.json)
+        """
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_queue = retry_queue if retry_queue is not None else RetryQueue()
+
+        self.session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=frozenset(['GET', 'HEAD']), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _transfer(self, url: str, part_path: str) -> Optional[int]:
+        """
+        Baixa (ou continua baixando) a URL para o arquivo parcial.
+
+        Returns:
+            Tamanho total esperado, se informado pelo servidor
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+            if response.status_code == 416 and offset:
+                # O arquivo parcial já está completo (ou é maior que o recurso): recomeçar
+                os.remove(part_path)
+                return self._transfer(url, part_path)
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                mode = 'ab'
+                content_range = response.headers.get('Content-Range', '')
+                total = content_range.rsplit('/', 1)[-1] if '/' in content_range else ''
+                expected = int(total) if total.isdigit() else None
+            else:
+                # Servidor ignorou o Range: baixar do início
+                mode = 'wb'
+                length = response.headers.get('Content-Length')
+                expected = int(length) if length and length.isdigit() else None
+
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+        return expected
+
+    def fetch(self, url: str, output_path: str) -> Optional[str]:
+        """
+        Baixa um stem para output_path, verificando-o antes de torná-lo visível.
+
+        Args:
+            url: URL do stem
+            output_path: Caminho final do arquivo
+
+        Returns:
+            Caminho do arquivo baixado, ou None se falhar (a falha vai para a fila)
+        """
+        if url.startswith("https://example.com"):
+            # URL simulada: nenhum stem real para baixar
+            self.retry_queue.add(url, output_path, "URL simulada")
+            print(f"URL simulada para {output_path}; registrada na fila de novas tentativas")
+            return None
+
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with METRICS.span('stem_fetch', track=os.path.basename(output_path)) as span:
+            path = self._fetch_verified(url, output_path)
+            if path is None:
+                span.fail('download falhou')
+            else:
+                span.add_bytes(os.path.getsize(path))
+            return path
+
+    def _fetch_verified(self, url: str, output_path: str) -> Optional[str]:
+        part_path = f"{output_path}.part"
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                expected = self._transfer(url, part_path)
+                size = os.path.getsize(part_path)
+                if expected is not None and size < expected:
+                    raise StemTruncatedError(f"tamanho {size} menor que o esperado {expected}")
+                if expected is not None and size > expected:
+                    raise StemIntegrityError(f"tamanho {size} maior que o esperado {expected}")
+                if output_path.endswith('.wav'):
+                    check_wav_header(part_path)
+                os.replace(part_path, output_path)
+                self.retry_queue.remove(output_path)
+                return output_path
+            except StemTruncatedError as e:
+                # Transferência incompleta: manter o parcial e retomar com Range
+                error = str(e)
+                note_error(e)
+            except StemIntegrityError as e:
+                # Conteúdo inválido não pode ser retomado: descartar o parcial
+                error = str(e)
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+            except (requests.RequestException, OSError) as e:
+                # Parcial mantido para retomar com Range na próxima tentativa
+                error = str(e)
+                note_error(e)
+            print(f"Tentativa {attempt}/{self.max_attempts} falhou para {output_path}: {error}")
+
+        self.retry_queue.add(url, output_path, error or 'erro desconhecido')
+        return None
+
+    def retry_failed(self) -> List[str]:
+        """
+        Tenta novamente todos os downloads da fila de falhas.
+
+        Returns:
+            Caminhos dos stems que foram baixados com sucesso
+        """
+        recovered = []
+        for entry in self.retry_queue.entries():
+            if entry['url'].startswith("https://example.com"):
+                continue
+            path = self.fetch(entry['url'], entry['output_path'])
+            if path:
+                recovered.append(path)
+        return recovered
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_downloader: Optional[StemDownloader] = None
+_downloader_lock = threading.Lock()
+
+
+def get_downloader() -> StemDownloader:
+    """
+    Retorna o StemDownloader compartilhado pelo processo.
+    """
+    global _downloader
+    with _downloader_lock:
+        if _downloader is None:
+            _downloader = StemDownloader()
+        return _downloader
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    downloader = get_downloader()
+    if command == 'retry':
+        pending = len(downloader.retry_queue)
+        recovered = downloader.retry_failed()
+        downloader.close()
+        print(f"{len(recovered)} de {pending} stems recuperados; {len(downloader.retry_queue)} continuam na fila.")
+        if recovered:
+            print("Execute 'python update_dataset_from_debug.py --full' para gravar os caminhos no dataset.")
+    elif command == 'status':
+        for entry in downloader.retry_queue.entries():
+            print(f"{entry['output_path']}  tentativas={entry['attempts']}  erro={entry['error']}")
+        print(f"{len(downloader.retry_queue)} stems na fila de novas tentativas.")
+    else:
+        print("Uso: python stem_downloader.py [status|retry]")
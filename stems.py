@@ -1,10 +1,13 @@
 from musicai_sdk import MusicAiClient
 import os 
 import dotenv
-import requests
+from stem_downloader import get_downloader
+from track_manifest import audio_name, track_id_for
+from concurrency import get_limiter
+from results_journal import ResultsJournal
+from rate_limit import rate_limited
 import concurrent.futures
 import re
-import json
 from typing import List, Tuple, Optional
 
 dotenv.load_dotenv()
@@ -19,6 +22,52 @@ def sanitize_filename(filename: str) -> str:
     sanitized = sanitized.replace(' ', '_')
     return sanitized
 
+WORKFLOW_ID = 'icd-project'
+JOB_NAME = 'ICD Project'
+
+def parse_job_result(result: dict) -> Tuple[Optional[str], float, str]:
+    """
+    Extrai URL do stem, BPM e tonalidade do resultado de um job do Music.ai.
+    
+    Args:
+        result: Campo 'result' do job concluído
+        
+    Returns:
+        Tuple com (URL do áudio processado, BPM, tonalidade)
+    """
+    # Extrair dados e garantir tipos corretos
+    audio_url = result.get('Audio')
+    bpm = float(result.get('BPM', 0))
+    root_key = str(result.get('Root key', ''))
+    return audio_url, bpm, root_key
+
+def save_debug_result(file_path: str, original_name: str, audio_url: Optional[str],
+                      bpm: float, root_key: str, spotify_id: Optional[str] = None) -> None:
+    """
+    Acrescenta o resultado de uma análise ao diário debug/results.jsonl (lido pelo update_dataset).
+    
+    Args:
+        file_path: Caminho do arquivo de áudio analisado
+        original_name: Nome original do arquivo (sem extensão)
+        audio_url: URL do stem gerado
+        bpm: BPM extraído
+        root_key: Tonalidade extraída
+        spotify_id: id da faixa no Spotify (padrão: obtido do manifesto do áudio)
+    """
+    sanitized_name = sanitize_filename(original_name)
+    debug_data = {
+        'file_path': file_path,
+        'spotify_id': spotify_id or track_id_for(file_path),
+        'name': original_name,
+        'sanitized_name': sanitized_name,
+        'result': {
+            'url': audio_url,
+            'bpm': bpm,
+            'root_key': root_key
+        }
+    }
+    ResultsJournal().append(debug_data)
+
 def separate_guitar(file_path: str) -> Tuple[str, float, str, str]:
     """
     Processa um arquivo de áudio para separar a guitarra e extrair características.
@@ -27,13 +76,12 @@ def separate_guitar(file_path: str) -> Tuple[str, float, str, str]:
         file_path: Caminho para o arquivo de áudio
         
     Returns:
-        Tuple com (URL do áudio processado, BPM, tonalidade, nome do arquivo)
+        Tuple com (URL do áudio processado, BPM, tonalidade, nome do arquivo);
+        em caso de erro na API, URL, BPM e tonalidade são None
     """
     try:
-        # Obter o nome do arquivo original (sem sanitizar)
-        original_name = os.path.basename(file_path)
-        if '.mp3' in original_name:
-            original_name = original_name.replace('.mp3','')
+        # Obter o nome do arquivo original (sem sanitizar), para MP3 ou codec nativo (opus/m4a)
+        original_name = audio_name(file_path)
         
         # Sanitizar o nome para uso interno e nos caminhos dos arquivos
         sanitized_name = sanitize_filename(original_name)
@@ -52,11 +100,13 @@ def separate_guitar(file_path: str) -> Tuple[str, float, str, str]:
         client = MusicAiClient(api_key=key)
 
         # Get application info
-        app_info = client.get_application_info()
+        with rate_limited('musicai'):
+            app_info = client.get_application_info()
         print('Application Info:', app_info)
 
         # Upload local file
-        file_url = client.upload_file(file_path=file_path)
+        with rate_limited('musicai'):
+            file_url = client.upload_file(file_path=file_path)
         print(f'Arquivo "{original_name}" enviado: {file_url}')
 
         # Create Job
@@ -64,38 +114,25 @@ def separate_guitar(file_path: str) -> Tuple[str, float, str, str]:
             'inputUrl': file_url,
         }
 
-        create_job_info = client.create_job(job_name='ICD Project', workflow_id='icd-project', params=workflow_params)
+        with rate_limited('musicai'):
+            create_job_info = client.create_job(job_name=JOB_NAME, workflow_id=WORKFLOW_ID, params=workflow_params)
         job_id = create_job_info['id']
 
         # Wait for job to complete
         job_info = client.wait_for_job_completion(job_id)
 
         # Get job info
-        job_info = client.get_job(job_id=job_id)
+        with rate_limited('musicai'):
+            job_info = client.get_job(job_id=job_id)
         result = job_info['result']
 
-        # Extrair dados e garantir tipos corretos
-        audio_url = result.get('Audio')
-        bpm = float(result.get('BPM', 0))
-        root_key = str(result.get('Root key', ''))
+        audio_url, bpm, root_key = parse_job_result(result)
         
         print(f'Processamento concluído para "{original_name}": BPM={bpm}, Tonalidade={root_key}')
         print(f'Valores retornados: URL={audio_url}, BPM={bpm}, Tonalidade={root_key}, nome={original_name}')
         
         # Salvar os dados em um arquivo JSON para referência/debug
-        debug_data = {
-            'file_path': file_path,
-            'name': original_name,
-            'sanitized_name': sanitized_name,
-            'result': {
-                'url': audio_url,
-                'bpm': bpm,
-                'root_key': root_key
-            }
-        }
-        os.makedirs('debug', exist_ok=True)
-        with open(f'debug/{sanitized_name}_result.json', 'w') as f:
-            json.dump(debug_data, f, indent=2)
+        save_debug_result(file_path, original_name, audio_url, bpm, root_key)
             
         # Retorna o nome original, não o sanitizado
         return audio_url, bpm, root_key, original_name
@@ -103,23 +140,18 @@ def separate_guitar(file_path: str) -> Tuple[str, float, str, str]:
     except Exception as e:
         print(f"Erro ao processar {file_path}: {e}")
         # Obter o nome original mesmo em caso de erro
-        original_name = os.path.basename(file_path)
-        if '.mp3' in original_name:
-            original_name = original_name.replace('.mp3','')
-            
-        # Retornar valores simulados para testes em caso de erro
-        print("⚠️ Usando valores simulados para teste devido a erro")
-        bpm = 120.0
-        root_key = "C"
-        sanitized_name = sanitize_filename(original_name)
-        audio_url = f"https://example.com/stems/{sanitized_name}.wav"
-        # Retorna o nome original, não o sanitizado
-        return audio_url, bpm, root_key, original_name
+        original_name = audio_name(file_path)
+        # Sem valores simulados: uma falha (ex.: HTTP 429) não pode virar um BPM de 120 no dataset
+        return None, None, None, original_name
 
 def download_stem(url: str, music_name: str, output_dir: str = "guitar_stems") -> str:
     """
     Baixa um stem de áudio da URL fornecida.
     
+    Usa a sessão HTTP compartilhada do StemDownloader (keep-alive, retomada com Range e
+    verificação do arquivo). Em caso de falha nenhum arquivo é criado: o download é
+    registrado na fila de novas tentativas e a função retorna None.
+    
     Args:
         url: URL do arquivo de áudio
         music_name: Nome da música
@@ -135,9 +167,6 @@ def download_stem(url: str, music_name: str, output_dir: str = "guitar_stems") -
             
         # Sanitizar o nome do arquivo
         music_name = sanitize_filename(music_name)
-            
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
 
         # Garantir que o nome do arquivo tenha uma extensão
         if not music_name.endswith('.mp3') and not music_name.endswith('.wav'):
@@ -145,54 +174,27 @@ def download_stem(url: str, music_name: str, output_dir: str = "guitar_stems") -
             
         output_path = os.path.join(output_dir, music_name)
         
-        # Se a URL for simulada (para testes), criar um arquivo vazio
-        if url.startswith("https://example.com"):
-            print(f"URL simulada detectada. Criando arquivo vazio para {music_name}")
-            with open(output_path, 'wb') as f:
-                f.write(b'0' * 1024)  # 1KB de zeros
-            return output_path
-
-        # Adicionar um timeout para a requisição
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()  # Check if the request was successful
-
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        print(f"Stem baixado para: {output_path}")
-        return output_path
+        result = get_downloader().fetch(url, output_path)
+        if result:
+            print(f"Stem baixado para: {output_path}")
+        return result
     
-    except requests.RequestException as e:
-        print(f"Erro na requisição HTTP ao baixar stem de {url}: {e}")
-        
-        # Criar um arquivo vazio em caso de erro
-        if music_name and output_dir:
-            try:
-                if not os.path.exists(output_dir):
-                    os.makedirs(output_dir)
-                if not music_name.endswith('.mp3') and not music_name.endswith('.wav'):
-                    music_name = f"{music_name}.wav"
-                output_path = os.path.join(output_dir, music_name)
-                with open(output_path, 'wb') as f:
-                    f.write(b'0' * 1024)  # 1KB de zeros
-                print(f"Criado arquivo vazio para {music_name} após erro")
-                return output_path
-            except Exception as inner_e:
-                print(f"Erro ao criar arquivo vazio: {inner_e}")
-                
-        return None
     except Exception as e:
         print(f"Erro ao baixar stem de {url} para {music_name}: {e}")
         return None
 
-def process_audio_files(file_paths: List[str], max_workers: int = 2) -> List[Tuple]:
+def process_audio_files(file_paths: List[str], max_workers: int = 2, backend: str = 'musicai',
+                        max_limit: int = 16) -> List[Tuple]:
     """
     Processa múltiplos arquivos de áudio em paralelo.
     
     Args:
         file_paths: Lista de caminhos para os arquivos de áudio
-        max_workers: Número máximo de workers para paralelização
+        max_workers: Número inicial de jobs simultâneos no Music.ai; o limite se ajusta
+            sozinho até max_limit (a análise local usa um processo por núcleo)
+        backend: "musicai", "local", "hybrid" (local primeiro, Music.ai só para stems),
+            "stream" ou "stream-windows" (local em blocos, memória constante)
+        max_limit: Máximo de jobs simultâneos no Music.ai
         
     Returns:
         Lista de tuplas com (URL, BPM, tonalidade, nome) para cada arquivo
@@ -202,43 +204,36 @@ def process_audio_files(file_paths: List[str], max_workers: int = 2) -> List[Tup
     if not file_paths:
         print("Nenhum arquivo de áudio fornecido para processamento")
         return resultados
-        
-    print(f"Iniciando processamento de {len(file_paths)} arquivos com {max_workers} workers...")
     
-    # Usar ThreadPoolExecutor em vez de ProcessPoolExecutor para evitar problemas de pickling
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submeter todos os arquivos para processamento
-        futures = {executor.submit(separate_guitar, file_path): file_path for file_path in file_paths}
-        
-        # Coletar os resultados na ordem de conclusão
-        for i, future in enumerate(concurrent.futures.as_completed(futures)):
-            try:
-                original_path = futures[future]
-                result = future.result()
-                print(f"Processado {i+1}/{len(file_paths)}: {os.path.basename(original_path)}")
-                print(f"Resultado: {result}")
-                resultados.append(result)
-            except Exception as e:
-                print(f"Erro não tratado no processamento: {e}")
-                # Adicionar um resultado vazio para manter a correspondência com a entrada
-                basename = os.path.basename(futures[future])
-                name = sanitize_filename(basename.replace('.mp3', ''))
-                print(f"Usando valores simulados para {basename}")
-                bpm = 120.0
-                root_key = "C"
-                audio_url = f"https://example.com/stems/{name}.wav"
-                resultados.append((audio_url, bpm, root_key, name))
+    from analysis import get_backend
+    # Music.ai: jobs simultâneos controlados pelo limitador adaptativo; análise local: um processo por núcleo
+    limiter = get_limiter('musicai', initial=max_workers, max_limit=max(max_workers, max_limit))
+    engine = get_backend(backend, max_in_flight=max_workers, limiter=limiter)
+    print(f"Iniciando processamento de {len(file_paths)} arquivos com o backend '{engine.name}'...")
+    try:
+        resultados = engine.analyze_many(file_paths)
+        for i, (file_path, result) in enumerate(zip(file_paths, resultados)):
+            print(f"Processado {i+1}/{len(file_paths)}: {os.path.basename(file_path)}")
+            print(f"Resultado: {result}")
+        engine.report()
+    finally:
+        engine.close()
             
     return resultados
 
-def download_stems_parallel(urls_and_names: List[Tuple[str, str]], output_dir: str = "guitar_stems", max_workers: int = 2) -> List[str]:
+def download_stems_parallel(urls_and_names: List[Tuple[str, str]], output_dir: str = "guitar_stems",
+                            max_workers: int = 8, max_limit: int = 32) -> List[str]:
     """
-    Baixa múltiplos stems em paralelo.
+    Baixa múltiplos stems em paralelo (todas as threads compartilham o pool de conexões).
+    
+    O número de downloads simultâneos começa em max_workers e é ajustado pelo limitador
+    adaptativo 'stems' (cresce enquanto a latência se mantém, cai com erros e HTTP 429).
     
     Args:
         urls_and_names: Lista de tuplas (url, nome) para baixar
         output_dir: Diretório de saída
-        max_workers: Número máximo de workers para paralelização
+        max_workers: Número inicial de downloads simultâneos
+        max_limit: Máximo de downloads simultâneos
         
     Returns:
         Lista de caminhos para os arquivos baixados
@@ -249,14 +244,15 @@ def download_stems_parallel(urls_and_names: List[Tuple[str, str]], output_dir: s
         print("Nenhum stem para baixar")
         return resultados
         
-    print(f"Iniciando download de {len(urls_and_names)} stems com {max_workers} workers...")
+    limiter = get_limiter('stems', initial=max_workers, max_limit=max(max_workers, max_limit))
+    print(f"Iniciando download de {len(urls_and_names)} stems com limite inicial de {int(limiter.limit)} workers...")
     
-    # Usar ThreadPoolExecutor para operações I/O-bound
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+    # Usar ThreadPoolExecutor para operações I/O-bound; o limitador decide quantos rodam ao mesmo tempo
+    with concurrent.futures.ThreadPoolExecutor(max_workers=limiter.max_limit) as executor:
         # Submeter todos os downloads, garantindo que os nomes estejam sanitizados
         futures = {
             executor.submit(
-                download_stem, 
+                limiter.wrap(download_stem), 
                 url, 
                 sanitize_filename(name), 
                 output_dir
@@ -0,0 +1,99 @@
+"""
+Identidade das faixas nos arquivos gerados pelo pipeline.
+
+Os áudios baixados são nomeados pelo id do Spotify (`audios/<id>.mp3`, ou
+`.opus`/`.m4a` no modo sem recodificação) e cada um
+tem um manifesto ao lado (`audios/<id>.json`) com o id, a URL e o título do
+vídeo e o nome/artista da faixa. Assim, stems, resultados de análise e registros
+de debug carregam o id e a atualização do dataset é uma escrita direta pela
+chave, sem casamento aproximado de títulos.
+"""
+
+import os
+import re
+import json
+import time
+from typing import Dict, Optional
+
+# Ids de faixa do Spotify: 22 caracteres base62
+SPOTIFY_ID_RE = re.compile(r'^[0-9A-Za-z]{22}$')
+
+# Formatos de áudio produzidos pelo downloader (MP3 recodificado ou o codec nativo do YouTube)
+AUDIO_EXTENSIONS = ('.mp3', '.opus', '.m4a', '.webm', '.ogg', '.aac', '.wav', '.flac')
+
+
+def is_audio_file(path: str) -> bool:
+    """Indica se o arquivo tem uma das extensões de áudio aceitas pelo pipeline."""
+    return os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS
+
+
+def audio_name(file_path: str) -> str:
+    """
+    Nome do arquivo de áudio sem diretório e sem a extensão de áudio.
+    """
+    name = os.path.basename(file_path)
+    base, ext = os.path.splitext(name)
+    return base if ext.lower() in AUDIO_EXTENSIONS else name
+
+
+def is_spotify_id(value: Optional[str]) -> bool:
+    """Indica se o valor tem o formato de um id de faixa do Spotify."""
+    return bool(value) and bool(SPOTIFY_ID_RE.match(value))
+
+
+def manifest_path(audio_path: str) -> str:
+    """
+    Caminho do manifesto de um arquivo de áudio (mesmo nome, extensão .json).
+    """
+    return f"{os.path.splitext(audio_path)[0]}.json"
+
+
+def write_manifest(audio_path: str, spotify_id: str, **fields) -> str:
+    """
+    Grava o manifesto de um áudio baixado (de forma atômica).
+
+    Args:
+        audio_path: Caminho do arquivo de áudio
+        spotify_id: id da faixa no Spotify
+        **fields: Demais campos (ex.: youtube_url, title, nome, artista)
+
+    Returns:
+        Caminho do manifesto
+    """
+    path = manifest_path(audio_path)
+    data = {'spotify_id': spotify_id, 'audio_path': audio_path, 'created_at': time.time()}
+    data.update(fields)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_manifest(audio_path: str) -> Optional[Dict]:
+    """
+    Lê o manifesto de um áudio, se existir.
+    """
+    path = manifest_path(audio_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Erro ao ler manifesto {path}: {e}")
+        return None
+
+
+def track_id_for(audio_path: str) -> Optional[str]:
+    """
+    Descobre o id do Spotify de um arquivo de áudio.
+
+    Usa o manifesto; na falta dele, o próprio nome do arquivo, se for um id.
+    Arquivos antigos, nomeados pelo título do vídeo, retornam None.
+    """
+    manifest = read_manifest(audio_path)
+    if manifest and manifest.get('spotify_id'):
+        return manifest['spotify_id']
+    stem = os.path.splitext(os.path.basename(audio_path))[0]
+    return stem if is_spotify_id(stem) else None
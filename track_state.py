@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Estado persistente de cada faixa no pipeline, para retomar execuções interrompidas.
+
+Cada faixa (pelo id do Spotify) avança pelos estágios
+
+    discovered → searched → downloaded → analyzed → stem_fetched → merged
+
+e o estágio concluído, junto com os dados necessários para continuar (URL do
+vídeo, caminho do áudio, resultado da análise), fica gravado na tabela
+`track_state` de `tracks.db`. Falhas registram o estágio, a mensagem e o número
+de tentativas. Na execução seguinte, cada faixa recomeça no primeiro estágio
+incompleto e as já incorporadas ao dataset são puladas:
+
+    python track_state.py status
+    python track_state.py failed
+    python track_state.py reset [id ...]
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from track_store import DEFAULT_DB_PATH
+
+STAGES = ('discovered', 'searched', 'downloaded', 'analyzed', 'stem_fetched', 'merged')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS track_state (
+    spotify_id TEXT PRIMARY KEY,
+    nome TEXT,
+    artista TEXT,
+    stage TEXT NOT NULL,
+    data TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    failed_stage TEXT,
+    last_error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_track_state_stage ON track_state (stage);
+"""
+
+
+def stage_index(stage: str) -> int:
+    """Posição do estágio na ordem do pipeline."""
+    return STAGES.index(stage)
+
+
+class TrackState:
+    """
+    Tabela de estado por faixa, segura para uso a partir das threads do pipeline.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, max_attempts: int = 3):
+        """
+        Args:
+            path: Banco SQLite (o mesmo de TrackStore, em uma tabela própria)
+            max_attempts: Número de falhas após o qual a faixa só é refeita no modo "retry_failed"
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def discover(self, tracks: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Registra faixas novas no estágio "discovered" (faixas já conhecidas não mudam).
+
+        Args:
+            tracks: Tuplas (spotify_id, nome, artista)
+
+        Returns:
+            Número de faixas registradas
+        """
+        now = time.time()
+        rows = [(spotify_id, nome, artista, 'discovered', '{}', now)
+                for spotify_id, nome, artista in tracks if spotify_id]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO track_state (spotify_id, nome, artista, stage, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def get(self, spotify_id: str) -> Optional[Dict]:
+        """
+        Estado de uma faixa (None se desconhecida).
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT spotify_id, nome, artista, stage, data, attempts, failed_stage, last_error "
+                "FROM track_state WHERE spotify_id = ?", (spotify_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        Estado de todas as faixas, indexado pelo id do Spotify.
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT spotify_id, nome, artista, stage, data, attempts, failed_stage, last_error "
+                "FROM track_state").fetchall()
+        return {row[0]: self._row(row) for row in rows}
+
+    @staticmethod
+    def _row(row: Tuple) -> Dict:
+        spotify_id, nome, artista, stage, data, attempts, failed_stage, last_error = row
+        return {
+            'spotify_id': spotify_id,
+            'nome': nome,
+            'artista': artista,
+            'stage': stage,
+            'data': json.loads(data or '{}'),
+            'attempts': attempts,
+            'failed_stage': failed_stage,
+            'last_error': last_error,
+        }
+
+    def advance(self, spotify_id: Optional[str], stage: str, **data) -> None:
+        """
+        Marca um estágio como concluído, guardando os dados para retomar a partir dele.
+
+        O estágio nunca retrocede (ex.: um áudio reanalisado de uma faixa já incorporada).
+        Limpa a falha registrada. O número de tentativas volta a zero quando a faixa
+        chega a um estágio posterior: falhas de estágios já superados não contam para
+        o max_attempts do próximo.
+
+        Args:
+            spotify_id: id da faixa (ignorado se None)
+            stage: Estágio concluído
+            **data: Dados do estágio (ex.: url, audio_path, analysis, result)
+        """
+        if not spotify_id:
+            return
+        position = stage_index(stage)
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT stage, data FROM track_state WHERE spotify_id = ?",
+                                    (spotify_id,)).fetchone()
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO track_state (spotify_id, stage, data, updated_at) VALUES (?, ?, ?, ?)",
+                    (spotify_id, stage, json.dumps(data), time.time()))
+                return
+            current, stored = row
+            merged = json.loads(stored or '{}')
+            merged.update(data)
+            progressed = position > stage_index(current)
+            stage = stage if position >= stage_index(current) else current
+            self.conn.execute(
+                "UPDATE track_state SET stage = ?, data = ?, failed_stage = NULL, last_error = NULL, "
+                "attempts = CASE WHEN ? THEN 0 ELSE attempts END, updated_at = ? WHERE spotify_id = ?",
+                (stage, json.dumps(merged), progressed, time.time(), spotify_id))
+
+    def fail(self, spotify_id: Optional[str], stage: str, error: str) -> None:
+        """
+        Registra uma falha no estágio (a faixa continua no último estágio concluído).
+
+        Args:
+            spotify_id: id da faixa (ignorado se None)
+            stage: Estágio que falhou
+            error: Mensagem de erro
+        """
+        if not spotify_id:
+            return
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE track_state SET attempts = attempts + 1, failed_stage = ?, last_error = ?, "
+                "updated_at = ? WHERE spotify_id = ?",
+                (stage, str(error)[:500], time.time(), spotify_id))
+
+    def plan(self, spotify_ids: Iterable[str], retry_failed: bool = False) -> Dict[str, List[Dict]]:
+        """
+        Decide onde cada faixa recomeça.
+
+        Args:
+            spotify_ids: Faixas da execução atual
+            retry_failed: Processar apenas as faixas com falha registrada (ignorando max_attempts)
+
+        Returns:
+            Dicionário {estágio concluído: [estado da faixa]}, sem as faixas a pular
+            (já incorporadas, sem falha no modo retry_failed, ou com falhas demais)
+        """
+        states = self.load()
+        plan: Dict[str, List[Dict]] = {stage: [] for stage in STAGES[:-1]}
+        for spotify_id in spotify_ids:
+            state = states.get(spotify_id)
+            if state is None:
+                if not retry_failed:
+                    plan['discovered'].append({'spotify_id': spotify_id, 'stage': 'discovered', 'data': {}})
+                continue
+            if state['stage'] == 'merged':
+                continue
+            if retry_failed:
+                if not state['failed_stage']:
+                    continue
+            elif state['failed_stage'] and state['attempts'] >= self.max_attempts:
+                continue
+            plan[state['stage']].append(state)
+        return plan
+
+    def reset(self, spotify_ids: Optional[Iterable[str]] = None) -> int:
+        """
+        Volta faixas para "discovered", apagando dados e falhas (todas, se nenhum id for informado).
+
+        Returns:
+            Número de faixas alteradas
+        """
+        sql = ("UPDATE track_state SET stage = 'discovered', data = '{}', attempts = 0, "
+               "failed_stage = NULL, last_error = NULL, updated_at = ?")
+        with self._lock, self.conn:
+            if spotify_ids is None:
+                return self.conn.execute(sql, (time.time(),)).rowcount
+            return sum(self.conn.execute(f"{sql} WHERE spotify_id = ?", (time.time(), spotify_id)).rowcount
+                       for spotify_id in spotify_ids)
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Imprime e retorna o número de faixas por estágio concluído e com falha.
+        """
+        with self._lock:
+            counts = dict(self.conn.execute(
+                "SELECT stage, COUNT(*) FROM track_state GROUP BY stage").fetchall())
+            failed = self.conn.execute(
+                "SELECT COUNT(*) FROM track_state WHERE failed_stage IS NOT NULL").fetchone()[0]
+        report = {stage: counts.get(stage, 0) for stage in STAGES}
+        report['failed'] = failed
+        print("Estado das faixas: " + ', '.join(f"{stage} {report[stage]}" for stage in STAGES)
+              + f" ({failed} com falha)")
+        return report
+
+    def failures(self) -> List[Dict]:
+        """
+        Faixas com falha registrada.
+        """
+        return [state for state in self.load().values() if state['failed_stage']]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'TrackState':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    with TrackState() as state:
+        if command == 'status':
+            state.summary()
+        elif command == 'failed':
+            for entry in state.failures():
+                print(f"{entry['spotify_id']} {entry['nome']} - {entry['artista']}: "
+                      f"{entry['failed_stage']} ({entry['attempts']} tentativas): {entry['last_error']}")
+        elif command == 'reset':
+            print(f"{state.reset(sys.argv[2:] or None)} faixas voltaram para 'discovered'.")
+        else:
+            print("Uso: python track_state.py [status|failed|reset [id ...]]")
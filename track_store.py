@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Armazenamento incremental das faixas em SQLite.
+
+As faixas ficam em uma tabela indexada pelo `id` do Spotify. As escritas são
+upserts em lote dentro de transações e alteram apenas as linhas modificadas,
+de modo que o progresso parcial fica gravado mesmo se a execução cair no meio.
+O CSV (`tracks_with_stems.csv`) continua disponível por exportação sob demanda:
+
+    python track_store.py export [arquivo.csv]
+    python track_store.py import [arquivo.csv]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from metrics import METRICS
+from schema import ANALYSIS_COLUMNS, COLUMNS, METADATA_COLUMNS, apply_schema, read_tracks_csv
+
+DEFAULT_DB_PATH = 'tracks.db'
+DEFAULT_CSV_PATH = 'tracks_with_stems.csv'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id TEXT PRIMARY KEY,
+    nome TEXT,
+    artistas TEXT,
+    album TEXT,
+    release_date TEXT,
+    duracao_ms INTEGER,
+    popularity INTEGER,
+    explicit INTEGER,
+    url TEXT,
+    stem_path TEXT,
+    BPM REAL,
+    Root_key TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tracks_nome ON tracks (nome);
+"""
+
+
+def _clean(value):
+    """
+    Converte valores do pandas/numpy (NaN, numpy scalars, bool) para tipos do SQLite.
+    """
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+class TrackStore:
+    """
+    Tabela SQLite de faixas com upsert por id do Spotify.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, batch_size: int = 500):
+        """
+        Args:
+            path: Caminho do arquivo SQLite
+            batch_size: Número de linhas acumuladas antes de um commit automático
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._pending: Dict[str, Dict] = {}
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+
+    def upsert(self, rows: Iterable[Dict], columns: Optional[Sequence[str]] = None) -> int:
+        """
+        Insere ou atualiza linhas em uma única transação.
+
+        Somente as colunas informadas são escritas; as demais colunas de uma linha
+        já existente são preservadas (ex.: atualizar metadados sem apagar o BPM).
+
+        Args:
+            rows: Dicionários com, no mínimo, a chave 'id'
+            columns: Colunas a escrever (padrão: as chaves da primeira linha)
+
+        Returns:
+            Número de linhas escritas
+        """
+        rows = [row for row in rows if row.get('id')]
+        if not rows:
+            return 0
+        columns = [c for c in (columns or rows[0].keys()) if c in COLUMNS and c != 'id']
+
+        names = ['id'] + columns + ['updated_at']
+        placeholders = ', '.join('?' for _ in names)
+        assignments = ', '.join(f'{c} = excluded.{c}' for c in columns + ['updated_at'])
+        sql = (f"INSERT INTO tracks ({', '.join(names)}) VALUES ({placeholders}) "
+               f"ON CONFLICT(id) DO UPDATE SET {assignments}")
+
+        now = time.time()
+        values = [
+            [_clean(row['id'])] + [_clean(row.get(c)) for c in columns] + [now]
+            for row in rows
+        ]
+        with METRICS.span('db_write'):
+            with self.conn:
+                self.conn.executemany(sql, values)
+        METRICS.count('db_rows_written', len(values))
+        return len(values)
+
+    def upsert_tracks(self, tracks_info: Union[Dict[str, list], Iterable[Dict]]) -> int:
+        """
+        Registra os metadados vindos do Spotify sem sobrescrever os resultados de análise.
+
+        Args:
+            tracks_info: Colunas retornadas por take_tracks ({coluna: valores})
+                ou lista de dicionários por faixa
+
+        Returns:
+            Número de linhas escritas
+        """
+        if isinstance(tracks_info, dict):
+            tracks_info = [dict(zip(tracks_info, values)) for values in zip(*tracks_info.values())]
+        return self.upsert(tracks_info, METADATA_COLUMNS[1:])
+
+    def stage_analysis(self, track_id: str, bpm: Optional[float], root_key: Optional[str],
+                       stem_path: Optional[str]) -> None:
+        """
+        Acumula a atualização de BPM/tonalidade/stem de uma faixa.
+
+        As atualizações são gravadas em lote a cada `batch_size` linhas, ou em `flush()`.
+
+        Args:
+            track_id: id do Spotify
+            bpm: BPM extraído
+            root_key: Tonalidade extraída
+            stem_path: Caminho do stem
+        """
+        self._pending[track_id] = {'id': track_id, 'stem_path': stem_path, 'BPM': bpm, 'Root_key': root_key}
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Grava as atualizações acumuladas em uma transação.
+
+        Returns:
+            Número de linhas gravadas
+        """
+        if not self._pending:
+            return 0
+        written = self.upsert(self._pending.values(), ANALYSIS_COLUMNS)
+        self._pending.clear()
+        return written
+
+    def load_dataframe(self, typed: bool = True) -> pd.DataFrame:
+        """
+        Carrega todas as faixas em um DataFrame com as colunas do CSV.
+
+        Args:
+            typed: Aplicar os dtypes de schema.py (False mantém os valores como gravados,
+                ex.: datas de lançamento com a precisão original para exportar o CSV)
+        """
+        df = pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM tracks ORDER BY rowid", self.conn)
+        if typed:
+            return apply_schema(df)
+        df['explicit'] = df['explicit'].map({1: True, 0: False})
+        return df
+
+    def import_csv(self, csv_path: str = DEFAULT_CSV_PATH, sep: str = ';') -> int:
+        """
+        Importa (upsert) as linhas de um CSV no formato de tracks_with_stems.csv.
+
+        Args:
+            csv_path: Caminho do CSV
+            sep: Separador do CSV
+
+        Returns:
+            Número de linhas importadas
+        """
+        df = read_tracks_csv(csv_path, sep=sep, typed=False)
+        columns = [c for c in COLUMNS if c in df.columns]
+        return self.upsert(df[columns].to_dict('records'), columns)
+
+    def export_csv(self, csv_path: str = DEFAULT_CSV_PATH, sep: str = ';') -> int:
+        """
+        Exporta a tabela para CSV (gravando em arquivo temporário e renomeando).
+
+        Args:
+            csv_path: Caminho do CSV de saída
+            sep: Separador do CSV
+
+        Returns:
+            Número de linhas exportadas
+        """
+        self.flush()
+        with METRICS.span('csv_write') as span:
+            df = self.load_dataframe(typed=False)
+            tmp_path = f"{csv_path}.tmp"
+            df.to_csv(tmp_path, index=False, sep=sep)
+            os.replace(tmp_path, csv_path)
+            span.add_bytes(os.path.getsize(csv_path))
+        return len(df)
+
+    def close(self) -> None:
+        """
+        Grava pendências e fecha a conexão.
+        """
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self) -> 'TrackStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_store(path: str = DEFAULT_DB_PATH, csv_path: str = DEFAULT_CSV_PATH) -> TrackStore:
+    """
+    Abre o banco de faixas, importando o CSV existente na primeira execução.
+
+    Args:
+        path: Caminho do arquivo SQLite
+        csv_path: CSV usado para popular um banco vazio
+
+    Returns:
+        TrackStore aberto
+    """
+    store = TrackStore(path)
+    if len(store) == 0 and os.path.exists(csv_path):
+        try:
+            count = store.import_csv(csv_path)
+            print(f"Banco {path} populado a partir de {csv_path} ({count} registros).")
+        except Exception as e:
+            print(f"Erro ao importar {csv_path}: {e}")
+    return store
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'export'
+    csv_file = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CSV_PATH
+    with open_store() as store:
+        if command == 'export':
+            print(f"Exportados {store.export_csv(csv_file)} registros para {csv_file}.")
+        elif command == 'import':
+            print(f"Importados {store.import_csv(csv_file)} registros de {csv_file}.")
+        else:
+            print("Uso: python track_store.py [export|import] [arquivo.csv]")
@@ -1,66 +1,157 @@
 import os
+import threading
+import concurrent.futures
 import dotenv
 import pandas as pd
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from metrics import METRICS
+from rate_limit import rate_limited
 
 # Carregar variáveis de ambiente (API_CLIENT_ID e API_CLIENT_SECRET)
 dotenv.load_dotenv()
 
-def take_tracks(playlist_id: str) -> list:
-    # Autenticação usando credenciais do Spotify
-    client_id = os.getenv('API_CLIENT_ID')
-    client_secret = os.getenv('API_CLIENT_SECRET')
-    client_credentials_manager = SpotifyClientCredentials(
-        client_id=client_id, 
-        client_secret=client_secret
-    )
-    sp = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
-
-    tracks_info = []
+# Tamanho máximo de página aceito pelo endpoint de itens da playlist
+PAGE_SIZE = 100
+
+# Apenas os campos usados no dataset são pedidos à API
+TRACK_FIELDS = (
+    'track(id,name,duration_ms,popularity,explicit,'
+    'artists(name),album(name,release_date),external_urls(spotify))'
+)
+PAGE_FIELDS = f'items({TRACK_FIELDS})'
+FIRST_PAGE_FIELDS = f'total,{PAGE_FIELDS}'
+
+TRACK_COLUMNS = ['id', 'nome', 'artistas', 'album', 'release_date', 'duracao_ms', 'popularity', 'explicit', 'url']
+
+_client: Optional[spotipy.Spotify] = None
+_client_lock = threading.Lock()
+
+def get_client() -> spotipy.Spotify:
+    """
+    Retorna o cliente do Spotify compartilhado, criando-o na primeira chamada.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Autenticação usando credenciais do Spotify
+            client_id = os.getenv('API_CLIENT_ID')
+            client_secret = os.getenv('API_CLIENT_SECRET')
+            client_credentials_manager = SpotifyClientCredentials(
+                client_id=client_id,
+                client_secret=client_secret
+            )
+            _client = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
+        return _client
+
+def _fetch_page(sp: spotipy.Spotify, playlist_id: str, offset: int, fields: str) -> dict:
+    """
+    Busca uma página de itens da playlist, registrando o span 'spotify_page'.
+
+    A chamada passa pelo limitador de taxa do Spotify (um 429 pausa as demais páginas
+    pelo Retry-After).
+    """
+    with METRICS.span('spotify_page', track=playlist_id), rate_limited('spotify'):
+        return sp.playlist_items(playlist_id, fields=fields, limit=PAGE_SIZE,
+                                 offset=offset, additional_types=('track',))
+
+def fetch_playlist_items(sp: spotipy.Spotify, playlist_id: str,
+                         executor: concurrent.futures.Executor) -> List[dict]:
+    """
+    Busca todos os itens de uma playlist, com as páginas em paralelo.
+
+    A primeira página informa o `total`; os offsets das demais são calculados a partir dele
+    e buscados de forma concorrente, em vez de seguir os links `next` um a um.
+
+    Args:
+        sp: Cliente do Spotify
+        playlist_id: ID da playlist
+        executor: Pool de threads usado para buscar as páginas
+
+    Returns:
+        Lista de itens da playlist, na ordem original
+    """
+    first = _fetch_page(sp, playlist_id, 0, FIRST_PAGE_FIELDS)
+    total = first.get('total') or 0
+    offsets = range(PAGE_SIZE, total, PAGE_SIZE)
+
+    pages = executor.map(lambda offset: _fetch_page(sp, playlist_id, offset, PAGE_FIELDS), offsets)
+    items = list(first.get('items', []))
+    for page in pages:
+        items.extend(page.get('items', []))
+    return items
+
+def take_tracks(playlist_ids: Union[str, Sequence[str]], max_workers: int = 8) -> Tuple[Dict[str, list], List[Tuple[str, str]]]:
+    """
+    Coleta as faixas de uma ou mais playlists do Spotify.
+
+    Args:
+        playlist_ids: ID de uma playlist ou lista de IDs
+        max_workers: Número de páginas buscadas simultaneamente
+
+    Returns:
+        Tuple com (colunas do dataset em formato {coluna: lista de valores}, pronto para
+        pd.DataFrame; lista de (nome_musica, nome_artista) para a busca no YouTube).
+        Faixas repetidas entre playlists aparecem uma única vez.
+    """
+    if isinstance(playlist_ids, str):
+        playlist_ids = [playlist_ids]
+
+    sp = get_client()
+    tracks_info = {column: [] for column in TRACK_COLUMNS}
     tracks_list = []
-    # Obter a primeira página com faixas da playlist
-    results = sp.playlist_tracks(playlist_id)
-    
-    # Loop para coletar todas as páginas (caso haja mais de 100 faixas)
-    while results:
-        for item in results['items']:
-            track = item['track']
-            # Evitar casos em que o track pode ser None (por exemplo, se foi removido)
-            if track is None:
-                continue
-                
-            # Obtém nome da música e nome do artista principal para a lista de busca
-            nome_musica = track.get('name')
-            nome_artista = track['artists'][0].get('name') if track.get('artists') else ""
-            tracks_list.append((nome_musica, nome_artista))
-
-            # Coletar informações desejadas
-            track_data = {
-                'id': track.get('id'),
-                'nome': track.get('name'),
-                'artistas': ', '.join([artist.get('name') for artist in track.get('artists', [])]),
-                'album': track['album'].get('name'),
-                'release_date': track['album'].get('release_date'),
-                'duracao_ms': track.get('duration_ms'),
-                'popularity': track.get('popularity'),
-                'explicit': track.get('explicit'),
-                'url': track['external_urls'].get('spotify')
-            }
-            tracks_info.append(track_data)
-
-        # Verifica se existe próxima página de resultados
-        if results.get('next'):
-            results = sp.next(results)
-        else:
-            break
-    print(tracks_list)
+    seen = set()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # As playlists também são buscadas em paralelo; as páginas de cada uma usam o mesmo pool
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(playlist_ids), max_workers) or 1) as playlists:
+            futures = [playlists.submit(fetch_playlist_items, sp, pid, executor) for pid in playlist_ids]
+
+            for playlist_id, future in zip(playlist_ids, futures):
+                try:
+                    items = future.result()
+                except Exception as e:
+                    print(f"Erro ao buscar a playlist {playlist_id}: {e}")
+                    continue
+
+                for item in items:
+                    track = item.get('track')
+                    # Evitar casos em que o track pode ser None (por exemplo, se foi removido)
+                    if track is None:
+                        continue
+
+                    track_id = track.get('id')
+                    if track_id is not None:
+                        if track_id in seen:
+                            continue
+                        seen.add(track_id)
+
+                    # Obtém nome da música e nome do artista principal para a lista de busca
+                    artists = track.get('artists') or []
+                    nome_musica = track.get('name')
+                    nome_artista = artists[0].get('name') if artists else ""
+                    tracks_list.append((nome_musica, nome_artista))
+
+                    # Coletar informações desejadas
+                    album = track.get('album') or {}
+                    tracks_info['id'].append(track_id)
+                    tracks_info['nome'].append(nome_musica)
+                    tracks_info['artistas'].append(', '.join([artist.get('name') for artist in artists]))
+                    tracks_info['album'].append(album.get('name'))
+                    tracks_info['release_date'].append(album.get('release_date'))
+                    tracks_info['duracao_ms'].append(track.get('duration_ms'))
+                    tracks_info['popularity'].append(track.get('popularity'))
+                    tracks_info['explicit'].append(track.get('explicit'))
+                    tracks_info['url'].append((track.get('external_urls') or {}).get('spotify'))
+
+    print(f"{len(tracks_list)} faixas únicas coletadas de {len(playlist_ids)} playlist(s)")
     return tracks_info, tracks_list
 
-def create_dataset(playlist_id: str) -> pd.DataFrame:
+def create_dataset(playlist_id: Union[str, Sequence[str]]) -> pd.DataFrame:
     # Coleta as informações das faixas
     tracks_info, _ = take_tracks(playlist_id)
-    # Cria um DataFrame a partir da lista de dicionários
+    # Cria um DataFrame a partir das colunas
     df = pd.DataFrame(tracks_info)
     return df
 
@@ -70,4 +161,4 @@ if __name__ == '__main__':
     # Exibe as 5 primeiras linhas do dataset
     print(df.head())
     # Salva o dataset em um arquivo CSV
-    df.to_csv("spotify_tracks_dataset.csv", index=False)
\ No newline at end of file
+    df.to_csv("spotify_tracks_dataset.csv", index=False)
@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
 """
-Script para atualizar o dataset com informações dos JSONs de debug.
-Usa os arquivos em /debug para atualizar o dataset sem executar todo o pipeline.
+Script para atualizar o dataset com os resultados de análise.
+Lê o diário debug/results.jsonl para atualizar o dataset sem executar todo o pipeline.
+Apenas os registros acrescentados desde a última execução são aplicados (checkpoint
+por offset); use --full para reaplicar o diário inteiro.
 """
 
 import os
-import json
+import math
 import pandas as pd
 import re
+import sys
 from typing import Dict, List, Optional, Tuple
+from matcher import TrackMatcher, top_indices
+from metrics import METRICS
+from results_journal import ResultsJournal
+from track_store import TrackStore, open_store
+from schema import memory_report, set_value
 
 def sanitize_filename(filename: str) -> str:
     """
@@ -20,86 +28,102 @@ def sanitize_filename(filename: str) -> str:
     sanitized = sanitized.replace(' ', '_')
     return sanitized
 
-def load_debug_files(debug_dir: str = 'debug') -> List[Dict]:
+def find_matching_records(df: pd.DataFrame, track_name: str,
+                          matcher: Optional[TrackMatcher] = None) -> List[int]:
     """
-    Carrega todos os arquivos JSON da pasta de debug.
+    Encontra registros no DataFrame que correspondem ao nome da faixa.
     
     Args:
-        debug_dir: Diretório dos arquivos de debug
+        df: DataFrame com o dataset
+        track_name: Nome da faixa a buscar
+        matcher: Índice já construído sobre o DataFrame (construído se omitido)
         
     Returns:
-        Lista de dicionários com dados de cada arquivo
+        Lista de índices dos registros com a melhor pontuação
     """
-    results = []
-    
-    if not os.path.exists(debug_dir):
-        print(f"Diretório {debug_dir} não encontrado.")
-        return results
-    
-    json_files = [f for f in os.listdir(debug_dir) if f.endswith('.json')]
-    print(f"Encontrados {len(json_files)} arquivos JSON em {debug_dir}.")
-    
-    for filename in json_files:
+    if matcher is None:
+        matcher = TrackMatcher.from_dataframe(df)
+    return matcher.best_matches(track_name)
+
+def _same_value(old, new) -> bool:
+    """
+    Compara um valor do dataset com o novo valor, tratando NaN/None como iguais.
+
+    Números são comparados com tolerância: o BPM do dataset é float32 e nunca é
+    exatamente igual ao float64 lido do diário.
+    """
+    if pd.isna(old) or new is None:
+        return pd.isna(old) and new is None
+    if isinstance(new, (int, float)) and not isinstance(new, bool):
         try:
-            with open(os.path.join(debug_dir, filename), 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                results.append(data)
-                print(f"Carregado: {filename}")
-        except Exception as e:
-            print(f"Erro ao carregar {filename}: {e}")
-    
-    return results
+            return math.isclose(float(old), float(new), rel_tol=1e-6)
+        except (TypeError, ValueError):
+            return False
+    return old == new
 
-def find_matching_records(df: pd.DataFrame, track_name: str) -> List[int]:
+def update_dataset(store: Optional[TrackStore] = None, export_csv: bool = True,
+                   journal: Optional[ResultsJournal] = None, full_replay: bool = False):
     """
-    Encontra registros no DataFrame que correspondem ao nome da faixa.
+    Função principal para atualizar o dataset com os resultados do diário.
     
     Args:
-        df: DataFrame com o dataset
-        track_name: Nome da faixa a buscar
-        
-    Returns:
-        Lista de índices dos registros correspondentes
+        store: Banco de faixas já aberto (se omitido, o banco padrão é aberto e fechado aqui)
+        export_csv: Exportar o banco para tracks_with_stems.csv ao final
+        journal: Diário de resultados (padrão: debug/results.jsonl)
+        full_replay: Ignorar o checkpoint e reaplicar o diário inteiro
     """
-    # Método 1: Usando contains case-insensitive
-    idx1 = df[df['nome'].str.contains(track_name, case=False, na=False)].index.tolist()
-    
-    # Método 2: Usando similiaridade de strings (se o nome contém ou é contido)
-    idx2 = []
-    for i, row in df.iterrows():
-        db_track_name = str(row['nome']).lower()
-        search_name = track_name.lower()
-        if search_name in db_track_name or db_track_name in search_name:
-            idx2.append(i)
-    
-    # Combinando os dois métodos
-    idx = list(set(idx1 + idx2))
-    
-    return idx
+    own_store = store is None
+    if own_store:
+        store = open_store()
+    try:
+        _update_dataset(store, export_csv, journal or ResultsJournal(), full_replay)
+    finally:
+        if own_store:
+            store.close()
 
-def update_dataset():
+def _load_pending(journal: ResultsJournal, full_replay: bool) -> Tuple[List[Dict], int]:
     """
-    Função principal para atualizar o dataset com dados dos JSONs de debug.
+    Registros do diário ainda não aplicados e o offset a gravar depois de aplicá-los.
+    
+    Na primeira execução (sem checkpoint), os JSONs antigos de debug/ são importados para o
+    diário uma única vez; a importação fica marcada mesmo que nenhum checkpoint seja gravado.
     """
+    if not os.path.exists(journal.checkpoint_path):
+        imported = journal.import_debug_files(os.path.dirname(journal.path) or '.')
+        if imported:
+            print(f"Importados {imported} arquivos de debug antigos para {journal.path}.")
+    if full_replay:
+        records, end = [], 0
+        for record, end in journal.read_from(0):
+            records.append(record)
+        return records, end
+    records, start, end = journal.pending()
+    print(f"Diário {journal.path}: {len(records)} registros novos desde o offset {start}.")
+    return records, end
+
+def _update_dataset(store: TrackStore, export_csv: bool, journal: ResultsJournal,
+                    full_replay: bool) -> None:
     # Carregar o dataset
     try:
-        df = pd.read_csv('tracks_with_stems.csv', sep=';')
+        df = store.load_dataframe()
         print(f"Dataset carregado com {len(df)} registros.")
-    except FileNotFoundError:
-        print("Arquivo de dataset não encontrado.")
-        return
+        memory_report(df)
     except Exception as e:
         print(f"Erro ao carregar o dataset: {e}")
         return
+    if df.empty:
+        print("Dataset vazio ou não encontrado.")
+        return
     
-    # Carregar os arquivos de debug
-    debug_data = load_debug_files()
+    # Carregar apenas os resultados acrescentados desde a última execução
+    debug_data, journal_end = _load_pending(journal, full_replay)
     if not debug_data:
-        print("Nenhum dado de debug encontrado. Nada a atualizar.")
+        print("Nenhum resultado novo no diário. Nada a atualizar.")
+        journal.save_checkpoint(journal_end)
         return
     
-    # Atualizar o dataset
-    update_count = 0
+    # Extrair os valores de cada arquivo de debug
+    pending = []
     for data in debug_data:
         try:
             # Usar o nome original (não sanitizado) para buscar correspondências
@@ -116,49 +140,71 @@ def update_dataset():
                 print(f"Dados incompletos para {name}. Pulando.")
                 continue
             
-            # Determinar o stem_path
+            # Determinar o stem_path (None mantém o valor atual do dataset)
             stem_path = None
             if url:
                 # Usar o nome sanitizado para paths de arquivo
                 sanitized_name = data.get('sanitized_name', sanitize_filename(name))
+                candidate_path = f"guitar_stems/{sanitized_name}.wav"
                 
-                if 'guitar_stems' not in os.listdir():
-                    os.makedirs('guitar_stems')
-                
-                if url.startswith('https://example.com'):
-                    # URL simulada
-                    stem_path = f"guitar_stems/{sanitized_name}.wav"
+                # Só apontar para o stem se o arquivo existir de fato
+                if os.path.exists(candidate_path):
+                    stem_path = candidate_path
                 else:
-                    # URL real
-                    stem_filename = f"{sanitized_name}.wav"
-                    stem_path = f"guitar_stems/{stem_filename}"
-                    
-                # Verificar se o arquivo existe
-                if not os.path.exists(stem_path):
-                    print(f"Aviso: arquivo stem {stem_path} não existe.")
+                    print(f"Aviso: arquivo stem {candidate_path} não existe. stem_path não alterado.")
             
-            # Encontrar registros correspondentes usando o nome original
-            matches = find_matching_records(df, name)
-            
-            if matches:
-                print(f"Encontrada correspondência para '{name}'. Atualizando {len(matches)} registros.")
-                
-                # Atualizar cada registro
-                for idx in matches:
-                    df.at[idx, 'stem_path'] = stem_path
-                    df.at[idx, 'BPM'] = bpm
-                    df.at[idx, 'Root_key'] = root_key
-                    update_count += 1
-            else:
-                print(f"⚠ Nenhuma correspondência encontrada para '{name}'")
-                # Mostrar alguns exemplos do dataset
-                sample = df['nome'].sample(min(3, len(df))).tolist()
-                print(f"  Exemplos do dataset: {sample}")
-                print(f"  Valores não adicionados: BPM={bpm}, Tonalidade={root_key}")
+            pending.append((data.get('spotify_id'), name, bpm, root_key, stem_path))
         
         except Exception as e:
             print(f"Erro ao processar dados de debug: {e}")
     
+    # Registros com id do Spotify são gravados direto pela chave; os antigos (só com o
+    # título do vídeo) ainda passam pelo casamento aproximado, em uma única passada
+    row_by_id = {track_id: idx for idx, track_id in zip(df.index, df['id'])}
+    legacy_names = [name for spotify_id, name, _, _, _ in pending if spotify_id not in row_by_id]
+    legacy_candidates = {}
+    if legacy_names:
+        with METRICS.span('matching'):
+            matcher = TrackMatcher.from_dataframe(df)
+            legacy_candidates = dict(zip(legacy_names, matcher.match_many(legacy_names, limit=1, keep_ties=True)))
+    
+    # Atualizar o dataset (apenas as linhas que mudaram são gravadas no banco)
+    update_count = 0
+    for spotify_id, name, bpm, root_key, stem_path in pending:
+        if spotify_id in row_by_id:
+            matches = [row_by_id[spotify_id]]
+        else:
+            candidates = legacy_candidates.get(name, [])
+            matches = top_indices(candidates)
+            if matches:
+                print(f"Encontrada correspondência para '{name}' "
+                      f"(score={candidates[0].score}). Atualizando {len(matches)} registros.")
+        
+        if matches:
+            # Atualizar cada registro
+            for idx in matches:
+                row_stem_path = stem_path
+                if row_stem_path is None and not pd.isna(df.at[idx, 'stem_path']):
+                    row_stem_path = df.at[idx, 'stem_path']
+                unchanged = (
+                    _same_value(df.at[idx, 'stem_path'], row_stem_path)
+                    and _same_value(df.at[idx, 'BPM'], bpm)
+                    and _same_value(df.at[idx, 'Root_key'], root_key)
+                )
+                if unchanged:
+                    continue
+                set_value(df, idx, 'stem_path', row_stem_path)
+                set_value(df, idx, 'BPM', bpm)
+                set_value(df, idx, 'Root_key', root_key)
+                store.stage_analysis(df.at[idx, 'id'], bpm, root_key, row_stem_path)
+                update_count += 1
+        else:
+            print(f"⚠ Nenhuma correspondência encontrada para '{name}'")
+            # Mostrar alguns exemplos do dataset
+            sample = df['nome'].sample(min(3, len(df))).tolist()
+            print(f"  Exemplos do dataset: {sample}")
+            print(f"  Valores não adicionados: BPM={bpm}, Tonalidade={root_key}")
+    
     # Verificar se os dados foram atualizados
     bpm_count = df['BPM'].notnull().sum()
     key_count = df['Root_key'].notnull().sum()
@@ -175,12 +221,15 @@ def update_dataset():
         for _, row in sample.iterrows():
             print(f"Nome: {row['nome']}, BPM: {row['BPM']}, Tonalidade: {row['Root_key']}")
     
-    # Salvar apenas o dataset final
+    # Gravar as linhas alteradas em uma única transação; o checkpoint só avança depois dela
     try:
-        df.to_csv('tracks_with_stems.csv', index=False, sep=';')
+        store.flush()
+        journal.save_checkpoint(journal_end)
+        if export_csv:
+            store.export_csv()
         print("\nDataset atualizado e salvo com sucesso!")
     except Exception as e:
         print(f"Erro ao salvar o dataset: {e}")
 
 if __name__ == "__main__":
-    update_dataset() 
\ No newline at end of file
+    update_dataset(full_replay='--full' in sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Fila de trabalho compartilhada para rodar o pipeline em vários processos ou máquinas.
+
+Cada faixa vira uma tarefa em uma tabela SQLite (`queue.db`). Os workers (`worker.py`) reservam tarefas com um lease
+de duração limitada, renovado por heartbeat enquanto a faixa é processada; se um
+worker cair, o lease expira e a tarefa volta a ser reservável pelos demais. Os
+workers só gravam o resultado na fila: o dataset (`tracks.db` e o CSV) é
+atualizado por um único passo de merge, no coordenador.
+
+Em uma única máquina a fila usa o journal WAL (leituras não bloqueiam escritas).
+O WAL depende de memória compartilhada entre os processos do mesmo host e não é
+seguro em NFS/SMB: quando `queue.db` está em um sistema de arquivos de rede
+(workers em várias máquinas), a fila usa `journal_mode=DELETE`, com travas de
+arquivo comuns. Mesmo assim, a trava de arquivos do NFS/SMB precisa estar
+funcionando; para muitas máquinas, prefira um armazenamento com servidor
+(ver abaixo).
+
+    python work_queue.py enqueue <playlist_id> [<playlist_id> ...]
+    python worker.py                        # em cada processo/máquina
+    python work_queue.py status
+    python work_queue.py merge              # incorpora os resultados ao dataset
+
+A interface pública (enqueue, claim, heartbeat, complete, fail, pending_results,
+mark_merged, stats) é tudo o que os workers e o merge usam, de modo que outro
+armazenamento (ex.: Redis ou Postgres) pode substituir esta implementação.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_QUEUE_PATH = 'queue.db'
+DEFAULT_LEASE_SECONDS = 300.0
+# Tipos de sistema de arquivos de rede (em /proc/mounts) onde o WAL não é seguro
+NETWORK_FILESYSTEMS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afs', '9p', 'fuse.sshfs', 'ceph', 'glusterfs')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    spotify_id TEXT PRIMARY KEY,
+    nome TEXT,
+    artista TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    merged INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_expires);
+"""
+
+
+def is_network_path(path: str) -> bool:
+    """
+    Indica se o arquivo fica em um sistema de arquivos de rede (NFS, SMB/CIFS, ...).
+
+    Usa o caminho UNC no Windows e o ponto de montagem mais específico de /proc/mounts
+    no Linux; em outros sistemas retorna False.
+    """
+    path = os.path.abspath(path)
+    if path.startswith('\\\\'):
+        return True
+    try:
+        with open('/proc/mounts', 'r', encoding='utf-8') as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return False
+    best, fstype = '', ''
+    for mount_point, mount_type in mounts:
+        mount_point = mount_point.replace('\\040', ' ')
+        inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+        if inside and len(mount_point) > len(best):
+            best, fstype = mount_point, mount_type
+    return fstype in NETWORK_FILESYSTEMS
+
+
+class WorkQueue:
+    """
+    Fila de tarefas por faixa com leases, sobre um arquivo SQLite compartilhado.
+
+    Status: queued → leased → done (ou failed após max_attempts falhas). Uma tarefa
+    "leased" com lease vencido é tratada como "queued" na próxima reserva.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = 3, journal_mode: Optional[str] = None):
+        """
+        Args:
+            path: Arquivo SQLite da fila
+            lease_seconds: Duração de um lease sem heartbeat
+            max_attempts: Número de falhas após o qual a tarefa fica como "failed"
+            journal_mode: Modo de journal do SQLite (padrão: WAL em disco local, DELETE
+                em sistema de arquivos de rede)
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # isolation_level=None: as transações são abertas explicitamente com BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        if journal_mode is None:
+            journal_mode = 'DELETE' if is_network_path(path) else 'WAL'
+        self.journal_mode = journal_mode.upper()
+        self.conn.execute(f'PRAGMA journal_mode={self.journal_mode}')
+        # Sem WAL, synchronous=FULL mantém a fila íntegra em uma queda no meio do commit
+        self.conn.execute('PRAGMA synchronous=NORMAL' if self.journal_mode == 'WAL' else 'PRAGMA synchronous=FULL')
+        self.conn.executescript(_SCHEMA)
+
+    def _write(self, sql: str, params: Tuple = ()) -> int:
+        with self._lock:
+            return self.conn.execute(sql, params).rowcount
+
+    def enqueue(self, tracks: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Acrescenta tarefas (faixas já enfileiradas não são duplicadas).
+
+        Args:
+            tracks: Tuplas (spotify_id, nome, artista)
+
+        Returns:
+            Número de tarefas novas
+        """
+        rows = [(spotify_id, nome, artista, time.time()) for spotify_id, nome, artista in tracks if spotify_id]
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO tasks (spotify_id, nome, artista, updated_at) VALUES (?, ?, ?, ?)",
+                    rows)
+                added = self.conn.total_changes - before
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return added
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[Dict]:
+        """
+        Reserva até `limit` tarefas livres (ou com lease vencido) para o worker.
+
+        A seleção e a marcação acontecem na mesma transação de escrita, então duas
+        reservas simultâneas nunca recebem a mesma tarefa.
+
+        Returns:
+            Tarefas reservadas ({'spotify_id', 'nome', 'artista', 'attempts'})
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self.conn.execute(
+                    "SELECT spotify_id, nome, artista, attempts FROM tasks "
+                    "WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY attempts, rowid LIMIT ?", (now, limit)).fetchall()
+                self.conn.executemany(
+                    "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, updated_at = ? "
+                    "WHERE spotify_id = ?",
+                    [(worker_id, now + self.lease_seconds, now, row[0]) for row in rows])
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return [{'spotify_id': spotify_id, 'nome': nome, 'artista': artista, 'attempts': attempts}
+                for spotify_id, nome, artista, attempts in rows]
+
+    def heartbeat(self, worker_id: str, spotify_ids: Iterable[str]) -> int:
+        """
+        Renova os leases das tarefas ainda reservadas pelo worker.
+
+        Returns:
+            Número de leases renovados (menor que o informado se algum foi perdido)
+        """
+        now = time.time()
+        renewed = 0
+        for spotify_id in spotify_ids:
+            renewed += self._write(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                "WHERE spotify_id = ? AND status = 'leased' AND worker = ?",
+                (now + self.lease_seconds, now, spotify_id, worker_id))
+        return renewed
+
+    def complete(self, spotify_id: str, worker_id: str, result: Dict) -> bool:
+        """
+        Grava o resultado de uma tarefa reservada pelo worker.
+
+        Returns:
+            False se o lease foi perdido (a tarefa foi reservada por outro worker)
+        """
+        return self._write(
+            "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_expires = NULL, "
+            "merged = 0, updated_at = ? WHERE spotify_id = ? AND status = 'leased' AND worker = ?",
+            (json.dumps(result), time.time(), spotify_id, worker_id)) > 0
+
+    def fail(self, spotify_id: str, worker_id: str, error: str) -> bool:
+        """
+        Registra uma falha: a tarefa volta para a fila, ou fica "failed" após max_attempts.
+
+        Returns:
+            False se o lease foi perdido
+        """
+        return self._write(
+            "UPDATE tasks SET attempts = attempts + 1, error = ?, lease_expires = NULL, updated_at = ?, "
+            "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'queued' END "
+            "WHERE spotify_id = ? AND status = 'leased' AND worker = ?",
+            (str(error)[:500], time.time(), self.max_attempts, spotify_id, worker_id)) > 0
+
+    def retry_failed(self) -> int:
+        """
+        Devolve as tarefas "failed" para a fila, zerando as tentativas.
+        """
+        return self._write("UPDATE tasks SET status = 'queued', attempts = 0, updated_at = ? "
+                           "WHERE status = 'failed'", (time.time(),))
+
+    def remaining(self) -> int:
+        """
+        Número de tarefas ainda não concluídas (na fila ou reservadas).
+        """
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status IN ('queued', 'leased')").fetchone()[0]
+
+    def pending_results(self) -> List[Tuple[str, Dict]]:
+        """
+        Resultados concluídos ainda não incorporados ao dataset.
+
+        Returns:
+            Lista de (spotify_id, resultado)
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT spotify_id, result FROM tasks WHERE status = 'done' AND merged = 0").fetchall()
+        return [(spotify_id, json.loads(result or '{}')) for spotify_id, result in rows]
+
+    def mark_merged(self, spotify_ids: Iterable[str]) -> None:
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.executemany("UPDATE tasks SET merged = 1 WHERE spotify_id = ?",
+                                      [(spotify_id,) for spotify_id in spotify_ids])
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Número de tarefas por status (e leases vencidos, prontos para nova reserva).
+        """
+        now = time.time()
+        with self._lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            expired = self.conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status = 'leased' AND lease_expires < ?", (now,)).fetchone()[0]
+            unmerged = self.conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status = 'done' AND merged = 0").fetchone()[0]
+        report = {status: counts.get(status, 0) for status in ('queued', 'leased', 'done', 'failed')}
+        report['expired_leases'] = expired
+        report['unmerged'] = unmerged
+        return report
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'WorkQueue':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class LeaseKeeper:
+    """
+    Thread que renova periodicamente os leases das tarefas em andamento de um worker.
+    """
+
+    def __init__(self, work_queue: WorkQueue, worker_id: str, interval: Optional[float] = None):
+        """
+        Args:
+            work_queue: Fila das tarefas
+            worker_id: Identificação do worker dono dos leases
+            interval: Intervalo entre heartbeats (padrão: um terço da duração do lease)
+        """
+        self.queue = work_queue
+        self.worker_id = worker_id
+        self.interval = interval or work_queue.lease_seconds / 3
+        self.lost = 0
+        self._held: set = set()
+        self._lock = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def hold(self, spotify_id: str) -> None:
+        with self._lock:
+            self._held.add(spotify_id)
+
+    def release(self, spotify_id: str) -> None:
+        with self._lock:
+            self._held.discard(spotify_id)
+            self._lock.notify_all()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._held)
+
+    def wait_below(self, limit: int, timeout: Optional[float] = None) -> int:
+        """
+        Espera até que o worker tenha menos de `limit` leases em andamento.
+
+        Returns:
+            Número de vagas livres (0 se o timeout expirar antes)
+        """
+        with self._lock:
+            self._lock.wait_for(lambda: len(self._held) < limit, timeout)
+            return max(0, limit - len(self._held))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                held = list(self._held)
+            if not held:
+                continue
+            try:
+                renewed = self.queue.heartbeat(self.worker_id, held)
+            except Exception as e:
+                print(f"Erro no heartbeat dos leases: {e}")
+                continue
+            if renewed < len(held):
+                self.lost += len(held) - renewed
+                print(f"{len(held) - renewed} leases perdidos (tarefas reservadas por outro worker)")
+
+    def __enter__(self) -> 'LeaseKeeper':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def enqueue_playlists(playlist_id, queue_path: str = DEFAULT_QUEUE_PATH) -> int:
+    """
+    Busca as faixas das playlists, registra os metadados no dataset e enfileira uma tarefa por faixa.
+
+    Args:
+        playlist_id: ID da playlist do Spotify (ou lista de IDs)
+        queue_path: Arquivo da fila
+
+    Returns:
+        Número de tarefas novas
+    """
+    from tracks import take_tracks
+    from track_store import open_store
+
+    tracks_info, tracks_names = take_tracks(playlist_id)
+    with open_store() as store:
+        store.upsert_tracks(tracks_info)
+    with WorkQueue(queue_path) as work_queue:
+        # Mesmo termo de busca do pipeline local: nome da música e artista principal
+        added = work_queue.enqueue((spotify_id, nome, artista) for spotify_id, (nome, artista)
+                                   in zip(tracks_info['id'], tracks_names))
+    print(f"{added} tarefas novas na fila {queue_path} ({len(tracks_info['id'])} faixas nas playlists).")
+    return added
+
+
+def merge_results(queue_path: str = DEFAULT_QUEUE_PATH, export_csv: bool = True) -> int:
+    """
+    Incorpora ao dataset os resultados concluídos pelos workers (único escritor do banco/CSV).
+
+    Args:
+        queue_path: Arquivo da fila
+        export_csv: Exportar tracks_with_stems.csv ao final
+
+    Returns:
+        Número de faixas atualizadas
+    """
+    from track_store import open_store
+
+    with WorkQueue(queue_path) as work_queue:
+        results = work_queue.pending_results()
+        if not results:
+            print("Nenhum resultado novo na fila.")
+            return 0
+        merged = []
+        with open_store() as store:
+            for spotify_id, result in results:
+                if result.get('bpm') is not None or result.get('root_key'):
+                    store.stage_analysis(spotify_id, result.get('bpm'), result.get('root_key'),
+                                         result.get('stem_path'))
+                merged.append(spotify_id)
+            store.flush()
+            # Marcado só depois do commit no banco: uma queda aqui apenas repete o merge
+            work_queue.mark_merged(merged)
+            if export_csv:
+                store.export_csv()
+    print(f"{len(merged)} resultados incorporados ao dataset.")
+    return len(merged)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    if command == 'enqueue' and len(sys.argv) > 2:
+        enqueue_playlists(sys.argv[2:])
+    elif command == 'merge':
+        merge_results()
+    elif command == 'retry-failed':
+        with WorkQueue() as work_queue:
+            print(f"{work_queue.retry_failed()} tarefas devolvidas para a fila.")
+    elif command == 'status':
+        with WorkQueue() as work_queue:
+            stats = work_queue.stats()
+        print(', '.join(f"{name}: {count}" for name, count in stats.items()))
+    else:
+        print("Uso: python work_queue.py [status|enqueue <playlist_id> ...|merge|retry-failed]")
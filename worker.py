@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Worker da fila de trabalho distribuída (ver work_queue.py).
+
+Reserva faixas da fila compartilhada e executa busca → download → análise → stem
+com o mesmo pipeline em estágios do main.py, mas sem tocar no dataset: o
+resultado de cada faixa é gravado na fila e incorporado depois por
+`python work_queue.py merge`. Vários workers (processos ou máquinas) podem rodar
+ao mesmo tempo contra o mesmo `queue.db`; os arquivos de áudio são nomeados pelo
+id do Spotify, então workers no mesmo diretório não sobrescrevem os de outros.
+
+    python worker.py [queue.db] [backend]
+"""
+
+import os
+import sys
+import time
+import socket
+import threading
+import concurrent.futures
+from typing import Dict, Iterator, Optional
+
+from analysis import get_backend
+from analysis_cache import AnalysisCache
+from concurrency import get_limiter, limiter_report
+from downloader import download_track
+from main import cached_result, fetch_stem
+from metrics import METRICS
+from pipeline import Pipeline, Stage
+from rate_limit import rate_limit_report
+from search_backends import default_workers, get_search_backend, max_workers as search_max_workers
+from search_cache import SearchCache
+from work_queue import DEFAULT_QUEUE_PATH, LeaseKeeper, WorkQueue
+from youtuber_catcher import buscar_com_cache
+
+
+def default_worker_id() -> str:
+    """Identificação do worker: máquina e PID."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(queue_path: str = DEFAULT_QUEUE_PATH, backend: str = 'musicai',
+               worker_id: Optional[str] = None, batch_size: int = 4, wait: bool = False,
+               poll_interval: float = 10.0, lease_seconds: float = 300.0,
+               search_backend: str = 'selenium', search_workers: Optional[int] = None,
+               download_workers: int = 2, analyze_workers: Optional[int] = None,
+               stem_workers: int = 2, audio_mode: str = 'mp3', use_cache: bool = True,
+               use_search_cache: bool = True, max_tasks: Optional[int] = None,
+               max_leases: Optional[int] = None) -> Dict[str, int]:
+    """
+    Processa tarefas da fila até que não haja mais nada a reservar.
+
+    Args:
+        queue_path: Arquivo SQLite da fila compartilhada
+        backend: Backend de análise ("musicai", "local", "hybrid", "stream" ou "stream-windows")
+        worker_id: Identificação do worker (padrão: máquina:PID)
+        batch_size: Número de tarefas reservadas por vez
+        wait: Continuar esperando enquanto houver tarefas reservadas por outros workers
+            (para reaproveitar leases vencidos de workers que caíram)
+        poll_interval: Intervalo entre tentativas de reserva quando não há tarefa livre
+        lease_seconds: Duração do lease (renovado por heartbeat a cada terço)
+        search_backend: Backend de busca: "selenium" ou "ytdlp"
+        search_workers: Número inicial de buscas simultâneas
+        download_workers: Número inicial de downloads simultâneos
+        analyze_workers: Número de análises simultâneas (padrão depende do backend)
+        stem_workers: Número inicial de downloads de stems simultâneos
+        audio_mode: Formato dos áudios: "mp3", "native" ou "analysis"
+        use_cache: Reaproveitar resultados de análise deste computador
+        use_search_cache: Reaproveitar buscas no YouTube deste computador
+        max_tasks: Parar depois de reservar este número de tarefas
+        max_leases: Máximo de tarefas reservadas ao mesmo tempo por este worker (padrão:
+            2 × batch_size); novas reservas esperam as faixas em andamento terminarem, para
+            que as filas internas do pipeline não retenham tarefas que outros workers pegariam
+
+    Returns:
+        Contagem de tarefas concluídas, com falha e com lease perdido
+    """
+    worker_id = worker_id or default_worker_id()
+    max_leases = max_leases or 2 * batch_size
+    if analyze_workers is None:
+        analyze_workers = 4 if backend == 'musicai' else (os.cpu_count() or 1)
+    if search_workers is None:
+        search_workers = default_workers(search_backend)
+    os.makedirs('audios', exist_ok=True)
+
+    search_limiter = get_limiter(f"search_{search_backend}", initial=search_workers,
+                                 max_limit=max(search_workers, search_max_workers(search_backend)))
+    download_limiter = get_limiter('download', initial=download_workers, max_limit=max(download_workers, 16))
+    stem_limiter = get_limiter('stems', initial=stem_workers, max_limit=max(stem_workers, 32))
+    musicai_limiter = None
+    process_pool = None
+    if backend != 'musicai':
+        process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=analyze_workers)
+    if backend in ('musicai', 'hybrid'):
+        musicai_limiter = get_limiter('musicai', initial=analyze_workers, max_limit=max(analyze_workers, 16))
+    engine = get_backend(backend, process_pool, max_in_flight=analyze_workers, limiter=musicai_limiter)
+    analyze_stage_workers = musicai_limiter.max_limit if backend == 'musicai' else analyze_workers
+
+    cache = AnalysisCache() if use_cache else None
+    search_cache = SearchCache() if use_search_cache else None
+    work_queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    counts = {'claimed': 0, 'done': 0, 'failed': 0, 'lost': 0}
+    counts_lock = threading.Lock()
+
+    def count(name):
+        with counts_lock:
+            counts[name] += 1
+
+    def fail(item, error):
+        keeper.release(item['spotify_id'])
+        count('failed')
+        if not work_queue.fail(item['spotify_id'], worker_id, error):
+            count('lost')
+
+    def tracked(func, error):
+        # Item descartado ou exceção no estágio: a tarefa volta para a fila
+        def wrapper(item):
+            try:
+                result = func(item)
+            except Exception as e:
+                fail(item, f"{type(e).__name__}: {e}")
+                raise
+            if result is None:
+                fail(item, error)
+            return result
+        return wrapper
+
+    def search_stage(item):
+        url = buscar_com_cache(item['nome'], item['artista'], search_engine, search_cache,
+                               item['spotify_id'], False, search_limiter)
+        if not url:
+            return None
+        item['url'] = url
+        return item
+
+    def download_stage(item):
+        audio_path = download_limiter.wrap(download_track)(item['url'], track_id=item['spotify_id'],
+                                                           mode=audio_mode, nome=item['nome'],
+                                                           artista=item['artista'])
+        if not audio_path:
+            if search_cache is not None:
+                # URL em cache que não baixa (vídeo removido/privado): buscar de novo na próxima vez
+                search_cache.invalidate(item['nome'], item['artista'], item['spotify_id'])
+            return None
+        item['audio_path'] = audio_path
+        return item
+
+    def analyze_stage(item):
+        cached = cached_result(item['audio_path'], backend, cache)
+        if cached is not None:
+            item['result'] = cached
+            return item
+        audio_url, bpm, root_key, original_name = engine.analyze(item['audio_path'])
+        if bpm is None and not root_key:
+            return None
+        item['analysis'] = (audio_url, bpm, root_key, original_name)
+        return item
+
+    def stem_stage(item):
+        if 'result' not in item:
+            audio_url, bpm, root_key, original_name = item['analysis']
+            stem_path = stem_limiter.wrap(fetch_stem)(audio_url, original_name) if audio_url else None
+            if audio_url and not stem_path:
+                return None
+            item['result'] = (audio_url, bpm, root_key, original_name, stem_path)
+            if cache is not None:
+                cache.put(item['audio_path'], item['result'], backend)
+        return item
+
+    def complete(item):
+        audio_url, bpm, root_key, original_name, stem_path = item['result']
+        keeper.release(item['spotify_id'])
+        result = {'audio_url': audio_url, 'bpm': bpm, 'root_key': root_key,
+                  'name': original_name, 'stem_path': stem_path, 'worker': worker_id}
+        if work_queue.complete(item['spotify_id'], worker_id, result):
+            count('done')
+        else:
+            count('lost')
+            print(f"Lease perdido para {item['spotify_id']}; resultado descartado.")
+
+    def claimed_tasks() -> Iterator[dict]:
+        while max_tasks is None or counts['claimed'] < max_tasks:
+            # O Pipeline consome o gerador de forma ansiosa: só reservar com vaga livre
+            free = keeper.wait_below(max_leases, timeout=poll_interval)
+            if not free:
+                continue
+            limit = min(batch_size, free)
+            if max_tasks is not None:
+                limit = min(limit, max_tasks - counts['claimed'])
+            tasks = work_queue.claim(worker_id, limit)
+            if not tasks:
+                if wait and work_queue.remaining() > 0:
+                    time.sleep(poll_interval)
+                    continue
+                return
+            for task in tasks:
+                count('claimed')
+                keeper.hold(task['spotify_id'])
+                yield task
+
+    stages = [
+        Stage('search', tracked(search_stage, 'vídeo não encontrado'), workers=search_limiter.max_limit),
+        Stage('download', tracked(download_stage, 'falha no download'), workers=download_limiter.max_limit),
+        Stage('analyze', tracked(analyze_stage, 'sem resultado de análise'), workers=analyze_stage_workers),
+        Stage('stem', tracked(stem_stage, 'falha no download do stem'), workers=stem_limiter.max_limit),
+    ]
+
+    print(f"Worker {worker_id} processando a fila {queue_path}...")
+    try:
+        with LeaseKeeper(work_queue, worker_id) as keeper, \
+                get_search_backend(search_backend, workers=search_limiter.max_limit) as search_engine:
+            Pipeline(stages).run(claimed_tasks(), on_result=complete)
+    finally:
+        engine.report()
+        engine.close()
+        if process_pool is not None:
+            process_pool.shutdown()
+        if cache is not None:
+            cache.save()
+        if search_cache is not None:
+            search_cache.save()
+        work_queue.close()
+
+    limiter_report()
+    rate_limit_report()
+    print(f"Worker {worker_id}: {counts['done']} concluídas, {counts['failed']} com falha, "
+          f"{counts['lost']} leases perdidos (gargalo: {METRICS.bottleneck()})")
+    return counts
+
+
+if __name__ == "__main__":
+    run_worker(queue_path=sys.argv[1] if len(sys.argv) > 1 else DEFAULT_QUEUE_PATH,
+               backend=sys.argv[2] if len(sys.argv) > 2 else 'musicai')
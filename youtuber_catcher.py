@@ -5,67 +5,85 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 import time
 import urllib.parse
 import concurrent.futures
-from typing import List, Optional, Tuple
+from typing import List, Optional, Sequence, Tuple
+from driver_pool import DriverPool
+from metrics import METRICS
+from search_cache import SearchCache
+from search_backends import SearchBackend, default_workers, get_search_backend, max_workers as backend_max_workers
+from concurrency import AdaptiveLimiter, get_limiter
+from rate_limit import get_rate_limiter, note_throttle
 
-def buscar_unico_video(termo_busca: str) -> Optional[str]:
+YOUTUBE_RESULTS_URL = "https://www.youtube.com/results?search_query={}"
+
+def _aceitar_cookies(driver) -> None:
+    """
+    Aceita o banner/página de consentimento de cookies, se aparecer.
+    """
+    try:
+        WebDriverWait(driver, 3).until(
+            EC.element_to_be_clickable((By.XPATH, "//button[contains(@aria-label, 'Accept')]"))
+        ).click()
+    except:
+        pass  # Ignorar se não aparecer
+
+def buscar_unico_video(termo_busca: str, pool: Optional[DriverPool] = None) -> Optional[str]:
     """
     Busca um único vídeo no YouTube usando Selenium.
     
     Args:
         termo_busca: Termo de busca para o vídeo (formato: 'nome_musica - nome_album')
+        pool: Pool de drivers reutilizáveis (se omitido, um navegador é aberto só para esta busca)
         
     Returns:
-        URL do vídeo encontrado ou None se não encontrado
+        URL do vídeo encontrado ou None se a página de resultados vier vazia
+        
+    Raises:
+        Exception: Timeouts, bloqueio por tráfego incomum (429) e erros do navegador são
+            relançados, para não serem confundidos com uma busca sem resultado
     """
-    # Configurar opções do Chrome
-    chrome_options = Options()
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--headless")  # Executar em modo headless para maior eficiência
+    pool_proprio = pool is None
+    if pool_proprio:
+        pool = DriverPool(size=1)
     
-    # Inicializar o driver com as opções configuradas
-    driver = webdriver.Chrome(options=chrome_options)
+    pooled = pool.acquire()
+    driver = pooled.driver
+    failed = False
+    span = METRICS.start('search', track=termo_busca)
     
     try:
-        # Abrir o YouTube
-        driver.get("https://www.youtube.com/")
+        # Ir direto para a página de resultados, respeitando a taxa de buscas no YouTube
+        get_rate_limiter('youtube_search').acquire()
+        driver.get(YOUTUBE_RESULTS_URL.format(urllib.parse.quote_plus(termo_busca)))
+        if "/sorry/" in driver.current_url:
+            # Página de "tráfego incomum" do Google: equivalente a um HTTP 429
+            raise RuntimeError("429 Too Many Requests: YouTube bloqueou a sessão temporariamente")
         
-        # Tentar aceitar cookies
-        try:
-            WebDriverWait(driver, 3).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(@aria-label, 'Accept')]"))
-            ).click()
-        except:
-            pass  # Ignorar se não aparecer
-        
-        # Encontrar a caixa de pesquisa
-        search_box = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.NAME, "search_query"))
-        )
-        
-        # Inserir o termo de pesquisa e pressionar Enter
-        search_box.clear()
-        search_box.send_keys(termo_busca)
-        search_box.send_keys(Keys.RETURN)
-        
-        # Esperar pelos resultados da pesquisa
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "contents"))
-        )
+        # Tentar aceitar cookies (apenas na primeira navegação de cada driver)
+        if not pooled.consent_handled:
+            if "consent" in driver.current_url:
+                _aceitar_cookies(driver)
+            pooled.consent_handled = True
         
-        # Pequena pausa para garantir que os resultados carreguem
-        time.sleep(2)
-        
-        # Encontrar o primeiro vídeo (não playlist, não shorts)
-        primeiro_video = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "a#video-title"))
-        )
+        # Esperar o primeiro vídeo (não playlist, não shorts) com o link já preenchido
+        try:
+            primeiro_video = WebDriverWait(driver, 10).until(
+                lambda d: next(
+                    (el for el in d.find_elements(By.CSS_SELECTOR, "a#video-title")
+                     if el.get_attribute("href")),
+                    False
+                )
+            )
+        except TimeoutException:
+            # Só a mensagem "Nenhum resultado" do YouTube conta como busca vazia; o resto é falha
+            if driver.find_elements(By.CSS_SELECTOR, "ytd-background-promo-renderer"):
+                span.fail('sem resultados')
+                print(f"Nenhum vídeo encontrado para '{termo_busca}'")
+                return None
+            raise
         
         # Obter o link do vídeo
         video_url = primeiro_video.get_attribute("href")
@@ -73,44 +91,133 @@ def buscar_unico_video(termo_busca: str) -> Optional[str]:
         return video_url
         
     except Exception as e:
+        failed = True
+        span.fail(f"{type(e).__name__}: {e}")
+        note_throttle('youtube_search', e)
         print(f"Erro ao buscar vídeo '{termo_busca}': {e}")
-        return None
+        raise
         
     finally:
-        # Fechar o navegador
-        driver.quit()
+        # Devolver o navegador ao pool (ou fechá-lo, se o pool for só desta busca)
+        pool.release(pooled, failed=failed)
+        if pool_proprio:
+            pool.close()
+        span.finish()
 
-def youtube_catcher(musicas_info: List[Tuple[str, str]], max_workers: int = 3) -> List[Optional[str]]:
+def buscar_com_cache(nome_musica: str, nome_artista: str, backend: Optional[SearchBackend] = None,
+                     cache: Optional[SearchCache] = None, spotify_id: Optional[str] = None,
+                     force_refresh: bool = False, limiter: Optional[AdaptiveLimiter] = None) -> Optional[str]:
     """
-    Busca múltiplos vídeos no YouTube em paralelo usando Selenium.
+    Busca um vídeo consultando antes o cache de buscas; o backend só é usado em um miss.
+    
+    Args:
+        nome_musica: Nome da música
+        nome_artista: Nome do artista
+        backend: Backend de busca (se omitido, um navegador é aberto só para esta busca)
+        cache: Cache de buscas (se omitido, a busca sempre usa o navegador)
+        spotify_id: id da faixa no Spotify, usado como chave adicional do cache
+        force_refresh: Ignorar o resultado em cache e refazer a busca
+        limiter: Limitador adaptativo das buscas (acertos no cache não ocupam vaga)
+        
+    Returns:
+        URL do vídeo encontrado ou None se não encontrado
+        
+    Raises:
+        Exception: Erros da busca (timeout, 429, falha do yt-dlp) são relançados sem gravar
+            nada no cache; só uma página de resultados vazia vira entrada negativa
+    """
+    if cache is not None and not force_refresh:
+        encontrado, url = cache.lookup(nome_musica, nome_artista, spotify_id)
+        if encontrado:
+            METRICS.count('search_cache_hits')
+            return url
+    
+    termo_busca = f"{nome_musica} - {nome_artista}"
+    search = buscar_unico_video if backend is None else backend.search
+    if limiter is not None:
+        # Exceções atravessam o wrap: o limitador conta o erro (ou o 429) e recua
+        search = limiter.wrap(search, falsy_is_error=False)
+    url = search(termo_busca)
+    if cache is not None:
+        cache.put(nome_musica, nome_artista, url, spotify_id)
+    return url
+
+def youtube_catcher(musicas_info: List[Tuple[str, str]], max_workers: Optional[int] = None,
+                    pool_size: Optional[int] = None, max_uses: int = 50,
+                    cache: Optional[SearchCache] = None, use_cache: bool = True,
+                    force_refresh: bool = False,
+                    spotify_ids: Optional[Sequence[Optional[str]]] = None,
+                    backend: str = 'selenium') -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Busca múltiplos vídeos no YouTube em paralelo.
     
     Args:
         musicas_info: Lista de tuplas contendo (nome_da_musica, nome_do_artista)
-        max_workers: Número máximo de workers para paralelização
+        max_workers: Número inicial de buscas simultâneas (padrão: 3 com Selenium, 16 com
+            yt-dlp); o limitador adaptativo ajusta o valor até o teto do backend
+        pool_size: Teto de buscas simultâneas e de navegadores abertos no Selenium
+            (padrão: teto do backend); limita também max_workers
+        max_uses: Número de buscas após o qual cada navegador é reciclado (só Selenium)
+        cache: Cache de buscas (padrão: cache/search_cache.json, se use_cache)
+        use_cache: Consultar e atualizar o cache de buscas
+        force_refresh: Refazer todas as buscas, atualizando o cache
+        spotify_ids: ids do Spotify na mesma ordem de musicas_info (chave adicional do cache)
+        backend: "selenium" (navegador headless) ou "ytdlp" (yt-dlp, sem navegador)
     
     Returns:
-        Lista de URLs dos vídeos encontrados para cada música
+        Lista de pares (id do Spotify, URL do vídeo) na ordem de musicas_info; o id é None
+        se spotify_ids não for informado e a URL é None se o vídeo não for encontrado
     """
-    resultados = [None] * len(musicas_info)  # Inicializar lista com None
+    ids = list(spotify_ids) if spotify_ids is not None else [None] * len(musicas_info)
+    resultados = [(spotify_id, None) for spotify_id in ids]  # Inicializar sem URL
+    
+    cache_proprio = cache is None and use_cache
+    if cache_proprio:
+        cache = SearchCache()
     
-    # Formatar os termos de busca como "nome_musica - nome_artista"
-    termos_busca = [f"{nome_musica} - {nome_artista}" for nome_musica, nome_artista in musicas_info]
+    if max_workers is None:
+        max_workers = default_workers(backend)
+    teto = pool_size or max(max_workers, backend_max_workers(backend))
+    max_workers = min(max_workers, teto)
+    limiter = get_limiter(f"search_{getattr(backend, 'name', backend)}", initial=max_workers, max_limit=teto)
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Mapear a função de busca para cada termo formatado
-        futuros = {executor.submit(buscar_unico_video, termo): i for i, termo in enumerate(termos_busca)}
+    # No Selenium, o pool só abre navegadores para as buscas que não estiverem no cache
+    # (e nunca mais do que o limite atual de buscas simultâneas)
+    engine = get_search_backend(backend, workers=teto, max_uses=max_uses)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=teto) as executor:
+            # Mapear a função de busca para cada música
+            futuros = {
+                executor.submit(buscar_com_cache, nome_musica, nome_artista, engine, cache, ids[i],
+                                force_refresh, limiter): i
+                for i, (nome_musica, nome_artista) in enumerate(musicas_info)
+            }
+            
+            # Coletar os resultados na medida em que forem concluídos
+            for futuro in concurrent.futures.as_completed(futuros):
+                indice = futuros[futuro]
+                try:
+                    resultado = futuro.result()
+                    resultados[indice] = (ids[indice], resultado)
+                    nome_musica, nome_artista = musicas_info[indice]
+                    print(f"Concluída busca {indice+1}/{len(musicas_info)}: '{nome_musica} - {nome_artista}'")
+                except Exception as e:
+                    print(f"Erro na busca {indice+1}: {e}")
+                    resultados[indice] = (ids[indice], None)
         
-        # Coletar os resultados na medida em que forem concluídos
-        for futuro in concurrent.futures.as_completed(futuros):
-            indice = futuros[futuro]
+        engine.report()
+    finally:
+        # Instâncias recebidas prontas pertencem ao chamador
+        if not isinstance(backend, SearchBackend):
+            engine.close()
+    
+    if cache is not None:
+        cache.report()
+        if cache_proprio:
             try:
-                resultado = futuro.result()
-                resultados[indice] = resultado
-                nome_musica, nome_artista = musicas_info[indice]
-                print(f"Concluída busca {indice+1}/{len(musicas_info)}: '{nome_musica} - {nome_artista}'")
+                cache.save()
             except Exception as e:
-                print(f"Erro na busca {indice+1}: {e}")
-                resultados[indice] = None
+                print(f"Erro ao salvar o cache de buscas: {e}")
     
     return resultados
 
@@ -130,7 +237,7 @@ if __name__ == "__main__":
         links = youtube_catcher(musicas_info)
         
         # Exibir os resultados
-        for i, ((musica, artista), link) in enumerate(zip(musicas_info, links)):
+        for i, ((musica, artista), (_, link)) in enumerate(zip(musicas_info, links)):
             termo = f"{musica} - {artista}"
             if link:
                 print(f"{i+1}. '{termo}': {link}")